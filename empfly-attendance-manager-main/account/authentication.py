@@ -1,5 +1,88 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone as tz
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication
 from account.models import AuthToken
+from utils.cache import is_cache_shared
+from utils.request_context import get_request_context
+
+
+def get_token_cache_key(key: str) -> str:
+    """ Cache key of auth token. Token key itself is never used as cache key.
+    """
+    return f"auth_token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def invalidate_token_cache(key: str) -> None:
+    cache.delete(get_token_cache_key(key))
+
+
+def get_auth_token(key: str) -> AuthToken:
+    """ Auth token with user, from cache for AUTH_TOKEN_CACHE_TIMEOUT seconds.
+        Cached tokens are dropped on token/user save and token delete, which
+        other workers see only with a shared cache. Without one tokens are
+        always read from DB.
+    """
+
+    if not is_cache_shared():
+        return AuthToken.objects.select_related("user").filter(key=key).first()
+
+    cache_key = get_token_cache_key(key)
+    token = cache.get(cache_key)
+    if token is None:
+        token = AuthToken.objects.select_related("user").filter(key=key).first()
+        if token is None:
+            return None
+        cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+    return token
+
+
+def update_last_used_at(token: AuthToken) -> None:
+    """ Save last_used_at at most once per AUTH_TOKEN_LAST_USED_INTERVAL seconds
+        per token, instead of on every request.
+    """
+
+    now = tz.now()
+    interval = settings.AUTH_TOKEN_LAST_USED_INTERVAL
+    if token.last_used_at is not None and (now - token.last_used_at).total_seconds() < interval:
+        return
+
+    # cache.add is atomic, only one process writes in an interval
+    if not cache.add(f"auth_token_last_used:{token.id}", True, interval):
+        return
+
+    token.last_used_at = now
+    AuthToken.objects.filter(id=token.id).update(last_used_at=now)
+
 
 class TokenAuthentication(TokenAuthentication):
     model = AuthToken
+
+    def authenticate(self, request):
+        """ Token is authenticated once per request, middlewares and DRF share the result.
+        """
+
+        context = get_request_context()
+        if context is None:
+            return super().authenticate(request)
+        return context.get_token_auth(lambda: super(TokenAuthentication, self).authenticate(request))
+
+    def authenticate_credentials(self, key):
+        token = get_auth_token(key)
+
+        if token is None or token.active is False:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if token.expires_at is not None and token.expires_at <= tz.now():
+            raise exceptions.AuthenticationFailed(_("Token expired."))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        update_last_used_at(token)
+
+        return (token.user, token)
@@ -5,7 +5,6 @@ from visitor.models import Visitor
 from member.models import Member
 from utils import fetch_data
 from django.http import JsonResponse
-from account.authentication import TokenAuthentication
 
 class AuthenticateUser:
     """ Check member or visitor is inactive.
@@ -15,19 +14,6 @@ class AuthenticateUser:
         self.get_response = get_response
 
 
-    def get_request_user(self, request):
-        """
-        Function used to get user from request
-        if request has token in request header using that we can take user
-        else we can take session authentication request.user as user
-        """
-        try:
-            return TokenAuthentication().authenticate(request)[0]
-        except Exception as error:
-            print(error)
-            print("!!!!!!!!!!!! authentication for web !!!!!!!!!!!!")
-            return request.user
-
     def __call__(self, request):
         print("")
         print("")
@@ -39,7 +25,7 @@ class AuthenticateUser:
             return response
 
 
-        user = self.get_request_user(request)
+        user = request.context.user
         if user.is_anonymous is True:
             print("======= User not found ==========")
             response = self.get_response(request)
@@ -0,0 +1,19 @@
+from utils.request_context import RequestContext, _request_context
+
+
+class RequestContextMiddleware:
+    """ Create the RequestContext of each request. Must be before every
+        middleware using it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        context = RequestContext(request)
+        request.context = context
+        token = _request_context.set(context)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_context.reset(token)
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_token_cache
+from .models import AuthToken, User
+
+
+@receiver(post_save, sender=AuthToken)
+@receiver(post_delete, sender=AuthToken)
+def invalidate_auth_token(sender, instance, **kwargs):
+    """signal receiver to drop cached auth token on deactivation or logout"""
+
+    invalidate_token_cache(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_auth_tokens(sender, instance, created, **kwargs):
+    """signal receiver to drop cached auth tokens of user, cached tokens hold the user"""
+
+    if created:
+        return
+
+    for key in instance.auth_tokens.values_list("key", flat=True):
+        invalidate_token_cache(key)
@@ -15,7 +15,6 @@ from api import permissions
 from account.models import AuthToken, User, SessionToken
 from member.models import Member
 from organization.models import Organization
-from django.http import HttpResponse
 
 from django.contrib.auth.models import AnonymousUser
 
@@ -23,6 +22,7 @@ from account.serializers import UserSerializer
 from member.serializers import MemberSerializer
 from organization.serializers import OrganizationSerializer, RoleSerializer
 from utils import create_data, fetch_data, email_funcs, read_data
+from utils.file_response import get_file_content_type, serve_file
 
 import logging
 
@@ -603,67 +603,22 @@ class FetchFileAPI(views.APIView):
             logger.error(e)
             logger.exception(f"Add exception for {e.__class__.__name__} in FetchFileAPI")
 
-        file_extension = filename.split(".")[-1]
-        if file_extension in ["jpeg", "jpg", "png"]:
-            response = HttpResponse(content_type=f"image/{file_extension}")
-            try:
-                with open(path, "rb") as img:
-                    read_image = img.read()
-                    response.write(read_image)
-            except FileNotFoundError as e:
-                print(e)
-
-                logger.error(e)
-                return read_data.get_404_response("File")
-            except Exception as e:
-                logger.error(e)
-                print(e)
-
-                logger.exception(f"Add exception for {e.__class__.__name__} in FetchFileAPI")
-                return Response(
-                    {"message": "Unknown error occurred"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        elif file_extension in ["pdf"]:
-            try:
-                response = HttpResponse(content_type=f"application/{file_extension}")
-                # response["Content-Disposition"] = f"attachment; filename={filename}"
-                with open(path, "rb") as img:
-                    read_image = img.read()
-                    response.write(read_image)
-            except Exception as e:
-                logger.error(e)
-                print(e)
-
-                logger.exception(f"Add exception for {e.__class__.__name__} in FetchFileAPI")
-                return Response(
-                    {"message": "Unknown error occurred"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-        elif file_extension in ["csv"]:
-            print("===================================================")
-            print(path)
-            print("===================================================")
-            try:
-                response = HttpResponse(content_type=f"text/{file_extension}")
-                # response["Content-Disposition"] = f"attachment; filename={filename}"
-                with open(path, "rb") as csv:
-                    read_csv = csv.read()
-                    response.write(read_csv)
-            except Exception as e:
-                logger.error(e)
-                print(e)
-
-                logger.exception(f"Add exception for {e.__class__.__name__} in FetchFileAPI")
-                return Response(
-                    {"message": "Unknown error occurred"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-        else:
+        content_type = get_file_content_type(filename)
+        if content_type is None:
             return Response(
                 {"message": "Unknown file extension"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        return response
+        try:
+            return serve_file(request, path, content_type)
+        except FileNotFoundError as e:
+            logger.error(e)
+            return read_data.get_404_response("File")
+        except Exception as e:
+            logger.error(e)
+            logger.exception(f"Add exception for {e.__class__.__name__} in FetchFileAPI")
+            return Response(
+                {"message": "Unknown error occurred"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
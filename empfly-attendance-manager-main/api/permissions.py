@@ -1,7 +1,6 @@
 from xml.sax.handler import feature_external_ges
 from rest_framework.permissions import BasePermission
 
-from member.models import Member
 from utils import fetch_data
 
 
@@ -27,6 +26,8 @@ class IsAdmin(BasePermission):
     def has_permission(self, request, view):
 
         if bool(request.auth) or bool(request.user and request.user.is_authenticated):
-            member = Member.objects.get(user=request.user)
-            return member.role == fetch_data.get_admin_role()
+            org_uuid = request.headers.get("organization-uuid")
+            org = fetch_data.get_organization(request.user, org_uuid)
+            member = fetch_data.get_member(request.user, org.uuid) if org is not None else None
+            return member is not None and fetch_data.is_admin(member)
         return False
@@ -464,6 +464,9 @@ urlpatterns = [
     path("shift-calendar/",
         shift_views.ShiftCalendarAPI.as_view()
     ),
+    path("shift-calendar/grid/",
+        shift_views.ShiftCalendarGridAPI.as_view()
+    ),
 
     # Accept/Decline visitation for logged in user
     path("visitations/confirm/<uuid:uuid>/",
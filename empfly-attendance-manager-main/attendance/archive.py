@@ -0,0 +1,158 @@
+import datetime as dt
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from attendance.models import ArchivedAttendance, ArchivedMemberScan, Attendance, MemberPresence, MemberScan
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+AttendanceScan = Attendance.scans.through
+
+
+def get_month_start(date: dt.date) -> dt.date:
+    return date.replace(day=1)
+
+
+def add_months(month: dt.date, months: int) -> dt.date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return dt.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_months(first_date: dt.date, last_date: dt.date) -> list:
+    """ First day of every month from first_date to last_date
+    """
+
+    months = []
+    month = get_month_start(first_date)
+    while month <= last_date:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def create_archive_partition(model, month: dt.date) -> None:
+    """ Create monthly partition of an archive table if it does not exist
+    """
+
+    table = model._meta.db_table
+    partition = connection.ops.quote_name(f"{table}_p{month:%Y%m}")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {connection.ops.quote_name(table)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)],
+        )
+
+
+def create_archive_partitions(first_date: dt.date, last_date: dt.date) -> None:
+    for month in get_months(first_date, last_date):
+        create_archive_partition(ArchivedAttendance, month)
+        create_archive_partition(ArchivedMemberScan, month)
+
+
+def get_columns(model) -> str:
+    return ", ".join(connection.ops.quote_name(field.column) for field in model._meta.concrete_fields)
+
+
+def copy_scans_to_archive(scan_ids: list) -> None:
+
+    date_range = MemberScan.objects.filter(id__in=scan_ids).aggregate(first=Min("date_time"), last=Max("date_time"))
+    if date_range["first"] is None:
+        return
+
+    # Partition bounds of date_time are UTC dates, like the session timezone
+    create_archive_partitions(
+        date_range["first"].astimezone(dt.timezone.utc).date(),
+        date_range["last"].astimezone(dt.timezone.utc).date(),
+    )
+
+    columns = get_columns(MemberScan)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {ArchivedMemberScan._meta.db_table} ({columns}) "
+            f"SELECT {columns} FROM {MemberScan._meta.db_table} WHERE id = ANY(%s)",
+            [scan_ids],
+        )
+
+
+def delete_scans(scan_ids: list) -> None:
+    """ Delete scans without loading them. Attendance links and presence
+        last_scan are the only references to a scan, so both are cleared first.
+    """
+
+    AttendanceScan.objects.filter(memberscan_id__in=scan_ids).delete()
+    MemberPresence.objects.filter(last_scan_id__in=scan_ids).update(last_scan=None)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {MemberScan._meta.db_table} WHERE id = ANY(%s)", [scan_ids])
+
+
+def archive_attendances(attendance_ids: list) -> tuple:
+    """ Move attendances and their scans to the archive tables.
+
+        return: (archived attendances count, archived scans count)
+    """
+
+    with transaction.atomic():
+        date_range = Attendance.objects.filter(id__in=attendance_ids).aggregate(first=Min("date"), last=Max("date"))
+        if date_range["first"] is None:
+            return 0, 0
+        create_archive_partitions(date_range["first"], date_range["last"])
+
+        columns = get_columns(Attendance)
+        through_table = AttendanceScan._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {ArchivedAttendance._meta.db_table} ({columns}, scan_ids) "
+                f"SELECT {columns}, ARRAY(SELECT memberscan_id FROM {through_table} "
+                f"WHERE attendance_id = {Attendance._meta.db_table}.id ORDER BY memberscan_id) "
+                f"FROM {Attendance._meta.db_table} WHERE id = ANY(%s)",
+                [attendance_ids],
+            )
+
+        scan_ids = list(
+            AttendanceScan.objects.filter(attendance_id__in=attendance_ids)
+            .values_list("memberscan_id", flat=True)
+            .distinct()
+        )
+        if scan_ids:
+            copy_scans_to_archive(scan_ids)
+            delete_scans(scan_ids)
+
+        # Scans of the attendances are deleted above, so no pre_delete signal is needed
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Attendance._meta.db_table} WHERE id = ANY(%s)", [attendance_ids])
+
+    return len(attendance_ids), len(scan_ids)
+
+
+def archive_scans(scan_ids: list) -> int:
+    """ Move scans that are not part of any attendance to the archive table
+    """
+
+    with transaction.atomic():
+        copy_scans_to_archive(scan_ids)
+        delete_scans(scan_ids)
+    return len(scan_ids)
+
+
+def get_archivable_attendance_ids(cutoff_date: dt.date, batch_size: int) -> list:
+    return list(
+        Attendance.objects.filter(date__lt=cutoff_date).order_by("id").values_list("id", flat=True)[:batch_size]
+    )
+
+
+def get_archivable_scan_ids(cutoff: dt.datetime, batch_size: int) -> list:
+    """ Computed or expired scans older than cutoff that are not part of any attendance.
+        Pending scans are never archived.
+    """
+
+    return list(
+        MemberScan.objects.filter(date_time__lt=cutoff, is_computed=True, attendance__isnull=True)
+        .exclude(status="pending")
+        .order_by("id")
+        .values_list("id", flat=True)[:batch_size]
+    )
@@ -0,0 +1,442 @@
+import logging
+import zoneinfo
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone as tz
+
+from attendance.attendance_metrics import (
+    MAX_MINUTES,
+    apply_attendance_metrics,
+    compute_attendance_metrics,
+    to_epoch_seconds,
+)
+from attendance.models import Attendance, AttendanceComputationHistory, MemberScan
+from organization.models import Holiday
+from shift.models import Shift, ShiftScheduleLog
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+logger = logging.getLogger(__name__)
+
+# Max rows per bulk insert/update and per id__in chunk
+BATCH_SIZE = 1000
+
+ATTENDANCE_UPDATE_FIELDS = [
+    "duration",
+    "late_check_in",
+    "early_check_out",
+    "late_check_out",
+    "overtime",
+    "ot_status",
+    "status",
+]
+
+
+def chunks(items: list, size: int = BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ShiftAttendanceComputation:
+    """ Compute attendance of every employee of a shift for one attendance date.
+
+        Logs, scans, holidays and existing attendances are loaded with one query
+        each, metrics are computed in memory and results are written with bulk
+        queries. Query count doesn't depend on the number of employees.
+    """
+
+    max_minutes = MAX_MINUTES
+
+    def __init__(
+        self,
+        organization,
+        shift,
+        attendance_date,
+        org_timezone,
+        computation_start_date_time,
+        computation_end_date_time,
+        actual_shift_start_dt,
+        actual_shift_end_dt,
+    ) -> None:
+        self.organization = organization
+        self.shift = shift
+        self.attendance_date = attendance_date
+        self.org_timezone = org_timezone
+        self.computation_start_date_time = computation_start_date_time
+        self.computation_end_date_time = computation_end_date_time
+        self.actual_shift_start_dt = actual_shift_start_dt
+        self.actual_shift_end_dt = actual_shift_end_dt
+
+        self.employee_count = 0
+        self.status = "started"
+
+        shift_management_settings = organization.shift_management_settings
+        self.org_ot_approval = shift_management_settings.get("ot_approval", False)
+        self.automated_ot_approval = shift_management_settings.get("automated_ot_approval", True)
+
+    def get_employees(self) -> list:
+        """ Active employees having an active log of the shift on attendance date.
+        """
+
+        shift_schedule_logs = ShiftScheduleLog.objects.filter(
+            Q(start_date__lte=self.attendance_date, end_date__gte=self.attendance_date)
+            | Q(start_date__lte=self.attendance_date, end_date=None),
+            organization=self.organization,
+            shift=self.shift,
+            status="active",
+        ).select_related("employee__org_location")
+
+        employees = []
+        for shift_schedule_log in shift_schedule_logs:
+            employee = shift_schedule_log.employee
+            if employee.status == "inactive":
+                continue
+            employees.append(employee)
+        return employees
+
+    def get_scans(self, employee_ids: list) -> dict:
+        """ Pending scans of computation window. return: {member_id: [(id, date_time)]}
+            in chronological order.
+        """
+
+        scans = defaultdict(list)
+        for employee_ids_chunk in chunks(employee_ids):
+            rows = MemberScan.objects.filter(
+                member_id__in=employee_ids_chunk,
+                status="pending",
+                is_computed=False,
+                date_time__gte=self.computation_start_date_time,
+                date_time__lte=self.computation_end_date_time,
+            ).order_by("member_id", "date_time").values_list("id", "member_id", "date_time")
+
+            for scan_id, member_id, date_time in rows:
+                scans[member_id].append((scan_id, date_time))
+        return scans
+
+    def get_holiday_org_location_ids(self) -> set:
+        """ Org location ids of active holidays on attendance date.
+            None in the set means a holiday for all the members of the org.
+        """
+
+        return set(
+            Holiday.objects.filter(
+                organization=self.organization, date=self.attendance_date, is_active=True
+            ).values_list("org_location_id", flat=True)
+        )
+
+    def get_attendances(self, employee_ids: list) -> dict:
+        """ Already created attendances of attendance date. return: {member_id: Attendance}
+        """
+
+        attendances = {}
+        for employee_ids_chunk in chunks(employee_ids):
+            rows = Attendance.objects.filter(
+                member_id__in=employee_ids_chunk,
+                date=self.attendance_date,
+                organization=self.organization,
+                shift=self.shift,
+            )
+            for attendance in rows:
+                attendances.setdefault(attendance.member_id, attendance)
+        return attendances
+
+    def is_have_holiday(self, employee, holiday_org_location_ids: set) -> bool:
+
+        # Applicable holiday for all the members in the org
+        if None in holiday_org_location_ids:
+            return True
+
+        employee_org_location = employee.org_location
+        if not employee_org_location:
+            return False
+
+        return (
+            employee_org_location.status == "active"
+            and employee_org_location.id in holiday_org_location_ids
+        )
+
+    def get_metrics(self, scans: dict) -> dict:
+        """ Duration, late check-in, early/late check-out and overtime of every
+            employee with scans, computed together by compute_attendance_metrics.
+            return: {member_id: metrics row}
+        """
+
+        member_ids = [member_id for member_id, employee_scans in scans.items() for _ in employee_scans]
+        date_times = [date_time for employee_scans in scans.values() for _, date_time in employee_scans]
+
+        metrics = compute_attendance_metrics(
+            member_ids=member_ids,
+            scan_epochs=to_epoch_seconds(date_times),
+            shift_start_epoch=self.actual_shift_start_dt.timestamp(),
+            shift_end_epoch=self.actual_shift_end_dt.timestamp(),
+            present_working_minutes=self.shift.present_working_hours * 60,
+            max_minutes=self.max_minutes,
+        )
+        return {row.Index: row for row in metrics.itertuples()}
+
+    def set_attendance_metrics(self, attendance: Attendance, metrics, is_holiday: bool) -> None:
+        """ Set duration, late check-in, early/late check-out, overtime and status
+            from the metrics row of the employee.
+        """
+
+        apply_attendance_metrics(
+            attendance,
+            metrics,
+            self.shift,
+            self.attendance_date,
+            is_holiday,
+            self.org_ot_approval,
+            self.automated_ot_approval,
+        )
+
+    def compute(self) -> None:
+        """ Compute and save attendance of all employees of the shift.
+        """
+
+        employees = self.get_employees()
+        employee_ids = [employee.id for employee in employees]
+
+        scans = self.get_scans(employee_ids)
+        metrics = self.get_metrics(scans)
+        attendances = self.get_attendances(employee_ids)
+        holiday_org_location_ids = self.get_holiday_org_location_ids()
+
+        logging.info(f"employees: {len(employees)}, employees with scans: {len(scans)}")
+
+        new_attendances, updated_attendances = [], []
+        computed_scan_ids, expired_scan_ids = [], []
+        # (attendance, scan ids) for adding scans after attendances have ids
+        attendance_scans = []
+
+        for employee in employees:
+            try:
+                is_holiday = self.is_have_holiday(employee, holiday_org_location_ids)
+                attendance = attendances.get(employee.id)
+                employee_scans = scans.get(employee.id)
+
+                # If member scan count is more than zero, compute attendance
+                if employee_scans:
+                    if attendance is None:
+                        attendance = Attendance(
+                            member=employee,
+                            date=self.attendance_date,
+                            organization=self.organization,
+                            shift=self.shift,
+                        )
+                        new_attendances.append(attendance)
+                    else:
+                        updated_attendances.append(attendance)
+
+                    scan_ids = [scan_id for scan_id, _ in employee_scans]
+                    self.set_attendance_metrics(attendance, metrics[employee.id], is_holiday)
+
+                    # Even number of scans are computed. Last odd scan is expired.
+                    if len(scan_ids) % 2 == 0:
+                        computed_scan_ids += scan_ids
+                    else:
+                        computed_scan_ids += scan_ids[:-1]
+                        expired_scan_ids.append(scan_ids[-1])
+
+                    attendance_scans.append((attendance, scan_ids))
+
+                # Duplicate attendance record for employee prevented.
+                elif attendance is None:
+                    # mark attendance status as weekend if weekday is in skip days
+                    if self.attendance_date.weekday() in self.shift.skip_days:
+                        status = "weekend"
+                    # mark attendance status as holiday if current day is holiday
+                    elif is_holiday:
+                        status = "holiday"
+                    # If no scans, mark employee as absent
+                    else:
+                        status = "absent"
+
+                    new_attendances.append(
+                        Attendance(
+                            member=employee,
+                            date=self.attendance_date,
+                            organization=self.organization,
+                            shift=self.shift,
+                            duration=0.0,
+                            status=status,
+                        )
+                    )
+
+                # if attendance computation for this employee is successfull
+                # increment the employee count by one
+                self.employee_count += 1
+
+            except Exception as error:
+                logging.error(f"Error {error.__class__.__name__}: {error}")
+                logging.error(f"Failed to compute attendance for {employee} on {self.attendance_date}")
+                self.status = "failed"
+
+        self.save(new_attendances, updated_attendances, computed_scan_ids, expired_scan_ids, attendance_scans)
+
+    @transaction.atomic
+    def save(self, new_attendances, updated_attendances, computed_scan_ids, expired_scan_ids, attendance_scans):
+
+        Attendance.objects.bulk_create(new_attendances, batch_size=BATCH_SIZE)
+        Attendance.objects.bulk_update(updated_attendances, ATTENDANCE_UPDATE_FIELDS, batch_size=BATCH_SIZE)
+
+        # change status to computed and set is_computed to True
+        for scan_ids in chunks(computed_scan_ids):
+            MemberScan.objects.filter(id__in=scan_ids).update(is_computed=True, status="computed")
+
+        # change status to expired and set is_computed to True
+        for scan_ids in chunks(expired_scan_ids):
+            MemberScan.objects.filter(id__in=scan_ids).update(is_computed=True, status="expired")
+
+        AttendanceScan = Attendance.scans.through
+        AttendanceScan.objects.bulk_create(
+            [
+                AttendanceScan(attendance_id=attendance.id, memberscan_id=scan_id)
+                for attendance, scan_ids in attendance_scans
+                for scan_id in scan_ids
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+        logging.info(
+            f"attendance created: {len(new_attendances)}, updated: {len(updated_attendances)}, "
+            f"scans computed: {len(computed_scan_ids)}, expired: {len(expired_scan_ids)}"
+        )
+
+
+def get_due_shifts(organization, current_time) -> "QuerySet":
+    """ Shifts whose computation hour is less than or equal to current hour.
+    """
+
+    return Shift.objects.filter(
+        organization=organization,
+        computation_time__hour__lte=current_time.hour,
+    )
+
+
+def get_shift_computation_window(shift, current_date, org_timezone) -> dict:
+    """ Attendance date, actual shift start/end and scan window of the shift
+        computation which runs on current_date.
+    """
+
+    computation_time = shift.computation_time
+
+    diff_in_start_comp_hour = computation_time.hour - shift.start_time.hour
+    diff_in_end_comp_hour = computation_time.hour - shift.end_time.hour
+
+    logging.info(f"diff_in_start_comp_hour: {diff_in_start_comp_hour}")
+    logging.info(f"diff_in_end_comp_hour: {diff_in_end_comp_hour}")
+
+    # Shift started on previous day if computation hour is not after start hour
+    if diff_in_start_comp_hour > 0:
+        attendance_date = current_date
+    else:
+        attendance_date = current_date - tz.timedelta(days=1)
+
+    # Shift ended on previous day if computation hour is before end hour
+    if diff_in_end_comp_hour < 0:
+        shift_end_date = current_date - tz.timedelta(days=1)
+    else:
+        shift_end_date = current_date
+
+    return {
+        "attendance_date": attendance_date,
+        "actual_shift_start_dt": tz.make_aware(
+            tz.datetime.combine(attendance_date, shift.start_time), timezone=org_timezone
+        ),
+        "actual_shift_end_dt": tz.make_aware(
+            tz.datetime.combine(shift_end_date, shift.end_time), timezone=org_timezone
+        ),
+        # computation start date time (previous day Computation time)
+        "computation_start_date_time": tz.make_aware(
+            tz.datetime.combine(current_date - tz.timedelta(days=1), computation_time), timezone=org_timezone
+        ),
+        # computation end date time (current day Computation time)
+        "computation_end_date_time": tz.make_aware(
+            tz.datetime.combine(current_date, computation_time), timezone=org_timezone
+        ),
+    }
+
+
+def claim_shift_computation(shift, attendance_date, now) -> AttendanceComputationHistory:
+    """ Create computation history of shift for attendance date. Returns None
+        if it is already computed or claimed by another worker.
+
+        Shift row is locked while checking and creating the history, so two
+        workers can never claim the same shift and attendance date.
+    """
+
+    with transaction.atomic():
+        Shift.objects.select_for_update().filter(id=shift.id).first()
+
+        if AttendanceComputationHistory.objects.filter(
+            organization_id=shift.organization_id,
+            shift=shift,
+            attendance_date=attendance_date,
+        ).exists():
+            return None
+
+        return AttendanceComputationHistory.objects.create(
+            shift=shift,
+            organization_id=shift.organization_id,
+            status="started",
+            employee_count=0,
+            computation_started_at=now,
+            attendance_date=attendance_date,
+        )
+
+
+def compute_shift_attendance(shift_id: int, now: str) -> None:
+    """ Compute attendance of one shift. now is the ISO date time of the run in
+        org timezone. Used by compute_attendance command, its worker pool and
+        compute_shift_attendance_task.
+    """
+
+    try:
+        shift = Shift.objects.select_related("organization").get(id=shift_id)
+    except Shift.DoesNotExist:
+        logging.error(f"Shift {shift_id} not found for attendance computation.")
+        return
+
+    organization = shift.organization
+    org_timezone = zoneinfo.ZoneInfo(organization.timezone if organization.timezone else "UTC")
+    now = tz.localtime(tz.datetime.fromisoformat(now), timezone=org_timezone)
+
+    logging.info(f"____________________________{shift.name}________________________________")
+    logging.info(f"Organization: {organization}, shift uuid: {shift.uuid}, now: {now}")
+
+    window = get_shift_computation_window(shift, now.date(), org_timezone)
+    attendance_date = window["attendance_date"]
+    logging.info(f"computation window: {window}")
+
+    history_obj = claim_shift_computation(shift, attendance_date, now)
+    if history_obj is None:
+        logging.info(f"Shift {shift.uuid} already computed for {attendance_date}. Skipping the computation.")
+        return
+
+    shift_attendance_computation = ShiftAttendanceComputation(
+        organization=organization,
+        shift=shift,
+        org_timezone=org_timezone,
+        **window,
+    )
+
+    try:
+        shift_attendance_computation.compute()
+        status = shift_attendance_computation.status
+    except Exception as error:
+        logging.error(f"Error {error.__class__.__name__}: {error}")
+        # if the attendance computation is failed
+        # set the attendance computation history status as failed
+        status = "failed"
+
+    # if attendance_computation is not failed set status as completed else as failed
+    history_obj.status = "completed" if status != "failed" else "failed"
+    history_obj.employee_count = shift_attendance_computation.employee_count
+    history_obj.computation_ended_at = tz.localtime(tz.now(), timezone=org_timezone)
+    history_obj.save()
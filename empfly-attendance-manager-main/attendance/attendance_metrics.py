@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from attendance.constants import MAX_MIN_FOR_OT_REQUEST
+
+
+# Durations are limited to 24 hours in minutes
+MAX_MINUTES = 1440
+
+METRIC_COLUMNS = [
+    "scans_count",
+    "duration",
+    "late_check_in",
+    "early_check_out",
+    "late_check_out",
+    "overtime",
+]
+
+
+def to_epoch_seconds(date_times: list) -> np.ndarray:
+    """ Aware date times to seconds since epoch as float64 array
+    """
+
+    if len(date_times) == 0:
+        return np.empty(0, dtype=np.float64)
+    return np.array([date_time.timestamp() for date_time in date_times], dtype=np.float64)
+
+
+def compute_attendance_metrics(
+    member_ids: np.ndarray,
+    scan_epochs: np.ndarray,
+    shift_start_epoch: float,
+    shift_end_epoch: float,
+    present_working_minutes: float,
+    max_minutes: float = MAX_MINUTES,
+) -> pd.DataFrame:
+    """ Attendance metrics of every member of a shift from their scans.
+
+        member_ids and scan_epochs are parallel arrays with one row per scan, in
+        any order. Scans of a member are paired in chronological order as
+        (check-in, check-out); the last scan of an odd count is not used.
+
+        return: DataFrame indexed by member_id with METRIC_COLUMNS in minutes.
+        late_check_in, overtime, late/early check-out are NaN when not applicable.
+        All values are limited to max_minutes, except early_check_out which is
+        the absolute difference from shift end.
+    """
+
+    member_ids = np.asarray(member_ids)
+    scan_epochs = np.asarray(scan_epochs, dtype=np.float64)
+
+    if member_ids.size == 0:
+        return pd.DataFrame(columns=METRIC_COLUMNS, index=pd.Index([], name="member_id"))
+
+    order = np.lexsort((scan_epochs, member_ids))
+    member_ids = member_ids[order]
+    scan_epochs = scan_epochs[order]
+
+    # first row of each member
+    starts = np.flatnonzero(np.r_[True, member_ids[1:] != member_ids[:-1]])
+    counts = np.diff(np.r_[starts, member_ids.size])
+    positions = np.arange(member_ids.size) - np.repeat(starts, counts)
+
+    # duration of every (check-in, check-out) pair, summed per member
+    pair_starts = np.flatnonzero((positions % 2 == 0) & (positions + 1 < np.repeat(counts, counts)))
+    pair_minutes = (scan_epochs[pair_starts + 1] - scan_epochs[pair_starts]) / 60
+    pair_groups = np.searchsorted(starts, pair_starts, side="right") - 1
+    duration = np.bincount(pair_groups, weights=pair_minutes, minlength=starts.size)
+    duration = np.minimum(duration, max_minutes)
+
+    late_check_in = (scan_epochs[starts] - shift_start_epoch) / 60
+    late_check_in = np.where(late_check_in > 0, np.minimum(late_check_in, max_minutes), np.nan)
+
+    # last check-out scan is the last even scan
+    has_check_out = counts > 1
+    last_check_out = starts + np.maximum(counts - counts % 2 - 1, 0)
+    check_out_difference = (scan_epochs[last_check_out] - shift_end_epoch) / 60
+
+    late_check_out = np.where(
+        has_check_out & (check_out_difference > 0), np.minimum(check_out_difference, max_minutes), np.nan
+    )
+    early_check_out = np.where(has_check_out & (check_out_difference <= 0), -check_out_difference, np.nan)
+
+    overtime = duration - present_working_minutes
+    overtime = np.where(has_check_out & (overtime > 0), np.minimum(overtime, max_minutes), np.nan)
+
+    return pd.DataFrame(
+        {
+            "scans_count": counts,
+            "duration": duration,
+            "late_check_in": late_check_in,
+            "early_check_out": early_check_out,
+            "late_check_out": late_check_out,
+            "overtime": overtime,
+        },
+        index=pd.Index(member_ids[starts], name="member_id"),
+    )
+
+
+def get_attendance_status(
+    duration: float, shift, attendance_date, is_holiday: bool
+) -> str:
+    """ Status of an attendance of duration minutes in shift on attendance_date
+    """
+
+    if is_holiday:
+        return "holiday"
+
+    # mark attendance status as weekend if weekday is in skip days
+    if attendance_date.weekday() in shift.skip_days:
+        return "weekend"
+
+    attendance_duration_in_hours = duration / 60
+    if attendance_duration_in_hours >= shift.present_working_hours:
+        return "present"
+    elif attendance_duration_in_hours >= shift.partial_working_hours:
+        return "partial"
+    return "absent"
+
+
+def apply_attendance_metrics(
+    attendance,
+    metrics,
+    shift,
+    attendance_date,
+    is_holiday: bool,
+    org_ot_approval: bool,
+    automated_ot_approval: bool,
+) -> None:
+    """ Set duration, late check-in, early/late check-out, overtime, OT status and
+        status of attendance from a metrics row of compute_attendance_metrics.
+        Shared by attendance computation and its rerun/revert commands.
+    """
+
+    attendance.duration = float(metrics.duration)
+
+    if not pd.isna(metrics.late_check_in):
+        attendance.late_check_in = float(metrics.late_check_in)
+
+    if not pd.isna(metrics.late_check_out):
+        attendance.late_check_out = float(metrics.late_check_out)
+
+    if not pd.isna(metrics.early_check_out):
+        attendance.early_check_out = float(metrics.early_check_out)
+
+    # Check overtime is exists then give for OT approval.
+    if not pd.isna(metrics.overtime):
+        overtime = float(metrics.overtime)
+        attendance.overtime = overtime
+
+        if org_ot_approval is True and overtime >= MAX_MIN_FOR_OT_REQUEST:
+            # Enable ot manually or raise request automatically
+            attendance.ot_status = "ot_available" if automated_ot_approval is False else "ot_requested"
+            attendance.duration = attendance.duration - overtime
+        else:
+            attendance.ot_status = None
+
+    attendance.status = get_attendance_status(attendance.duration, shift, attendance_date, is_holiday)
@@ -1,6 +1,7 @@
 from datetime import datetime, date
 from member.models import Member
 from organization.models import SystemLocation
+from attendance.geofence import get_geofence_index
 from shift.models import LocationSettings
 from utils.face_rec import get_face_encodings, get_image_encoding, get_user_ids
 from utils.response import HTTP_400
@@ -328,17 +329,20 @@ def geo_fencing_for_loc_settings(
     longitude: str,
     location_settings: LocationSettings,
 ):
-    """ Check geo fencing for location settings. If system location matched function will end.
+    """ Check geo fencing for location settings. First matching active system location,
+        in order of location settings, is returned.
     """
     if not latitude or not longitude:
         raise ValidationError("Latitude and Longitude is required.")
 
-    for location in location_settings:
-
-        system_loc = location.system_location
-        try:
-            return geo_fencing(latitude, longitude, system_loc)
-        except ValidationError:
-            pass
+    rows = list(location_settings.values_list("system_location_id", "organization_id"))
+    if rows:
+        index = get_geofence_index(rows[0][1])
+        system_location = index.match(
+            float(latitude), float(longitude), [system_location_id for system_location_id, _ in rows]
+        )
+        if system_location is not None:
+            logging.info(f"=========== Geo Location Matched Successfully ===========")
+            return system_location
 
     raise ValidationError("Location Does Not Match.")
@@ -1,13 +1,40 @@
+import datetime as dt
+
+from django.db.models import Q
+from django.utils import timezone as tz
+from django.forms import BooleanField
 
 from account.models import User
 from attendance.models import Attendance, MemberScan
 from member.models import Member
+from attendance.search import search_attendance, search_member_scan
 from visitor.filters import convert_query_params_to_dict, set_if_not_none
 
 
 def filter_member_scan(qs: MemberScan, request) -> MemberScan:
+    return filter_member_scan_by_params(qs, request.GET)
 
-    filter_query = convert_query_params_to_dict(request.GET)
+
+def get_date_time_range_lookups(start_date: str, end_date: str) -> dict:
+    """ date_time range of start_date and end_date days in current timezone.
+        Same rows as date_time__date__gte/lte, but the range can use the
+        date_time indexes instead of casting every row to a date.
+    """
+
+    lookups = {}
+    current_timezone = tz.get_current_timezone()
+    if start_date is not None:
+        start = dt.datetime.combine(dt.date.fromisoformat(start_date), dt.time.min)
+        lookups["date_time__gte"] = tz.make_aware(start, current_timezone)
+    if end_date is not None:
+        end = dt.datetime.combine(dt.date.fromisoformat(end_date) + dt.timedelta(days=1), dt.time.min)
+        lookups["date_time__lt"] = tz.make_aware(end, current_timezone)
+    return lookups
+
+
+def filter_member_scan_by_params(qs: MemberScan, query_params) -> MemberScan:
+
+    filter_query = convert_query_params_to_dict(query_params)
 
     if filter_query is None:
         return qs
@@ -31,13 +58,24 @@ def filter_member_scan(qs: MemberScan, request) -> MemberScan:
             continue
         set_if_not_none(filter_query_dict, key, value, new_key)
 
+    filter_query_dict.update(
+        get_date_time_range_lookups(
+            filter_query_dict.pop("date_time__date__gte", None),
+            filter_query_dict.pop("date_time__date__lte", None),
+        )
+    )
+
     return qs.filter(**filter_query_dict)
 
 
 
 def filter_attendance(qs: Attendance, request) -> Attendance:
+    return filter_attendance_by_params(qs, request.GET)
 
-    filter_query = convert_query_params_to_dict(request.GET)
+
+def filter_attendance_by_params(qs: Attendance, query_params) -> Attendance:
+
+    filter_query = convert_query_params_to_dict(query_params)
 
     if filter_query is None:
         return qs
@@ -142,3 +180,74 @@ def filter_my_attendance(qs: Attendance, request) -> Attendance:
 
     return qs.filter(**filter_query_dict)
 
+
+def get_manager_scope(member: Member) -> Q:
+    """ Members visible to a manager: members of the org locations and departments
+        they head and their direct reports. None if member is not a manager.
+    """
+
+    org_location_obj = member.org_location_head.all()
+    department_obj = member.department_head.all()
+    employees = member.members.all()
+
+    if org_location_obj.exists() or department_obj.exists() or employees.exists():
+        return (
+            Q(member__org_location__in=org_location_obj)
+            | Q(member__department__in=department_obj)
+            | Q(member__manager=member)
+        )
+    return None
+
+
+def get_attendance_report_queryset(org, member: Member, query_params) -> Attendance:
+    """ Attendances of attendance report for member with status, manager scope,
+        filters and search of query_params applied. Used by AttendanceReportAPI
+        and by attendance export.
+    """
+
+    filter_query = Q(organization=org)
+
+    filter_status = query_params.get("status", "active")
+    if filter_status in ("active", "inactive"):
+        filter_query &= Q(member__status=filter_status)
+
+    attendance = Attendance.objects.filter(filter_query)
+
+    is_mobile = BooleanField().to_python(query_params.get("is_mobile", "False"))
+
+    if is_mobile is True:                                # Mobile app only required logged in user only data
+        attendance = attendance.filter(member=member)
+
+    elif member.role.name not in ("admin", "hr"):        # Check for member is manager
+        manager_scope = get_manager_scope(member)
+        if manager_scope is not None:
+            attendance = attendance.filter(manager_scope)
+        else:                                            # Only curr member data will show
+            attendance = attendance.filter(member=member)
+
+    attendance = filter_attendance_by_params(attendance, query_params)
+    return search_attendance(attendance, query_params.get("search"))
+
+
+def get_member_scans_queryset(org, member: Member, query_params) -> MemberScan:
+    """ Member scans of attendance register for member with status, manager scope,
+        filters and search of query_params applied. Used by AllMemberScansAPI
+        and by attendance register export.
+    """
+
+    member_scans = MemberScan.objects.filter(organization=org)
+
+    filter_status = query_params.get("status", "active")
+    if filter_status in ("active", "inactive"):
+        member_scans = member_scans.filter(member__status=filter_status)
+
+    if member.role.name not in ("admin", "hr"):
+        manager_scope = get_manager_scope(member)
+        if manager_scope is not None:
+            member_scans = member_scans.filter(manager_scope)
+        else:
+            # Only see his data
+            member_scans = member_scans.filter(member=member)
+
+    member_scans = filter_member_scan_by_params(member_scans, query_params)
+    return search_member_scan(member_scans, query_params.get("search"))
@@ -0,0 +1,209 @@
+import math
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from geopy.distance import geodesic
+
+from organization.models import SystemLocation
+from utils.cache import bump_version, get_version, is_cache_shared
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Mean earth radius used by haversine
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+# Locations whose bounding box covers more cells than this are checked for every scan
+MAX_CELLS_PER_LOCATION = 1024
+
+
+def haversine(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """ Distance in meters from one point to many. All angles in radians.
+    """
+
+    a = (
+        np.sin((latitudes - latitude) / 2) ** 2
+        + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeofenceIndex:
+    """ Active system locations of an organization as lat/lon/radius arrays
+        with a grid of cell -> locations whose radius overlaps the cell.
+
+        A scan only tests the locations of its cell with vectorized haversine.
+        Haversine is within EXACT_MARGIN of the geodesic distance used before,
+        so geodesic is only computed for scans that close to a boundary.
+    """
+
+    EXACT_MARGIN = 0.006
+    EXACT_MARGIN_M = 1.0
+
+    EMPTY = np.empty(0, dtype=np.int64)
+
+    def __init__(self, version: tuple, system_locations: list, cell_degrees: float):
+        self.version = version
+        self.cell_degrees = cell_degrees
+        self.columns = max(1, math.ceil(360 / cell_degrees))
+
+        self.locations = list(system_locations)
+        self.positions = {location.id: position for position, location in enumerate(self.locations)}
+
+        self.latitudes = np.radians(np.array([float(l.latitude) for l in self.locations], dtype=np.float64))
+        self.longitudes = np.radians(np.array([float(l.longitude) for l in self.locations], dtype=np.float64))
+        self.radii = np.array([float(l.radius) for l in self.locations], dtype=np.float64)
+
+        cells = defaultdict(list)
+        wide = []
+        for position, location in enumerate(self.locations):
+            location_cells = self.get_covered_cells(
+                float(location.latitude), float(location.longitude), self.radii[position]
+            )
+            if location_cells is None:
+                wide.append(position)
+                continue
+            for cell in location_cells:
+                cells[cell].append(position)
+
+        self.cells = {cell: np.array(positions, dtype=np.int64) for cell, positions in cells.items()}
+        self.wide = np.array(wide, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def get_cell(self, latitude: float, longitude: float) -> tuple:
+        row = math.floor((latitude + 90) / self.cell_degrees)
+        column = math.floor((longitude + 180) / self.cell_degrees) % self.columns
+        return row, column
+
+    def get_covered_cells(self, latitude: float, longitude: float, radius: float) -> list:
+        """ Cells of the bounding box of a location, None if there are too many
+        """
+
+        reach = radius * (1 + self.EXACT_MARGIN) + self.EXACT_MARGIN_M
+        latitude_reach = reach / METERS_PER_DEGREE
+        cos_latitude = math.cos(math.radians(latitude))
+        if cos_latitude * 180 * METERS_PER_DEGREE <= reach:
+            return None
+        longitude_reach = reach / (METERS_PER_DEGREE * cos_latitude)
+
+        first_row, first_column = self.get_cell(latitude - latitude_reach, longitude - longitude_reach)
+        last_row, last_column = self.get_cell(latitude + latitude_reach, longitude + longitude_reach)
+        column_count = (last_column - first_column) % self.columns + 1
+
+        if (last_row - first_row + 1) * column_count > MAX_CELLS_PER_LOCATION:
+            return None
+
+        return [
+            (row, (first_column + offset) % self.columns)
+            for row in range(first_row, last_row + 1)
+            for offset in range(column_count)
+        ]
+
+    def get_candidates(self, latitude: float, longitude: float) -> np.ndarray:
+        candidates = self.cells.get(self.get_cell(latitude, longitude), self.EMPTY)
+        if len(self.wide):
+            candidates = np.union1d(candidates, self.wide)
+        return candidates
+
+    def match(self, latitude: float, longitude: float, location_ids: list = None) -> SystemLocation:
+        """ First location whose radius contains the point, None if there is none.
+
+            location_ids: locations allowed, in order of preference. All
+            locations of the index in any order if not given.
+        """
+
+        candidates = self.get_candidates(latitude, longitude)
+        if location_ids is not None:
+            allowed = np.array(
+                [self.positions[i] for i in location_ids if i in self.positions], dtype=np.int64
+            )
+            candidates = allowed[np.isin(allowed, candidates)]
+
+        if len(candidates) == 0:
+            return None
+
+        distances = haversine(
+            math.radians(latitude), math.radians(longitude),
+            self.latitudes[candidates], self.longitudes[candidates],
+        )
+        radii = self.radii[candidates]
+        margins = distances * self.EXACT_MARGIN + self.EXACT_MARGIN_M
+
+        inside = distances <= radii - margins
+        near = ~inside & (distances <= radii + margins)
+
+        for i in np.flatnonzero(inside | near):
+            location = self.locations[candidates[i]]
+            if near[i]:
+                distance = geodesic((location.latitude, location.longitude), (latitude, longitude)).m
+                if distance > radii[i]:
+                    continue
+            return location
+
+        return None
+
+
+# Indexes are cached per process and keyed by organization id
+_geofence_indexes = {}
+_geofence_indexes_lock = threading.Lock()
+
+
+def get_geofence_version_key(org_id) -> str:
+    return f"geofence_version:{org_id}"
+
+
+def get_geofence_version(org_id) -> tuple:
+    """ Version of the system locations of org. SystemLocation save and delete
+        signals bump it in the shared cache, so a scan reads one key. Without a
+        shared cache bumps are not seen by other workers, so the stamp (count,
+        active count, latest updated_at) is read from DB.
+    """
+
+    if is_cache_shared():
+        return (get_version(get_geofence_version_key(org_id)),)
+
+    stamp = SystemLocation.objects.filter(organization_id=org_id).order_by().aggregate(
+        count=Count("id"),
+        active_count=Count("id", filter=Q(status="active")),
+        last_updated_at=Max("updated_at"),
+    )
+    return (stamp["count"], stamp["active_count"], stamp["last_updated_at"])
+
+
+def invalidate_geofence_index(org_id) -> None:
+    """ Drop cached index of org, in every worker with a shared cache. Called
+        when a system location of org changes.
+    """
+
+    _geofence_indexes.pop(org_id, None)
+    if is_cache_shared():
+        bump_version(get_geofence_version_key(org_id))
+
+
+def get_geofence_index(org_id) -> GeofenceIndex:
+    """ Get cached geofence index of org. Rebuild if any system location is changed.
+    """
+
+    version = get_geofence_version(org_id)
+
+    index = _geofence_indexes.get(org_id)
+    if index is not None and index.version == version:
+        return index
+
+    with _geofence_indexes_lock:
+        index = _geofence_indexes.get(org_id)
+        if index is None or index.version != version:
+            system_locations = SystemLocation.objects.filter(organization_id=org_id, status="active").order_by("id")
+            index = GeofenceIndex(version, system_locations, settings.GEOFENCE_GRID_DEGREES)
+            _geofence_indexes[org_id] = index
+            logger.info(f"Geofence index built for {org_id}. locations: {len(index)}")
+
+    return index
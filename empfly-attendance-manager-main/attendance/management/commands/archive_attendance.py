@@ -0,0 +1,83 @@
+import datetime as dt
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone as tz
+
+from attendance.archive import (
+    add_months,
+    archive_attendances,
+    archive_scans,
+    create_archive_partitions,
+    get_archivable_attendance_ids,
+    get_archivable_scan_ids,
+    get_month_start,
+)
+
+# configure logging
+logging.basicConfig(
+    filename="logs/archive_attendance.log",
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)-8s %(message)s",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move attendances and computed scans older than retention to the monthly partitioned archive tables. "
+        "Reports and exports do not read the archive tables, so archived ranges are no longer reported on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.ATTENDANCE_ARCHIVE_RETENTION_DAYS,
+            help="Attendances and computed scans older than this many days are archived, and no longer reported on",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ATTENDANCE_ARCHIVE_BATCH_SIZE,
+            help="Number of rows moved in one transaction",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Number of future monthly archive partitions to create",
+        )
+
+    def handle(self, *args, **options):
+
+        now = tz.now()
+        batch_size = options["batch_size"]
+        cutoff = now - dt.timedelta(days=options["retention_days"])
+
+        current_month = get_month_start(now.date())
+        create_archive_partitions(current_month, add_months(current_month, options["months_ahead"]))
+
+        logging.info("-" * 50)
+        logging.info(f"Archiving attendances before {cutoff.date()} and computed scans before {cutoff}")
+
+        attendance_count = scan_count = 0
+        while True:
+            attendance_ids = get_archivable_attendance_ids(cutoff.date(), batch_size)
+            if not attendance_ids:
+                break
+            archived_attendances, archived_scans = archive_attendances(attendance_ids)
+            attendance_count += archived_attendances
+            scan_count += archived_scans
+            logging.info(f"Archived {attendance_count} attendances, {scan_count} scans")
+
+        while True:
+            scan_ids = get_archivable_scan_ids(cutoff, batch_size)
+            if not scan_ids:
+                break
+            scan_count += archive_scans(scan_ids)
+            logging.info(f"Archived {scan_count} scans")
+
+        message = f"Archived {attendance_count} attendances and {scan_count} scans"
+        logging.info(message)
+        self.stdout.write(message)
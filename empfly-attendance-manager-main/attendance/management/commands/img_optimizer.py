@@ -1,12 +1,22 @@
-from image_optimizer import compression, resize
+import json
+import multiprocessing
 import os
-from PIL import Image
-import PIL
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import connections
 from django.db.models import Q
+from django.utils import timezone as tz
+
 from attendance.models import MemberScan
-from django.conf import settings
+from attendance.scan_images import COMPRESSED_IMAGE_SUFFIX, write_image_derivatives
+from member.models import MemberImage
+from visitor.models import VisitorScan
+
 import logging
 
 
@@ -16,144 +26,202 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)-8s %(message)s",
 )
 
-COMPRESSED_IMG_FOLDER_PATH = settings.COMPRESSED_IMG_FOLDER_PATH
-DB_SAVING_PATH = settings.DB_SAVING_PATH
 IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR = settings.IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR
 
+# name: (model, image field, thumbnail field)
+OPTIMIZER_TARGETS = {
+    "member_scan": (MemberScan, "image", "thumbnail"),
+    "member_image": (MemberImage, "image", None),
+    "visitor_scan": (VisitorScan, "photo", None),
+}
+
+# New member scans are optimized on upload. Only older ones are picked up, so both never race.
+RECENT_SCAN_MINUTES = 60
+
+
+def optimize_image(unit: tuple) -> tuple:
+    """ Write compressed image (and thumbnail) of one row in a worker process.
+
+        unit: (id, image name, thumbnail name or None)
+        return: (id, image name, thumbnail name, bytes before, bytes after, error)
+    """
+
+    object_id, name, thumbnail_name = unit
+    try:
+        original_size = default_storage.size(name)
+        image_name, thumbnail_name = write_image_derivatives(default_storage, name, thumbnail_name)
+        return object_id, image_name, thumbnail_name, original_size, default_storage.size(image_name), None
+    except Exception as err:
+        return object_id, name, None, 0, 0, f"{err.__class__.__name__}: {err}"
+
+
+def read_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_checkpoint(path: str, checkpoint: dict) -> None:
+    # Written to a temp file and renamed so a killed run never leaves half a checkpoint
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, path)
+
+
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
+    help = "Compress scan, member and visitor scan images in id ordered chunks, resuming from last checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMAGE_OPTIMIZER_WORKERS,
+            help="Number of worker processes compressing images",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.IMAGE_OPTIMIZER_CHUNK_SIZE,
+            help="Number of rows optimized and updated together",
+        )
+        parser.add_argument(
+            "--targets",
+            nargs="+",
+            choices=list(OPTIMIZER_TARGETS),
+            default=list(OPTIMIZER_TARGETS),
+            help="Images to optimize",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start again from the first row, retrying rows failed in previous runs",
+        )
+
+    def get_chunk(self, target: str, last_id: int, chunk_size: int, started_dt: datetime) -> list:
+        """ Units of the next chunk_size not optimized rows after last_id, ordered by id
+        """
+
+        model, field, thumbnail_field = OPTIMIZER_TARGETS[target]
+
+        lookup = Q(id__gt=last_id) & Q(**{f"{field}__isnull": False})
+        if model is MemberScan:
+            lookup &= Q(created_at__lt=started_dt - timedelta(minutes=RECENT_SCAN_MINUTES))
+
+        rows = (
+            model.objects.filter(lookup)
+            .exclude(**{field: ""})
+            .exclude(**{f"{field}__endswith": COMPRESSED_IMAGE_SUFFIX})
+            .order_by("id")
+            .values_list("id", "uuid", field)[:chunk_size]
+        )
+
+        units = []
+        for object_id, object_uuid, name in rows:
+            thumbnail_name = None
+            if thumbnail_field is not None:
+                instance = model(id=object_id, uuid=object_uuid)
+                thumbnail_name = model._meta.get_field(thumbnail_field).generate_filename(instance, "thumbnail.jpg")
+            units.append((object_id, name, thumbnail_name))
+        return units
+
+    def save_chunk(self, target: str, results: list) -> None:
+        """ Point rows to their optimized images in one query, then remove the originals
+        """
+
+        model, field, thumbnail_field = OPTIMIZER_TARGETS[target]
+        fields = [field] if thumbnail_field is None else [field, thumbnail_field]
+
+        instances = []
+        for object_id, image_name, thumbnail_name in results:
+            instance = model(id=object_id)
+            setattr(instance, field, image_name)
+            if thumbnail_field is not None:
+                setattr(instance, thumbnail_field, thumbnail_name)
+            instances.append(instance)
+
+        model.objects.bulk_update(instances, fields)
+
+    def optimize_target(self, target: str, executor, checkpoint: dict, options: dict, end_dt: datetime) -> dict:
+
+        # Compared with created_at, so it must be aware
+        started_dt = tz.now()
+        started = time.monotonic()
+        stats = {"completed": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+        last_id = checkpoint.get(target, 0)
+
+        logging.info(f"{target}: resuming after id {last_id}")
+
+        while datetime.now() < end_dt:
+            units = self.get_chunk(target, last_id, options["chunk_size"], started_dt)
+            if not units:
+                logging.info(f"{target}: no images left to optimize")
+                break
+
+            names = {object_id: name for object_id, name, _ in units}
+            if executor is None:
+                outputs = map(optimize_image, units)
+            else:
+                outputs = executor.map(optimize_image, units)
+
+            results = []
+            for object_id, image_name, thumbnail_name, bytes_before, bytes_after, error in outputs:
+                if error is not None:
+                    stats["failed"] += 1
+                    logging.error(f"{target} {object_id} {names[object_id]}: {error}")
+                    continue
+                results.append((object_id, image_name, thumbnail_name))
+                stats["completed"] += 1
+                stats["bytes_before"] += bytes_before
+                stats["bytes_after"] += bytes_after
+
+            if results:
+                self.save_chunk(target, results)
+                for object_id, _, _ in results:
+                    default_storage.delete(names[object_id])
+
+            # Failed rows are not retried until --reset, so they never block the backlog
+            last_id = units[-1][0]
+            checkpoint[target] = last_id
+            write_checkpoint(settings.IMAGE_OPTIMIZER_CHECKPOINT_PATH, checkpoint)
+        else:
+            logging.info("------------------------End time exceeded------------------------")
+
+        elapsed = time.monotonic() - started
+        stats["seconds"] = round(elapsed, 2)
+        stats["images_per_second"] = round(stats["completed"] / elapsed, 2) if elapsed else 0
+        stats["saved_mb"] = round((stats["bytes_before"] - stats["bytes_after"]) / 1024 / 1024, 2)
+        stats["last_id"] = last_id
+        return stats
+
+    def handle(self, *args, **options):
         started_dt = datetime.now()
         end_dt = started_dt + timedelta(hours=IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR)
-        # Get all the scans which doest ends with -min.jpg. That means files which are not optimized.
-        # Change the model name here accordingly to exec this for another model
+        workers = options["workers"]
 
         logging.info(f"started_dt: {started_dt}")
         logging.info(f"end_dt: {end_dt}")
-
-        scans = MemberScan.objects.filter(~Q(image__endswith="-min.jpg"), image__isnull=False)
-
-        total_scans_count = scans.count()
-        completed_file_count = 0
-        failed_count = 0
-        failed_reasons = []
-        optimization_completed_time = None
-
-        for scan in scans:
-            curr_dt = datetime.now()
-            optimization_completed_time = curr_dt
-            if curr_dt >= end_dt:
-                logging.info(f"curr_dt: {curr_dt}")
-                logging.info(f"end_dt: {end_dt}")
-                logging.info("------------------------Exiting for loop. End time exceeded------------------------")
-                break
-            
-            try:
-                # Get the images actual path in the system
-                img_full_path = scan.image.path
-                name = scan.image.name
-                img_name, img_ext = self.extract_file_name_and_ext(name)
-                img_new_name = f"{img_name}-min.{img_ext}"
-                image = Image.open(img_full_path)
-                image = self.exif_transpose(image)
-                image.save(img_full_path)
-
-                # Compress img and get file in in memory
-                img = compression.compress_image(
-                    actual_img=img_full_path,
-                    img_name=img_new_name
-                )
-
-                # Resize img and get file in in memory
-                img = resize.resize(
-                    actual_img=img,
-                    img_name=img.name,
-                    width=200,
-                )
-
-                # Save images after compressing. Images will be saving in compressed images folder.
-                img_saving_path = f"{COMPRESSED_IMG_FOLDER_PATH}/{img.name}"
-                pil_img = Image.open(img)
-                pil_img.save(
-                    img_saving_path
-                )
-
-                # Save the new image name in the db. If image optimize successfully we will rename the img
-                # the name will end with -min.jpg. In the db to reflect this we will be saving the data in db.
-                path_saving_in_db = f"{DB_SAVING_PATH}/{img.name}"
-                scan.image.name = path_saving_in_db
-                scan.save()
-
-                os.remove(img_full_path)
-
-                completed_file_count += 1
-            except Exception as err:
-                # logging.error(f"error occurs in image optimization: {err}")
-                # print(f"err: {err}")
-                failed_count += 1
-                failed_reasons.append(
-                    {
-                        "error": err,
-                        "image_name": scan.image 
-                    }
-                )
-        
-        logging.info(f"total_scans_count: {total_scans_count}")
-        logging.info(f"completed_file_count: {completed_file_count}")
-        logging.error(f"failed_count: {failed_count}")
-        logging.error(f"failed_reasons: {failed_reasons}")
-        logging.info(f"completed_time: {optimization_completed_time}")
+        logging.info(f"workers: {workers}, chunk_size: {options['chunk_size']}")
+
+        checkpoint_path = settings.IMAGE_OPTIMIZER_CHECKPOINT_PATH
+        checkpoint = {} if options["reset"] else read_checkpoint(checkpoint_path)
+
+        executor = None
+        if workers > 1:
+            # Forked workers only touch files, but must not share the parent's DB connections
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+
+        try:
+            for target in options["targets"]:
+                stats = self.optimize_target(target, executor, checkpoint, options, end_dt)
+                logging.info(f"{target}: {stats}")
+                self.stdout.write(f"{target}: {stats}")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        logging.info(f"completed_time: {datetime.now()}")
         logging.info(f"========================image optimization is completed========================")
-        
-
-    def extract_file_name_and_ext(self, file_name_with_ext):
-        filename_and_ext = file_name_with_ext.split(".")
-        file_ext = filename_and_ext[-1]
-        file_name = "".join(filename_and_ext[:-1])
-        return file_name, file_ext
-
-    def exif_transpose(self, img):
-        """
-        Rotate the image using the exif data of the image. Some images are auto rotating after saving. 
-        Because of that converting back the images Position using exif data.
-        """
-        if not img:
-            return img
-
-        exif_orientation_tag = 274
-
-        # Check for EXIF data (only present on some files)
-        if (
-            hasattr(img, "_getexif")
-            and isinstance(img._getexif(), dict)
-            and exif_orientation_tag in img._getexif()
-        ):
-            exif_data = img._getexif()
-            orientation = exif_data[exif_orientation_tag]
-
-            # Handle EXIF Orientation
-            if orientation == 1:
-                # Normal image - nothing to do!
-                pass
-            elif orientation == 2:
-                # Mirrored left to right
-                img = img.transpose(PIL.Image.FLIP_LEFT_RIGHT)
-            elif orientation == 3:
-                # Rotated 180 degrees
-                img = img.rotate(180)
-            elif orientation == 4:
-                # Mirrored top to bottom
-                img = img.rotate(180).transpose(PIL.Image.FLIP_LEFT_RIGHT)
-            elif orientation == 5:
-                # Mirrored along top-left diagonal
-                img = img.rotate(-90, expand=True).transpose(PIL.Image.FLIP_LEFT_RIGHT)
-            elif orientation == 6:
-                # Rotated 90 degrees
-                img = img.rotate(-90, expand=True)
-            elif orientation == 7:
-                # Mirrored along top-right diagonal
-                img = img.rotate(90, expand=True).transpose(PIL.Image.FLIP_LEFT_RIGHT)
-            elif orientation == 8:
-                # Rotated 270 degrees
-                img = img.rotate(90, expand=True)
-
-        return img
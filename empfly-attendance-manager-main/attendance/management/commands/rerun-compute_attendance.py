@@ -6,12 +6,17 @@ from django.db.models import Q
 from django.utils import timezone as tz
 from django.db import connection
 
+from attendance.attendance_metrics import (
+    MAX_MINUTES,
+    apply_attendance_metrics,
+    compute_attendance_metrics,
+    to_epoch_seconds,
+)
 from attendance.models import Attendance, AttendanceComputationHistory, MemberScan
 from organization.models import Holiday, Organization
 from shift.models import Shift, ShiftScheduleLog
 from django.db.models import F
 # from django.db.models.functions import TimeZone
-from attendance.constants import MAX_MIN_FOR_OT_REQUEST
 from utils.date_time import curr_date_time_with_tz
 
 # configure logging
@@ -35,17 +40,11 @@ class Command(BaseCommand):
         self.employee_count = 0
         self.is_holiday = False
         self.org_timezone = "UTC"
-        self.max_minutes = 1440
+        self.max_minutes = MAX_MINUTES
 
         self.actual_shift_end_dt = None
         self.actual_shift_start_dt = None
 
-    def limit_duration(self, duration):
-        """function to limit the minutes to maximum minutes"""
-        # if duration is exceeding 24 hours
-        # take duration as 24 hours in minutes
-        return duration if duration <= self.max_minutes else self.max_minutes
-
     def add_attendance(self, organization, employee, date, scans, shift):
         """function to create attendance with overtime, late check-in, early check-in, status details for current employee"""
 
@@ -53,228 +52,39 @@ class Command(BaseCommand):
 
         logging.info(f"Scan length: {scans_length}")
 
-        # If even number of scans -> Calculate duration of all scans
-        # If odd number of scans -> Calculate duration of all scans except the last scan
-        duration = self.calc_duration(scans, scans_length if scans_length % 2 == 0 else (scans_length - 1))
+        # Duration, late check-in, early/late check-out and overtime from the shared metric kernel.
+        # Odd last scan is not used, every value is limited to 24 hours.
+        scan_date_times = [scan.date_time for scan in scans]
+        metrics = next(
+            compute_attendance_metrics(
+                member_ids=[employee.id] * len(scan_date_times),
+                scan_epochs=to_epoch_seconds(scan_date_times),
+                shift_start_epoch=self.actual_shift_start_dt.timestamp(),
+                shift_end_epoch=self.actual_shift_end_dt.timestamp(),
+                present_working_minutes=shift.present_working_hours * 60,
+                max_minutes=self.max_minutes,
+            ).itertuples()
+        )
+        duration = float(metrics.duration)
 
         logging.info(f"duration in minutes: {duration}")
 
-
-        # attendance, created = Attendance.objects.get_or_create(
-        #     member=employee, date=date, organization=organization, defaults={"duration": self.limit_duration(duration)}
-        # )
-
-        # If duration is more than 24 h we will just limit to 24
-        limited_duration = self.limit_duration(duration)
-
         attendance, created = Attendance.objects.get_or_create(
-            member=employee, date=date, organization=organization, defaults={"duration": limited_duration}, shift=shift
+            member=employee, date=date, organization=organization, defaults={"duration": duration}, shift=shift
         )
 
-        logging.info(f"attendance.duration: {attendance.duration}")
-        attendance.duration = limited_duration
-
-        logging.info(f"attendance.duration: {attendance.duration}")
         logging.info(f"attendance: {attendance}")
         logging.info(f"attendance created: {created}")
-        logging.info(f"self.limit_duration(duration): {self.limit_duration(duration)}")
-
-
-
-        # ******************************** LATE CHECK-IN COMPUTATION ******************************
-        try:
-            first_scan = scans[0]
-
-            # shift_start_time = tz.make_aware(tz.datetime.combine(date, shift.start_time), timezone=self.org_timezone)
-            shift_start_time = self.actual_shift_start_dt
-            first_scan_time = tz.localtime(first_scan.date_time, timezone=self.org_timezone)
-
-
-            logging.info(f"first_scan_time: {first_scan_time}")
-            logging.info(f"shift_start_time: {shift_start_time}")
-
-            # print("here", first_scan_time, shift_start_time)
-
-            # Calculate the seconds the employee was late by
-            late_duration = first_scan_time - shift_start_time
-
-            # Convert seconds to minutes
-            late_duration = late_duration.total_seconds() / 60
-
-            if late_duration > 0:
-
-                attendance.late_check_in = float(self.limit_duration(late_duration))
-
-        except Exception as e:
-            logging.error(f"Error {e.__class__.__name__}: {e}")
-            logging.error(f"Failed to compute late check in for " f"{employee} on {date}")
-
-        # ******************************** EARLY CHECK-OUT & OVERTIME COMPUTATION *************************
-        try:
-            # if number of member scan is greater than 1
-            if scans_length > 1:
-                # take last even scan as last scan, because even scans are check-out scans
-                # odd scan will be considered as check-in scans
-                last_scan = scans[scans_length - 1] if scans_length % 2 == 0 else scans[scans_length - 2]
-
-                # if night shift
-                # shift end date will be considered as current date
-                # shift_end_date = date + tz.timedelta(days=1) if shift.start_time > shift.end_time else date
-
-                # shift_end_time = tz.make_aware(
-                #     tz.datetime.combine(shift_end_date, shift.end_time), timezone=self.org_timezone
-                # )
-                shift_end_time = self.actual_shift_end_dt
-                last_scan_time = tz.localtime(last_scan.date_time, timezone=self.org_timezone)
-
-                # print(last_scan_time, shift_end_time, last_scan_time - shift_end_time)
-                # Calculate the time difference
-                duration_difference = last_scan_time - shift_end_time
 
-                logging.info(f"last_scan_time: {last_scan_time}")
-                logging.info(f"shift_end_time: {shift_end_time}")
-
-                # Convert seconds to minutes
-                duration_difference = duration_difference.total_seconds() / 60
-
-                print("********************************")
-                print(f"duration_difference: {duration_difference}")
-                print("********************************")
-
-                shift_present_working_min = shift.present_working_hours * 60
-                total_attendance_duration_in_min = attendance.duration
-
-                print(f"shift_present_working_min: {shift_present_working_min}")
-                print(f"total_attendance_duration: {total_attendance_duration_in_min}")
-
-                # Calculate overtime using shift present working hour.
-                overtime = 0
-                if total_attendance_duration_in_min > shift_present_working_min:
-                    overtime = total_attendance_duration_in_min - shift_present_working_min
-
-                print(f"overtime: {overtime}")
-
-                # Check overtime is exists then give for OT approval.
-                if overtime > 0:
-                    overtime = self.limit_duration(overtime)
-                    attendance.overtime = overtime
-                    attendance_duration = attendance.duration
-
-                    org_ot_approval = organization.shift_management_settings.get(
-                        "ot_approval", False
-                    )
-                    automated_ot_approval = organization.shift_management_settings.get(
-                        "automated_ot_approval", True
-                    )
-
-                    print("attendance_duration: ", attendance_duration)
-                    print("overtime: ", overtime)
-
-                    if org_ot_approval is True:
-                        if overtime >= MAX_MIN_FOR_OT_REQUEST:
-                            if automated_ot_approval is False:
-                                # Enable ot manually
-                                attendance.ot_status = "ot_available"
-                            else:
-                                # Raise request automatically
-                                attendance.ot_status = "ot_requested"
-
-                            attendance.duration = attendance_duration - overtime
-                        else:
-                            attendance.ot_status = None
-                            attendance.duration = attendance_duration
-                    else:
-                        attendance.ot_status = None
-                        attendance.duration = attendance_duration
-
-                if duration_difference > 0:
-                    # Late check out
-                    late_check_out_in_min = self.limit_duration(duration_difference)
-                    attendance.late_check_out = late_check_out_in_min
-                else:
-                    # Early check out
-                    attendance.early_check_out = float(abs(self.limit_duration(duration_difference)))
-
-                # if last scan time is greater than shift end time
-                # take that shift end time to last scan time as overtime
-                # if duration_difference > 0:
-                #     # TODO Add late check out
-                #     late_check_out = self.limit_duration(duration_difference)
-                #     attendance.late_check_out = late_check_out
-
-                    # # =========== New Logic ===========
-                    # overtime = self.limit_duration(duration_difference)
-                    # attendance.overtime = overtime
-                    # attendance_duration = attendance.duration
-
-                    # org_ot_approval = organization.shift_management_settings.get(
-                    #     "ot_approval", False
-                    # )
-
-                    # print("attendance_duration: ", attendance_duration)
-                    # print("overtime: ", overtime)
-
-                    # if org_ot_approval is True:
-                    #     if overtime >= MAX_MIN_FOR_OT_REQUEST:
-                    #         print("======Overtime Fount")
-                    #         attendance.ot_status = "ot_requested"
-                    #         attendance.duration = attendance_duration - overtime
-                    #         print("new attendance duration", attendance.duration)
-                    #     else:
-                    #         attendance.ot_status = None
-                    #         attendance.duration = attendance_duration
-                    # else:
-                    #     attendance.ot_status = None
-                    #     attendance.duration = attendance_duration
-
-                    # =========== Old Logic ===========
-
-                    # late_check_in = attendance.late_check_in if attendance.late_check_in else 0
-                    # overtime = self.limit_duration(duration_difference)
-                    # # if overtime greater than late_check_in time
-                    # # overtime minus late_check_in time, we can consider remaining time as overtime
-                    # if overtime > late_check_in:
-                    #     attendance.overtime = float(overtime - late_check_in)
-
-                # if last scan time is lesser than shift end time
-                # take that last scan time to shift end time as early check-out time
-                # else:
-                #     attendance.early_check_out = float(abs(self.limit_duration(duration_difference)))
-
-        except Exception as e:
-            logging.error(f"Error {e.__class__.__name__}: {e}")
-            logging.error(f"Failed to compute early check out for " f"{employee} on {date}")
-
-        # ***************************** SET ATTENDANCE STATUS ********************************
-
-        total_shift_present_hours, total_shift_partial_hours = shift.present_working_hours, shift.partial_working_hours
-
-        logging.info(f"{total_shift_present_hours=} \n {total_shift_partial_hours=}")
-
-        # convert minutes to hours
-        attendance_duration_in_hours = attendance.duration / 60
-
-        logging.info(f"attendance_duration_in_hours: {attendance_duration_in_hours}")
-        logging.info(f"attendance.duration: {attendance.duration}")
-
-        if attendance_duration_in_hours >= total_shift_present_hours:
-            logging.info(f"attendance_duration_in_hours >= total_shift_present_hours: {attendance_duration_in_hours >= total_shift_present_hours}")
-            attendance.status = "present"
-        elif attendance_duration_in_hours >= total_shift_partial_hours:
-            logging.info(f"attendance_duration_in_hours >= total_shift_partial_hours: {attendance_duration_in_hours >= total_shift_partial_hours}")
-            attendance.status = "partial"
-        else:
-            logging.info(f"None of the condition worked mark as absent.")
-            attendance.status = "absent"
-
-        # mark attendance status as weekend
-        # if weekday is in skip days
-        if date.weekday() in shift.skip_days:
-            attendance.status = "weekend"
-
-        # attendance date is holiday
-        if self.is_holiday:
-            attendance.status = "holiday"
+        apply_attendance_metrics(
+            attendance,
+            metrics,
+            shift,
+            date,
+            self.is_holiday,
+            organization.shift_management_settings.get("ot_approval", False),
+            organization.shift_management_settings.get("automated_ot_approval", True),
+        )
 
         # convert minutes to HH:MM format
         attendance_dur_in_hm = f"{int(duration // 60)}:{int(duration % 60)}"
@@ -317,30 +127,6 @@ class Command(BaseCommand):
         # print(len(connection.queries))
         # *****************************************************************************************************
 
-    def calc_duration(self, scans, length):
-        """function to calculate time difference between every two scans"""
-        i = 0
-        total_duration = 0
-
-        # Fetch duration between every 2 scans
-        # If 4 scans, calculate difference between (1, 2) and (3, 4).
-        # Add up the differences to get total duration
-        while i < length:
-            start_scan, end_scan = scans[i], scans[i + 1]
-
-            duration = tz.localtime(end_scan.date_time, timezone=self.org_timezone) - tz.localtime(
-                start_scan.date_time, timezone=self.org_timezone
-            )
-            # duration in minutes
-            duration = duration.total_seconds() / 60
-
-            total_duration += duration
-
-            i += 2
-
-        # total_duration in minutes
-        return total_duration
-
     def mark_attendance(self, organization, employee, date, status, shift=None):
 
         _, created = Attendance.objects.get_or_create(
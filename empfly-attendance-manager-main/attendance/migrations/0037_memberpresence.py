@@ -0,0 +1,61 @@
+# Generated by Django 4.2.8 on 2026-10-18 12:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import zoneinfo
+
+
+def fill_member_presence(apps, schema_editor):
+    """ Presence of every member from their latest scan """
+
+    MemberScan = apps.get_model("attendance", "MemberScan")
+    MemberPresence = apps.get_model("attendance", "MemberPresence")
+
+    last_scans = MemberScan.objects.order_by("member_id", "-date_time").distinct("member_id").select_related(
+        "organization"
+    )
+
+    presences = []
+    for member_scan in last_scans.iterator(chunk_size=2000):
+        org_timezone = zoneinfo.ZoneInfo(member_scan.organization.timezone or "UTC")
+        presences.append(
+            MemberPresence(
+                member_id=member_scan.member_id,
+                organization_id=member_scan.organization_id,
+                date=member_scan.date_time.astimezone(org_timezone).date(),
+                last_scan_id=member_scan.id,
+                last_scan_type=member_scan.scan_type,
+                last_scan_at=member_scan.date_time,
+            )
+        )
+
+    MemberPresence.objects.bulk_create(presences, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0031_memberimage_binary_encoding'),
+        ('organization', '0035_organization_status'),
+        ('attendance', '0036_attendancecomputationhistory_attendance_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberPresence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('last_scan_type', models.CharField(choices=[('check_in', 'Check In'), ('check_out', 'Check Out')], max_length=200)),
+                ('last_scan_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_scan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.memberscan')),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='presence', to='member.member')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_presences', to='organization.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'date', 'last_scan_type'], name='presence_org_date_type_idx')],
+            },
+        ),
+        migrations.RunPython(fill_member_presence, migrations.RunPython.noop),
+    ]
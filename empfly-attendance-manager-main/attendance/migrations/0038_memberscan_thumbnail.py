@@ -0,0 +1,19 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:05
+
+import attendance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0037_memberpresence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberscan',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to=attendance.models.rename_member_scan_thumbnails),
+        ),
+    ]
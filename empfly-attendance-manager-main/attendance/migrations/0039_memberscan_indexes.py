@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built without locking writes to member scans
+    atomic = False
+
+    dependencies = [
+        ('attendance', '0038_memberscan_thumbnail'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='memberscan',
+            index=models.Index(fields=['member', 'date_time'], name='scan_member_date_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='memberscan',
+            index=models.Index(fields=['organization', 'date_time'], name='scan_org_date_time_idx'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:20
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+# Archive tables are range partitioned by month. Partitions are created by
+# the archive_attendance command, so nothing references these tables.
+CREATE_ARCHIVE_TABLES = """
+CREATE TABLE attendance_archivedmemberscan (
+    id bigint NOT NULL,
+    uuid uuid NOT NULL,
+    member_id bigint NOT NULL,
+    system_location_id bigint NULL,
+    organization_id bigint NOT NULL,
+    image varchar(100) NULL,
+    thumbnail varchar(100) NULL,
+    kiosk_id bigint NULL,
+    date_time timestamp with time zone NOT NULL,
+    latitude varchar(200) NULL,
+    longitude varchar(200) NULL,
+    is_computed boolean NOT NULL,
+    status varchar(200) NOT NULL,
+    scan_type varchar(200) NOT NULL,
+    metadata jsonb NULL,
+    created_at timestamp with time zone NOT NULL,
+    archived_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, date_time)
+) PARTITION BY RANGE (date_time);
+
+CREATE INDEX archived_scan_org_date_time_idx ON attendance_archivedmemberscan (organization_id, date_time);
+CREATE INDEX archived_scan_member_date_time_idx ON attendance_archivedmemberscan (member_id, date_time);
+
+CREATE TABLE attendance_archivedattendance (
+    id bigint NOT NULL,
+    member_id bigint NOT NULL,
+    organization_id bigint NOT NULL,
+    date date NOT NULL,
+    scan_ids bigint[] NOT NULL DEFAULT '{}',
+    status varchar(200) NULL,
+    status_details jsonb NULL,
+    difference interval NULL,
+    duration double precision NULL,
+    late_check_in double precision NULL,
+    early_check_out double precision NULL,
+    late_check_out double precision NULL,
+    overtime double precision NULL,
+    ot_status varchar(50) NULL,
+    visited_system_locations varchar(100)[] NULL,
+    ot_verified_by_id bigint NULL,
+    shift_id bigint NULL,
+    remarks text NULL,
+    archived_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE INDEX archived_attendance_org_date_idx ON attendance_archivedattendance (organization_id, date);
+CREATE INDEX archived_attendance_member_date_idx ON attendance_archivedattendance (member_id, date);
+"""
+
+DROP_ARCHIVE_TABLES = """
+DROP TABLE attendance_archivedattendance;
+DROP TABLE attendance_archivedmemberscan;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0039_memberscan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMemberScan',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('uuid', models.UUIDField()),
+                ('member_id', models.BigIntegerField()),
+                ('system_location_id', models.BigIntegerField(blank=True, null=True)),
+                ('organization_id', models.BigIntegerField()),
+                ('kiosk_id', models.BigIntegerField(blank=True, null=True)),
+                ('image', models.CharField(blank=True, max_length=100, null=True)),
+                ('thumbnail', models.CharField(blank=True, max_length=100, null=True)),
+                ('date_time', models.DateTimeField()),
+                ('latitude', models.CharField(blank=True, max_length=200, null=True)),
+                ('longitude', models.CharField(blank=True, max_length=200, null=True)),
+                ('is_computed', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('computed', 'Computed'), ('expired', 'Expired')], max_length=200)),
+                ('scan_type', models.CharField(choices=[('check_in', 'Check In'), ('check_out', 'Check Out')], max_length=200)),
+                ('metadata', models.JSONField(blank=True, default=dict, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'attendance_archivedmemberscan',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('member_id', models.BigIntegerField()),
+                ('organization_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('scan_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+                ('status', models.CharField(blank=True, max_length=200, null=True)),
+                ('status_details', models.JSONField(blank=True, default=dict, null=True)),
+                ('difference', models.DurationField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('late_check_in', models.FloatField(blank=True, null=True)),
+                ('early_check_out', models.FloatField(blank=True, null=True)),
+                ('late_check_out', models.FloatField(blank=True, null=True)),
+                ('overtime', models.FloatField(blank=True, null=True)),
+                ('ot_status', models.CharField(blank=True, choices=[('ot_available', 'OT Available'), ('ot_requested', 'OT requested'), ('ot_approved', 'OT Approved'), ('ot_rejected', 'OT rejected')], max_length=50, null=True)),
+                ('visited_system_locations', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, null=True, size=None)),
+                ('ot_verified_by_id', models.BigIntegerField(blank=True, null=True)),
+                ('shift_id', models.BigIntegerField(blank=True, null=True)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'attendance_archivedattendance',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_ARCHIVE_TABLES, DROP_ARCHIVE_TABLES),
+    ]
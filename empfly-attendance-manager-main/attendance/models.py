@@ -26,6 +26,11 @@ def rename_member_scan_images(instance: models.Model, filename: "file") -> str:
     return os.path.join("member/trip_scans/", filename)
 
 
+def rename_member_scan_thumbnails(instance: models.Model, filename: "file") -> str:
+    filename = rename_image(instance.uuid, filename)
+    return os.path.join("member/trip_scans/thumbnails/", filename)
+
+
 class MemberScan(models.Model):
 
     SCAN_STATUS_CHOICES = (
@@ -53,6 +58,8 @@ class MemberScan(models.Model):
     organization = models.ForeignKey("organization.Organization", on_delete=models.CASCADE)
 
     image = models.ImageField(upload_to=rename_member_scan_images, null=True, blank=True)
+    # Small preview of image, created with the compressed image after upload
+    thumbnail = models.ImageField(upload_to=rename_member_scan_thumbnails, null=True, blank=True)
 
     kiosk = models.ForeignKey("kiosk.Kiosk", on_delete=models.SET_NULL, null=True)
 
@@ -75,6 +82,45 @@ class MemberScan(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Scans of a member in a date time range, pending or not, for attendance
+            # computation, last scan checks and scan reports
+            models.Index(fields=["member", "date_time"], name="scan_member_date_time_idx"),
+            models.Index(fields=["organization", "date_time"], name="scan_org_date_time_idx"),
+        ]
+
+
+class MemberPresence(models.Model):
+    """ Last scan of each member, maintained when member scans are saved.
+        date is the scan date in org timezone, so the presence of today is
+        the rows with date of today.
+    """
+
+    member = models.OneToOneField(
+        "member.Member",
+        related_name="presence",
+        on_delete=models.CASCADE,
+    )
+    organization = models.ForeignKey(
+        "organization.Organization",
+        related_name="member_presences",
+        on_delete=models.CASCADE,
+    )
+
+    date = models.DateField()
+    last_scan = models.ForeignKey(MemberScan, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_scan_type = models.CharField(max_length=200, choices=MemberScan.SCAN_TYPE_CHOICES)
+    last_scan_at = models.DateTimeField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "date", "last_scan_type"], name="presence_org_date_type_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.member}__{self.date}__{self.last_scan_type}"
 
 
 class Attendance(models.Model):
@@ -163,6 +209,83 @@ class Attendance(models.Model):
         return f"{self.member}_{self.date}__{self.status}"
 
 
+class ArchivedMemberScan(models.Model):
+    """ Computed member scans moved out of MemberScan by archive_attendance command.
+        Table is range partitioned by month of date_time (see attendance.archive),
+        so related rows are kept as plain ids.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    uuid = models.UUIDField()
+
+    member_id = models.BigIntegerField()
+    system_location_id = models.BigIntegerField(null=True, blank=True)
+    organization_id = models.BigIntegerField()
+    kiosk_id = models.BigIntegerField(null=True, blank=True)
+
+    image = models.CharField(max_length=100, null=True, blank=True)
+    thumbnail = models.CharField(max_length=100, null=True, blank=True)
+
+    date_time = models.DateTimeField()
+
+    latitude = models.CharField(max_length=200, null=True, blank=True)
+    longitude = models.CharField(max_length=200, null=True, blank=True)
+
+    is_computed = models.BooleanField(default=False)
+    status = models.CharField(max_length=200, choices=MemberScan.SCAN_STATUS_CHOICES)
+    scan_type = models.CharField(max_length=200, choices=MemberScan.SCAN_TYPE_CHOICES)
+
+    metadata = models.JSONField(default=dict, null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "attendance_archivedmemberscan"
+
+    def __str__(self):
+        return f"{self.uuid}__{self.member_id}"
+
+
+class ArchivedAttendance(models.Model):
+    """ Attendances moved out of Attendance by archive_attendance command, with
+        the ids of their scans. Table is range partitioned by month of date.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+
+    member_id = models.BigIntegerField()
+    organization_id = models.BigIntegerField()
+
+    date = models.DateField()
+    scan_ids = ArrayField(models.BigIntegerField(), default=list)
+
+    status = models.CharField(max_length=200, null=True, blank=True)
+    status_details = models.JSONField(default=dict, null=True, blank=True)
+
+    difference = models.DurationField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    late_check_in = models.FloatField(null=True, blank=True)
+    early_check_out = models.FloatField(null=True, blank=True)
+    late_check_out = models.FloatField(null=True, blank=True)
+    overtime = models.FloatField(null=True, blank=True)
+
+    ot_status = models.CharField(max_length=50, choices=Attendance.OT_STATUS_CHOICES, null=True, blank=True)
+    visited_system_locations = ArrayField(models.CharField(max_length=100), blank=True, null=True)
+    ot_verified_by_id = models.BigIntegerField(null=True, blank=True)
+    shift_id = models.BigIntegerField(null=True, blank=True)
+
+    remarks = models.TextField(null=True, blank=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "attendance_archivedattendance"
+
+    def __str__(self):
+        return f"{self.member_id}_{self.date}__{self.status}"
+
+
 class AttendanceComputationHistory(models.Model):
     STATUS_CHOICES = (("started", "Started"), ("completed", "Completed"), ("failed", "Failed"))
 
@@ -0,0 +1,145 @@
+import datetime as dt
+import logging
+import zoneinfo
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone as tz
+
+from attendance.models import MemberPresence, MemberScan
+from member.models import Member
+from organization.models import Organization
+
+
+logger = logging.getLogger(__name__)
+
+CHECK_IN_STATUS_LABELS = {
+    "check_in": "Check In",
+    "check_out": "Check Out",
+}
+
+
+def get_scan_org_timezone(member_scan: MemberScan) -> str:
+    """ Timezone of scan org. Scan views create scans with the org they already
+        loaded, so it is read without a query. Otherwise only the timezone is loaded.
+    """
+
+    if MemberScan.organization.is_cached(member_scan):
+        org_timezone = member_scan.organization.timezone
+    else:
+        org_timezone = Organization.objects.filter(id=member_scan.organization_id).values_list(
+            "timezone", flat=True
+        ).first()
+    return org_timezone or "UTC"
+
+
+def get_scan_date(member_scan: MemberScan):
+    """ Date of scan in org timezone
+    """
+
+    org_timezone = get_scan_org_timezone(member_scan)
+    return tz.localtime(member_scan.date_time, timezone=zoneinfo.ZoneInfo(org_timezone)).date()
+
+
+def update_member_presence(member_scan: MemberScan) -> None:
+    """ Set scan as last scan of member unless member has a later scan.
+        Conditional update, so out of order scans never overwrite a newer one.
+    """
+
+    scan_date = get_scan_date(member_scan)
+    values = {
+        "organization_id": member_scan.organization_id,
+        "date": scan_date,
+        "last_scan": member_scan,
+        "last_scan_type": member_scan.scan_type,
+        "last_scan_at": member_scan.date_time,
+        "updated_at": tz.now(),
+    }
+
+    is_later_scan = Q(date__lt=scan_date) | Q(date=scan_date, last_scan_at__lte=member_scan.date_time)
+    if MemberPresence.objects.filter(is_later_scan, member_id=member_scan.member_id).update(**values):
+        return
+
+    try:
+        with transaction.atomic():
+            MemberPresence.objects.get_or_create(member_id=member_scan.member_id, defaults=values)
+    except IntegrityError:
+        # Created by another request in between, retry the conditional update
+        MemberPresence.objects.filter(is_later_scan, member_id=member_scan.member_id).update(**values)
+
+
+def refresh_member_presence(member_id: int) -> None:
+    """ Rebuild presence of member from the latest remaining scan. Used when scans are deleted.
+    """
+
+    last_scan = MemberScan.objects.filter(member_id=member_id).select_related("organization").order_by(
+        "-date_time"
+    ).first()
+
+    if last_scan is None:
+        MemberPresence.objects.filter(member_id=member_id).delete()
+        return
+
+    MemberPresence.objects.update_or_create(
+        member_id=member_id,
+        defaults={
+            "organization_id": last_scan.organization_id,
+            "date": get_scan_date(last_scan),
+            "last_scan": last_scan,
+            "last_scan_type": last_scan.scan_type,
+            "last_scan_at": last_scan.date_time,
+        },
+    )
+
+
+def get_check_in_status_counts(organization, date) -> dict:
+    """ Check in, check out and yet to check in counts of active members of org on date.
+        One aggregate query over members joined with their presence.
+    """
+
+    today_presence = Q(presence__date=date)
+    counts = Member.objects.filter(organization=organization, status="active").aggregate(
+        total=Count("id"),
+        scanned=Count("id", filter=today_presence),
+        check_in=Count("id", filter=today_presence & Q(presence__last_scan_type="check_in")),
+        check_out=Count("id", filter=today_presence & Q(presence__last_scan_type="check_out")),
+    )
+
+    return {
+        "check_in": counts["check_in"],
+        "check_out": counts["check_out"],
+        "yet_to_check_in": counts["total"] - counts["scanned"],
+    }
+
+
+def get_last_scan_type_on_date(organization, date) -> Subquery:
+    """ Scan type of the last pending scan of member (outer Member row) on date
+        in org timezone, to annotate members of any date without the presence projection.
+    """
+
+    org_timezone = zoneinfo.ZoneInfo(organization.timezone or "UTC")
+    start = tz.make_aware(dt.datetime.combine(date, dt.time.min), org_timezone)
+    end = tz.make_aware(dt.datetime.combine(date + dt.timedelta(days=1), dt.time.min), org_timezone)
+
+    return Subquery(
+        MemberScan.objects.filter(
+            member_id=OuterRef("pk"),
+            member__status="active",
+            organization=organization,
+            date_time__gte=start,
+            date_time__lt=end,
+            status="pending",
+            is_computed=False,
+        )
+        .order_by("-date_time")
+        .values("scan_type")[:1]
+    )
+
+
+def get_check_in_status_label(scan_type: str) -> str:
+    """ Check In / Check Out label of last scan type, Yet To Check In without a scan
+    """
+
+    if scan_type is None:
+        return "Yet To Check In"
+    return CHECK_IN_STATUS_LABELS.get(scan_type, "")
@@ -0,0 +1,120 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from attendance.models import MemberScan
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Compressed scan images end with this suffix, like the ones of img_optimizer
+COMPRESSED_IMAGE_SUFFIX = "-min.jpg"
+
+
+def get_compressed_image_name(name: str) -> str:
+    return f"{os.path.splitext(name)[0]}{COMPRESSED_IMAGE_SUFFIX}"
+
+
+def normalize_image(image: Image.Image) -> Image.Image:
+    """ Rotate image upright using its EXIF orientation and drop alpha for JPEG
+    """
+
+    image = ImageOps.exif_transpose(image)
+    return image.convert("RGB")
+
+
+def render_jpeg(image: Image.Image, max_size: int, quality: int) -> ContentFile:
+    """ JPEG of image fitting in max_size x max_size, aspect ratio is kept
+    """
+
+    image = image.copy()
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def save_replacing(storage, name: str, content: ContentFile) -> str:
+    """ Save content at name, replacing a file left there by an earlier run.
+        Storage would save it under another name instead.
+    """
+
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def write_image_derivatives(storage, name: str, thumbnail_name: str = None) -> tuple:
+    """ Save compressed copy of image name, and its thumbnail if thumbnail_name is given.
+        Original file is left untouched.
+
+        return: (compressed image name, thumbnail name or None) as saved in storage
+    """
+
+    with storage.open(name, "rb") as file:
+        image = normalize_image(Image.open(file))
+
+    image_name = save_replacing(
+        storage,
+        get_compressed_image_name(name),
+        render_jpeg(image, settings.SCAN_IMAGE_MAX_SIZE, settings.SCAN_IMAGE_QUALITY),
+    )
+    # Images without the suffix are picked up again, so they would be compressed forever
+    if not image_name.endswith(COMPRESSED_IMAGE_SUFFIX):
+        storage.delete(image_name)
+        raise ValueError(f"Compressed image of {name} saved as {image_name}")
+
+    if thumbnail_name is not None:
+        thumbnail_name = save_replacing(
+            storage,
+            thumbnail_name,
+            render_jpeg(image, settings.SCAN_THUMBNAIL_SIZE, settings.SCAN_IMAGE_QUALITY),
+        )
+    return image_name, thumbnail_name
+
+
+def create_scan_image_derivatives(scan_id: int) -> bool:
+    """ Replace the uploaded image of a scan with a compressed one and create its thumbnail.
+
+        The original file is removed once the scan points to the new files.
+        Scans without image or already compressed are skipped.
+
+        return: True if derivatives were created
+    """
+
+    member_scan = MemberScan.objects.filter(id=scan_id).only("id", "uuid", "image", "thumbnail").first()
+    if member_scan is None or not member_scan.image:
+        return False
+
+    original_name = member_scan.image.name
+    if original_name.endswith(COMPRESSED_IMAGE_SUFFIX):
+        return False
+
+    storage = member_scan.image.storage
+    image_name, thumbnail_name = write_image_derivatives(
+        storage,
+        original_name,
+        member_scan.thumbnail.field.generate_filename(member_scan, "thumbnail.jpg"),
+    )
+
+    # update() does not send post_save, and is skipped if image changed meanwhile
+    updated = MemberScan.objects.filter(id=member_scan.id, image=original_name).update(
+        image=image_name, thumbnail=thumbnail_name
+    )
+    if updated == 0:
+        # Files of the same names may have been saved by another run for the scan meanwhile
+        current_names = MemberScan.objects.filter(id=member_scan.id).values_list("image", "thumbnail").first() or ()
+        for saved_name in (image_name, thumbnail_name):
+            if saved_name not in current_names:
+                storage.delete(saved_name)
+        return False
+
+    storage.delete(original_name)
+    logger.info(f"Created image derivatives of scan {member_scan.uuid}")
+    return True
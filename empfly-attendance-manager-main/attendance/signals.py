@@ -1,7 +1,8 @@
 # code
-from django.db.models.signals import pre_delete
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Attendance, MemberScan
+from .models import Attendance, MemberPresence, MemberScan
 
 
 #  pre delete attendance model signal
@@ -11,3 +12,50 @@ def reset_attendance_scans(sender, instance, **kwargs):
 
     # update the scan objects
     instance.scans.update(is_computed=False, status="pending")
+
+
+@receiver(post_save, sender=MemberScan)
+def update_presence_on_scan(sender, instance, created, **kwargs):
+    """signal receiver to keep member presence projection up to date with new scans"""
+
+    if not created:
+        return
+
+    from .presence import update_member_presence
+
+    update_member_presence(instance)
+
+
+@receiver(post_save, sender=MemberScan)
+def create_scan_image_derivatives_on_scan(sender, instance, created, **kwargs):
+    """signal receiver to compress image and create thumbnail of new scans in background"""
+
+    if not created or not instance.image:
+        return
+
+    from .tasks import create_scan_image_derivatives_task
+
+    scan_id = instance.id
+    transaction.on_commit(lambda: create_scan_image_derivatives_task.delay(scan_id))
+
+
+@receiver(post_delete, sender=MemberScan)
+def refresh_presence_on_scan_delete(sender, instance, **kwargs):
+    """signal receiver to rebuild member presence if its last scan is deleted"""
+
+    from .presence import refresh_member_presence
+
+    # last_scan is already set to null when the scan is deleted
+    if MemberPresence.objects.filter(member_id=instance.member_id, last_scan__isnull=True).exists():
+        refresh_member_presence(instance.member_id)
+
+
+@receiver(post_save, sender="organization.SystemLocation")
+@receiver(post_delete, sender="organization.SystemLocation")
+def invalidate_geofence_index_on_location_change(sender, instance, **kwargs):
+    """signal receiver to rebuild geofence index of system location org once the change is committed"""
+
+    from .geofence import invalidate_geofence_index
+
+    organization_id = instance.organization_id
+    transaction.on_commit(lambda: invalidate_geofence_index(organization_id))
@@ -197,3 +197,17 @@ def attendance_task():
                         mark_attendance(member, roster, status="present")
                     else:
                         mark_attendance(member, roster, status="absent")
+
+
+@shared_task(name="compute_shift_attendance_task")
+def compute_shift_attendance_task(shift_id: int, now: str):
+    from attendance.attendance_computation import compute_shift_attendance
+
+    compute_shift_attendance(shift_id, now)
+
+
+@shared_task(name="create_scan_image_derivatives_task")
+def create_scan_image_derivatives_task(scan_id: int):
+    from attendance.scan_images import create_scan_image_derivatives
+
+    create_scan_image_derivatives(scan_id)
@@ -1,3 +1,387 @@
-from django.test import TestCase
+import datetime as dt
+import io
+import tempfile
+from types import SimpleNamespace
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from account.models import User
+from attendance.archive import (
+    archive_attendances,
+    archive_scans,
+    create_archive_partitions,
+    get_archivable_scan_ids,
+)
+from attendance.attendance_metrics import (
+    apply_attendance_metrics,
+    compute_attendance_metrics,
+    to_epoch_seconds,
+)
+from attendance.geofence import get_geofence_index, get_geofence_version
+from attendance.models import ArchivedAttendance, ArchivedMemberScan, Attendance, MemberPresence, MemberScan
+from attendance.scan_images import write_image_derivatives
+from member.models import Member
+from organization.models import Organization, Role, SystemLocation
+from shift.models import Shift
+
+
+SHIFT_START = dt.datetime(2024, 4, 8, 9, 0, tzinfo=dt.timezone.utc)
+SHIFT_END = dt.datetime(2024, 4, 8, 18, 0, tzinfo=dt.timezone.utc)
+# Monday
+ATTENDANCE_DATE = SHIFT_START.date()
+
+
+def at(hour: int, minute: int = 0) -> dt.datetime:
+    return SHIFT_START.replace(hour=hour, minute=minute)
+
+
+def get_shift(skip_days=()) -> SimpleNamespace:
+    return SimpleNamespace(present_working_hours=8, partial_working_hours=4, skip_days=list(skip_days))
+
+
+def get_attendance() -> SimpleNamespace:
+    return SimpleNamespace(
+        duration=None,
+        late_check_in=None,
+        early_check_out=None,
+        late_check_out=None,
+        overtime=None,
+        ot_status=None,
+        status=None,
+    )
+
+
+def old_per_row_metrics(scans: list, present_working_minutes: float, max_minutes: float = 1440) -> dict:
+    """ Metrics of one member as computed scan by scan before the metric kernel
+    """
+
+    def limit(minutes):
+        return minutes if minutes <= max_minutes else max_minutes
+
+    scans_length = len(scans)
+    used_length = scans_length if scans_length % 2 == 0 else scans_length - 1
+    duration = sum(
+        (scans[i + 1] - scans[i]).total_seconds() / 60 for i in range(0, used_length, 2)
+    )
+    duration = limit(duration)
+
+    metrics = {"duration": duration, "late_check_in": None, "early_check_out": None,
+               "late_check_out": None, "overtime": None}
+
+    late_duration = (scans[0] - SHIFT_START).total_seconds() / 60
+    if late_duration > 0:
+        metrics["late_check_in"] = limit(late_duration)
+
+    if scans_length > 1:
+        last_scan = scans[scans_length - 1] if scans_length % 2 == 0 else scans[scans_length - 2]
+        difference = (last_scan - SHIFT_END).total_seconds() / 60
+        if difference > 0:
+            metrics["late_check_out"] = limit(difference)
+        else:
+            metrics["early_check_out"] = abs(difference)
+
+        if duration > present_working_minutes:
+            metrics["overtime"] = limit(duration - present_working_minutes)
+
+    return metrics
+
+
+class AttendanceMetricsTestCase(SimpleTestCase):
+
+    def compute(self, scans_by_member: dict):
+        member_ids = [member_id for member_id, scans in scans_by_member.items() for _ in scans]
+        date_times = [date_time for scans in scans_by_member.values() for date_time in scans]
+        metrics = compute_attendance_metrics(
+            member_ids=member_ids,
+            scan_epochs=to_epoch_seconds(date_times),
+            shift_start_epoch=SHIFT_START.timestamp(),
+            shift_end_epoch=SHIFT_END.timestamp(),
+            present_working_minutes=8 * 60,
+        )
+        return {row.Index: row for row in metrics.itertuples()}
+
+    def apply(self, scans: list, shift=None, is_holiday=False, ot_approval=False, automated_ot_approval=True):
+        attendance = get_attendance()
+        apply_attendance_metrics(
+            attendance,
+            self.compute({1: scans})[1],
+            shift or get_shift(),
+            ATTENDANCE_DATE,
+            is_holiday,
+            ot_approval,
+            automated_ot_approval,
+        )
+        return attendance
+
+    def assert_same_as_per_row(self, scans_by_member: dict):
+        metrics = self.compute(scans_by_member)
+        for member_id, scans in scans_by_member.items():
+            expected = old_per_row_metrics(sorted(scans), 8 * 60)
+            attendance = get_attendance()
+            apply_attendance_metrics(attendance, metrics[member_id], get_shift(), ATTENDANCE_DATE, False, False, True)
+            for field, value in expected.items():
+                self.assertAlmostEqual(getattr(attendance, field), value, msg=f"{member_id} {field}")
+
+    def test_late_check_in_and_early_check_out(self):
+        attendance = self.apply([at(9, 30), at(17, 45)])
+
+        self.assertEqual(attendance.duration, 495)
+        self.assertEqual(attendance.late_check_in, 30)
+        self.assertEqual(attendance.early_check_out, 15)
+        self.assertIsNone(attendance.late_check_out)
+        # Overtime is duration over present working hours, not time after shift end
+        self.assertEqual(attendance.overtime, 15)
+        self.assertEqual(attendance.status, "present")
+
+    def test_overtime_without_ot_approval(self):
+        attendance = self.apply([at(8), at(20)])
+
+        self.assertEqual(attendance.duration, 720)
+        self.assertIsNone(attendance.late_check_in)
+        self.assertEqual(attendance.late_check_out, 120)
+        self.assertEqual(attendance.overtime, 240)
+        self.assertIsNone(attendance.ot_status)
+        self.assertEqual(attendance.status, "present")
+
+    def test_overtime_with_ot_approval(self):
+        attendance = self.apply([at(8), at(20)], ot_approval=True, automated_ot_approval=False)
+
+        self.assertEqual(attendance.overtime, 240)
+        self.assertEqual(attendance.ot_status, "ot_available")
+        # Overtime is not part of duration until approved
+        self.assertEqual(attendance.duration, 480)
+        self.assertEqual(attendance.status, "present")
+
+        attendance = self.apply([at(8), at(20)], ot_approval=True, automated_ot_approval=True)
+        self.assertEqual(attendance.ot_status, "ot_requested")
+
+    def test_half_day(self):
+        attendance = self.apply([at(9), at(14)])
+
+        self.assertEqual(attendance.duration, 300)
+        self.assertEqual(attendance.early_check_out, 240)
+        self.assertEqual(attendance.status, "partial")
+
+    def test_absent(self):
+        self.assertEqual(self.apply([at(9), at(10)]).status, "absent")
+
+        # Single scan has no check-out, so no duration
+        attendance = self.apply([at(9, 10)])
+        self.assertEqual(attendance.duration, 0)
+        self.assertEqual(attendance.late_check_in, 10)
+        self.assertIsNone(attendance.early_check_out)
+        self.assertEqual(attendance.status, "absent")
+
+    def test_weekend_and_holiday(self):
+        self.assertEqual(self.apply([at(9), at(18)], shift=get_shift(skip_days=[0])).status, "weekend")
+        self.assertEqual(
+            self.apply([at(9), at(18)], shift=get_shift(skip_days=[0]), is_holiday=True).status, "holiday"
+        )
+
+    def test_same_as_per_row_computation(self):
+        self.assert_same_as_per_row(
+            {
+                1: [at(9, 30), at(17, 45)],
+                2: [at(20), at(8)],
+                3: [at(9), at(12), at(13), at(18, 30)],
+                4: [at(10), at(11), at(12)],
+                5: [at(9, 5)],
+            }
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Plans are of PostgreSQL")
+class MemberScanIndexTestCase(TestCase):
+
+    def get_plan(self, queryset) -> str:
+        with connection.cursor() as cursor:
+            # Tables are empty, so make the planner prefer any usable index
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def test_pending_scans_of_member_use_index(self):
+        queryset = MemberScan.objects.filter(
+            member_id=1,
+            date_time__gte=SHIFT_START,
+            date_time__lt=SHIFT_END,
+            status="pending",
+            is_computed=False,
+        ).order_by("date_time")
+
+        self.assertIn("scan_member_date_time_idx", self.get_plan(queryset))
+
+    def test_scans_of_org_use_index(self):
+        queryset = MemberScan.objects.filter(
+            organization_id=1, date_time__gte=SHIFT_START, date_time__lt=SHIFT_END
+        ).order_by("date_time")
+
+        self.assertIn("scan_org_date_time_idx", self.get_plan(queryset))
+
+
+class ScanImageDerivativesTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+
+        buffer = io.BytesIO()
+        Image.new("RGBA", (1200, 800), (200, 10, 10, 255)).save(buffer, format="PNG")
+        self.storage.save("scans/scan.png", ContentFile(buffer.getvalue()))
+
+    def test_files_of_earlier_run_are_replaced(self):
+        # Left by a run that failed before the scan was updated
+        self.storage.save("scans/scan-min.jpg", ContentFile(b"partial"))
+        self.storage.save("scans/thumbnail.jpg", ContentFile(b"partial"))
+
+        names = write_image_derivatives(self.storage, "scans/scan.png", "scans/thumbnail.jpg")
+
+        self.assertEqual(names, ("scans/scan-min.jpg", "scans/thumbnail.jpg"))
+        self.assertEqual(sorted(self.storage.listdir("scans")[1]), ["scan-min.jpg", "scan.png", "thumbnail.jpg"])
+        for name in names:
+            with self.storage.open(name, "rb") as file:
+                self.assertEqual(Image.open(file).format, "JPEG")
+
+
+@skipUnless(connection.vendor == "postgresql", "Archive tables are PostgreSQL partitioned tables")
+class ArchiveTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(name="Archive Org")
+        # Members get an initial shift schedule log of the org default shift
+        cls.org.default_shift = Shift.objects.create(
+            name="General",
+            organization=cls.org,
+            start_time=dt.time(9),
+            end_time=dt.time(18),
+            computation_time=dt.time(20),
+        )
+        cls.org.save()
+        role, _ = Role.objects.get_or_create(name="member")
+        user = User.objects.create(username="archived", first_name="archived")
+        cls.member = Member.objects.create(user=user, organization=cls.org, role=role)
+
+    def create_scan(self, date_time: dt.datetime, status: str = "computed") -> MemberScan:
+        return MemberScan.objects.create(
+            member=self.member,
+            organization=self.org,
+            date_time=date_time,
+            scan_type="check_in",
+            status=status,
+            is_computed=status != "pending",
+        )
+
+    def get_partitions(self) -> list:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "WHERE parent.relname IN (%s, %s) ORDER BY child.relname",
+                [ArchivedAttendance._meta.db_table, ArchivedMemberScan._meta.db_table],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_monthly_partitions_are_created_once(self):
+        create_archive_partitions(dt.date(2023, 11, 15), dt.date(2024, 1, 2))
+        create_archive_partitions(dt.date(2023, 12, 1), dt.date(2023, 12, 31))
+
+        self.assertEqual(
+            self.get_partitions(),
+            [
+                f"{table}_p{month}"
+                for table in (ArchivedAttendance._meta.db_table, ArchivedMemberScan._meta.db_table)
+                for month in ("202311", "202312", "202401")
+            ],
+        )
+
+    def test_attendances_are_moved_with_their_scans(self):
+        check_in = self.create_scan(dt.datetime(2023, 1, 10, 9, tzinfo=dt.timezone.utc))
+        check_out = self.create_scan(dt.datetime(2023, 1, 10, 18, tzinfo=dt.timezone.utc))
+        attendance = Attendance.objects.create(
+            member=self.member, organization=self.org, date=dt.date(2023, 1, 10), status="present", duration=540
+        )
+        attendance.scans.add(check_out, check_in)
+        self.assertEqual(MemberPresence.objects.get(member=self.member).last_scan, check_out)
+
+        self.assertEqual(archive_attendances([attendance.id]), (1, 2))
+
+        self.assertFalse(Attendance.objects.filter(id=attendance.id).exists())
+        self.assertFalse(MemberScan.objects.filter(id__in=[check_in.id, check_out.id]).exists())
+        archived = ArchivedAttendance.objects.get(id=attendance.id)
+        self.assertEqual((archived.status, archived.duration), ("present", 540))
+        self.assertEqual(archived.scan_ids, [check_in.id, check_out.id])
+        self.assertEqual(
+            sorted(ArchivedMemberScan.objects.values_list("id", flat=True)), [check_in.id, check_out.id]
+        )
+        self.assertIsNone(MemberPresence.objects.get(member=self.member).last_scan)
+
+    def test_pending_and_recent_scans_are_not_archived(self):
+        cutoff = dt.datetime(2023, 2, 1, tzinfo=dt.timezone.utc)
+        computed = self.create_scan(dt.datetime(2023, 1, 10, 9, tzinfo=dt.timezone.utc))
+        expired = self.create_scan(dt.datetime(2023, 1, 11, 9, tzinfo=dt.timezone.utc), status="expired")
+        pending = self.create_scan(dt.datetime(2023, 1, 12, 9, tzinfo=dt.timezone.utc), status="pending")
+        recent = self.create_scan(dt.datetime(2023, 2, 2, 9, tzinfo=dt.timezone.utc))
+
+        scan_ids = get_archivable_scan_ids(cutoff, 10)
+        self.assertEqual(scan_ids, [computed.id, expired.id])
+        self.assertEqual(archive_scans(scan_ids), 2)
+
+        self.assertEqual(
+            sorted(MemberScan.objects.values_list("id", flat=True)), [pending.id, recent.id]
+        )
+        self.assertEqual(
+            sorted(ArchivedMemberScan.objects.values_list("id", flat=True)), [computed.id, expired.id]
+        )
+
+
+class GeofenceIndexTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(name="Geofence Org")
+        cls.location = SystemLocation.objects.create(
+            organization=cls.org, name="Office", latitude=12.9716, longitude=77.5946, radius=50
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def move_location(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.latitude, self.location.longitude = 13.0827, 80.2707
+            self.location.save()
+
+    @override_settings(SHARED_CACHE=True)
+    def test_location_changes_bump_shared_version(self):
+        index = get_geofence_index(self.org.id)
+        self.assertEqual(index.match(12.9716, 77.5946), self.location)
+
+        # Cached index is reused without querying locations
+        with self.assertNumQueries(0):
+            self.assertIs(get_geofence_index(self.org.id), index)
+
+        self.move_location()
+        self.assertIsNone(get_geofence_index(self.org.id).match(12.9716, 77.5946))
+
+        version = get_geofence_version(self.org.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.delete()
+        self.assertNotEqual(get_geofence_version(self.org.id), version)
+        self.assertEqual(len(get_geofence_index(self.org.id)), 0)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_version_is_read_from_db_without_shared_cache(self):
+        version = get_geofence_version(self.org.id)
+
+        # Changed by another worker, no signal in this one
+        SystemLocation.objects.filter(id=self.location.id).update(status="inactive")
+
+        self.assertNotEqual(get_geofence_version(self.org.id), version)
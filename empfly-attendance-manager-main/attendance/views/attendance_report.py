@@ -1,5 +1,6 @@
 from attendance.filters import filter_report_for_attendance
-from attendance.models import Attendance, MemberScan
+from attendance.models import Attendance
+from attendance.presence import get_check_in_status_counts
 from member.models import Member
 from rest_framework import views, status
 from api import permissions
@@ -78,17 +79,9 @@ class MemberCheckInStatusAPI(views.APIView):
             return read_data.get_403_response()
 
         curr_dt = curr_dt_with_org_tz()
-        print(curr_dt)
-
-        members_today_scans = MemberScan.objects.filter(
-            date_time__date=curr_dt.date(),
-            member__status="active", status="pending",
-            is_computed=False, organization=org
-        )
-        members = Member.objects.filter(organization=org, status="active")
-
 
         if bool(request.GET.get("export_csv")) is True:
+            members = Member.objects.filter(organization=org, status="active")
             if not members.exists():
                 return HTTP_400({}, {"message": "No data found for export."})
 
@@ -104,25 +97,5 @@ class MemberCheckInStatusAPI(views.APIView):
                 return HTTP_400({}, {"export_request_uuid": None})
             return HTTP_200({"export_request_uuid": export_request.uuid})
 
-        yet_to_check_in = 0
-        check_in = 0
-        check_out = 0
-
-        for member in members:
-            member_scan = members_today_scans.filter(member=member)
-            if not member_scan.exists():
-                yet_to_check_in += 1
-                continue
-
-            last_scan = member_scan.order_by("date_time").last()
-            if last_scan.scan_type == "check_in":
-                check_in += 1
-            elif last_scan.scan_type == "check_out":
-                check_out += 1
-
-
-        return HTTP_200({
-            "check_in": check_in,
-            "check_out": check_out,
-            "yet_to_check_in": yet_to_check_in,
-        })
+        # Counts from member presence projection, kept up to date by member scan signals
+        return HTTP_200(get_check_in_status_counts(org, curr_dt.date()))
@@ -1,8 +1,7 @@
-from django.forms import BooleanField
 from datetime import date, timedelta
 from django.db import IntegrityError
 from requests import request
-from attendance.filters import filter_attendance, filter_my_attendance
+from attendance.filters import filter_my_attendance, get_attendance_report_queryset
 from attendance.search import search_attendance
 from organization.models import Organization, SystemLocation
 from rest_framework import views, status
@@ -24,7 +23,7 @@ from organization.serializers import OrganizationSerializer
 
 from utils import read_data, fetch_data, create_data, email_funcs
 
-from export.utils import create_export_request
+from export.utils import create_export_request, get_export_file_format, get_export_query
 from utils.create_data import add_first_and_last_check_in
 import logging
 from utils.response import HTTP_200, HTTP_400
@@ -49,13 +48,27 @@ class AttendanceReportAPI(views.APIView):
         if fetch_data.is_admin_hr_member(member) is False:
             return read_data.get_403_response()
 
-        filter_query = Q(organization=org)
+        attendance = get_attendance_report_queryset(org, member, request.GET)
 
-        filter_status = request.GET.get("status", "active")
-        if filter_status in ("active", "inactive"):
-            filter_query &= Q(member__status=filter_status)
+        if bool(request.GET.get("export_csv")) is True:
+
+            # print(attendance)
+
+            if not attendance.exists():
+                return HTTP_400({}, {"message": "No data found for export csv."})
 
-        attendance = Attendance.objects.filter(filter_query).prefetch_related(
+            # Export worker re-runs the query from the request filters
+            export_request = create_export_request(
+                member,
+                "attendance",
+                query=get_export_query(request.GET),
+                file_format=get_export_file_format(request.GET),
+            )
+            if export_request is None:
+                return HTTP_400({}, {"export_request_uuid": None})
+            return HTTP_200({"export_request_uuid": export_request.uuid})
+
+        attendance = attendance.prefetch_related(
             Prefetch(
                 "scans",
                 queryset=MemberScan.objects.filter(
@@ -70,42 +83,6 @@ class AttendanceReportAPI(views.APIView):
             "shift",
         )
 
-
-        is_mobile = BooleanField().to_python(request.GET.get("is_mobile", "False"))
-
-        print(f"is_mobile : {is_mobile}, type : {type(is_mobile)}")
-
-        if is_mobile is True:                                # Mobile app only required logged in user only data
-            attendance = attendance.filter(member=member)
-
-        elif member.role.name not in ("admin", "hr"):        # Check for member is manager
-            org_location_obj = member.org_location_head.all()
-            department_obj = member.department_head.all()
-            employees = member.members.all()
-
-            if org_location_obj.exists() or department_obj.exists() or employees.exists():
-                attendance = attendance.filter(
-                    Q(member__org_location__in=org_location_obj) | Q(member__department__in=department_obj) | Q(member__manager=member)
-                )
-            else:                                            # Only curr member data will show
-                attendance = attendance.filter(member=member)
-
-        attendance = filter_attendance(attendance, request)
-        attendance = search_attendance(attendance, request.GET.get("search"))
-
-        if bool(request.GET.get("export_csv")) is True:
-
-            # print(attendance)
-
-            if not attendance.exists():
-                return HTTP_400({}, {"message": "No data found for export csv."})
-
-            attendance_ids = attendance.values_list("id", flat=True)
-            export_request = create_export_request(member, "attendance", list(attendance_ids))
-            if export_request is None:
-                return HTTP_400({}, {"export_request_uuid": None})
-            return HTTP_200({"export_request_uuid": export_request.uuid})
-
         # print(attendance)
         page_obj, num_pages, page = pagination(attendance, request)
         serializer = self.serializer_class(
@@ -6,7 +6,8 @@ from attendance.exceptions import KioskScanError
 from attendance.utils import autenticated_dit, is_last_scan_before_5min
 from kiosk.models import Kiosk
 from kiosk.serializers import KioskSerializer
-from member.models import Member, MemberImage
+from member.constants import FACE_MATCH_TOLERANCE
+from member.models import Member
 from organization.models import Organization, SystemLocation
 from attendance.models import MemberScan
 from django.core.exceptions import ValidationError
@@ -23,14 +24,13 @@ from rest_framework import views, status
 from api import permissions
 from rest_framework.response import Response
 from shift.models import ShiftScheduleLog
+from shift.schedule_resolver import get_member_shift_schedule_logs
 from utils import fetch_data, read_data
 from utils import face_rec
 from utils.response import HTTP_200, HTTP_400
 from utils import utils
-import face_recognition
 from geopy.distance import geodesic
 from django.db.models import Q
-import numpy as np
 from utils.date_time import convert_dt_to_another_tz, curr_date_time_with_tz, curr_dt_with_org_tz
 from utils import shift
 from utils import utils
@@ -497,18 +497,12 @@ class KioskScanAPI(views.APIView):
             Get fr images from org and match with member images.
         """
 
-        fr_images = MemberImage.objects.filter(organization=self.org)
+        face_index = face_rec.get_face_index(self.org.id)
 
-        if fr_images.exists() is False:
+        if len(face_index) == 0:
             raise KioskScanError("No member images found in this organization.")
 
-        known_face_encodings = face_rec.get_face_encodings(fr_images)
-
-        known_face_ids = face_rec.get_user_ids(fr_images)
-
-        logging.info(
-            f"known_face_encodings = {len(known_face_encodings)}, known_face_ids = {len(known_face_ids)}"
-        )
+        logging.info(f"known_face_encodings = {len(face_index)}")
 
         image = utils.base64_to_contentfile(image)
         if isinstance(image, ContentFile) is False:
@@ -521,39 +515,17 @@ class KioskScanAPI(views.APIView):
             logging.error("========= face encoding have no lenght =========")
             raise KioskScanError("No face detected.")
 
-        matches = face_recognition.compare_faces(
-            known_face_encodings, face_encoding, tolerance=0.35
-        )
-
-        face_distances = face_recognition.face_distance(
-            known_face_encodings, face_encoding
-        )
+        member_id, distance = face_index.best_match(face_encoding, FACE_MATCH_TOLERANCE)
 
-        logging.info(f"Matches: {matches}")
-        logging.info(f"Distances: {face_distances}")
+        logging.info(f"Best match distance : {distance}")
 
-        try:
-            best_match_index = np.argmin(face_distances)
-        except ValueError as err:
-            logging.error(err)
-            raise KioskScanError(
-                "Your images for Face Recognition are not available. Please upload them on Web UI."
-            )
-        except Exception as err:
-            logging.error(err)
-            logging.critical(f"Add exception for {err.__class__.__name__} in ")
+        if member_id is None:
             raise KioskScanError("No Match Found.")
 
-        logging.info(f"Best match index : {best_match_index}")
-
-        if bool(matches[best_match_index]) is False:
-            raise KioskScanError("No Match Found.")
-
-        user_id = known_face_ids[best_match_index]
-        logging.info(f"User ID : {known_face_ids}")
+        logging.info(f"Member ID : {member_id}")
 
         try:
-            member = Member.objects.get(user__id=user_id, organization=self.org)
+            member = Member.objects.get(id=member_id, organization=self.org)
         except Member.DoesNotExist:
             raise KioskScanError("Member not Found.")
 
@@ -570,18 +542,12 @@ class KioskScanAPI(views.APIView):
             "find_member_from_all_fr_images Started working"
         )
 
-        fr_images = MemberImage.objects.filter(member__status="active").select_related("member")
+        face_index = face_rec.get_face_index(face_rec.INSTANCE_INDEX_KEY)
 
-        if fr_images.exists() is False:
+        if len(face_index) == 0:
             raise KioskScanError("Your images for Face Recognition are not available. Please upload them on Web UI.")
 
-        known_face_encodings = face_rec.get_face_encodings(fr_images)
-
-        known_face_ids = face_rec.get_member_ids(fr_images)
-
-        logging.info(
-            f"known_face_encodings = {len(known_face_encodings)}, known_face_member_ids = {len(known_face_ids)}"
-        )
+        logging.info(f"known_face_encodings = {len(face_index)}")
 
         image = utils.base64_to_contentfile(image)
         if isinstance(image, ContentFile) is False:
@@ -594,22 +560,7 @@ class KioskScanAPI(views.APIView):
             logging.error("========= face encoding have no length =========")
             raise KioskScanError("No face detected.")
 
-        matches = face_recognition.compare_faces(
-            known_face_encodings, face_encoding, tolerance=0.35
-        )
-        logging.info(f"Matches: {matches}")
-
-        all_matched_user_ids = set()
-        for index, match in enumerate(matches):
-            logging.info(f"type of match before: {type(match)}")
-            match = bool(match)
-            logging.info(f"type of match after: {type(match)}")
-            logging.info(f"match: {match}")
-            if match is False:
-                continue
-
-            logging.info(f"member id: {known_face_ids[index]}")
-            all_matched_user_ids.add(known_face_ids[index])
+        all_matched_user_ids = face_index.matched_member_ids(face_encoding, FACE_MATCH_TOLERANCE)
 
         len_all_match_user = len(all_matched_user_ids)
         logging.info(f"len_all_match_user: {len_all_match_user}")
@@ -671,20 +622,7 @@ class KioskScanAPI(views.APIView):
 
 
     def get_ssl_for_day_before_yesterday(self, date):
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=self.member, organization=self.org
-        )
-
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=date,
-                    end_date__gte=date,
-                )
-                | Q(start_date__lte=date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
+        (yesterday_log,) = get_member_shift_schedule_logs(self.member, self.org, [date])
         return yesterday_log
         
     def post(self, request, *args, **kwargs):
@@ -1047,47 +985,13 @@ class KioskScanAPI(views.APIView):
     def get_ssl(self, member: Member, org: Organization) -> ShiftScheduleLog:
         """Retrive member yesterday, today, tomorrow  Shift Schedule Log"""
 
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=member, organization=org
-        )
-
         logging.info(f"yesterday_date : {self.yesterday_date}")
         logging.info(f"curr_date : {self.curr_date}")
         logging.info(f"tomorrow_date : {self.tomorrow_date}")
 
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=self.yesterday_date,
-                    end_date__gte=self.yesterday_date,
-                )
-                | Q(start_date__lte=self.yesterday_date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
-
-        try:
-            today_log = logs.get(
-                Q(
-                    start_date__lte=self.curr_date,
-                    end_date__gte=self.curr_date,
-                )
-                | Q(start_date__lte=self.curr_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            today_log = None
-            # raise KioskScanError("Shift not found.")
-
-        try:
-            tomorrow_log = logs.get(
-                Q(
-                    start_date__lte=self.tomorrow_date,
-                    end_date__gte=self.tomorrow_date,
-                )
-                | Q(start_date__lte=self.tomorrow_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            tomorrow_log = None
+        yesterday_log, today_log, tomorrow_log = get_member_shift_schedule_logs(
+            member, org, [self.yesterday_date, self.curr_date, self.tomorrow_date]
+        )
 
         return yesterday_log, today_log, tomorrow_log
 
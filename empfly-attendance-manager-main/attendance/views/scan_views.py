@@ -16,10 +16,10 @@ from attendance.attendance_utils import (
     geo_fencing_for_loc_settings,
     # shift_logic,
 )
-from attendance.filters import filter_member_scan
+from attendance.filters import filter_member_scan, get_member_scans_queryset
 from attendance.search import search_member_scan
 from attendance.utils import is_last_scan_before_5min
-from export.utils import create_export_request
+from export.utils import create_export_request, get_export_file_format, get_export_query
 from kiosk.models import Kiosk
 from member.models import Member, MemberImage
 from organization.models import Organization, SystemLocation
@@ -36,6 +36,7 @@ from django.db.models import Q
 import face_recognition
 import numpy as np
 from shift.models import LocationSettings, Shift, ShiftScheduleLog
+from shift.schedule_resolver import get_member_shift_schedule_logs
 from geopy.distance import geodesic
 from django.db.models import Case, When
 from django.db import transaction
@@ -708,20 +709,7 @@ class CheckInOrCheckoutAPI(views.APIView):
 
     def get_ssl_for_day_before_yesterday(self, date):
         """Get ssl of the date."""
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=self.member, organization=self.org
-        )
-
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=date,
-                    end_date__gte=date,
-                )
-                | Q(start_date__lte=date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
+        (yesterday_log,) = get_member_shift_schedule_logs(self.member, self.org, [date])
         return yesterday_log
 
     def find_last_computation_dt(self, yesterday_log, today_log, tomorrow_log):
@@ -826,43 +814,10 @@ class CheckInOrCheckoutAPI(views.APIView):
     def get_ssl(self, member: Member, org: Organization) -> ShiftScheduleLog:
         """Retrive member yesterday, today, tomorrow  Shift Schedule Log"""
 
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=member, organization=org
+        yesterday_log, today_log, tomorrow_log = get_member_shift_schedule_logs(
+            member, org, [self.yesterday_date, self.curr_date, self.tomorrow_date]
         )
 
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=self.yesterday_date,
-                    end_date__gte=self.yesterday_date,
-                )
-                | Q(start_date__lte=self.yesterday_date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
-
-        try:
-            today_log = logs.get(
-                Q(
-                    start_date__lte=self.curr_date,
-                    end_date__gte=self.curr_date,
-                )
-                | Q(start_date__lte=self.curr_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            today_log = None
-
-        try:
-            tomorrow_log = logs.get(
-                Q(
-                    start_date__lte=self.tomorrow_date,
-                    end_date__gte=self.tomorrow_date,
-                )
-                | Q(start_date__lte=self.tomorrow_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            tomorrow_log = None
-
         return yesterday_log, today_log, tomorrow_log
 
     def validate_check_in(self, log, actual_date):
@@ -1219,38 +1174,18 @@ class AllMemberScansAPI(views.APIView):
         if fetch_data.is_admin_hr_member(member) is False:
             return read_data.get_403_response()
 
-        member_scans = MemberScan.objects.filter(organization=org)
-
-        filter_status = request.GET.get("status", "active")
-        if filter_status in ("active", "inactive"):
-            member_scans = member_scans.filter(member__status=filter_status)
-
-        if member.role.name not in ("admin", "hr"):
-
-            org_location_obj = member.org_location_head.all()
-            department_obj = member.department_head.all()
-            employees = member.members.all()
-
-            if org_location_obj.exists() or department_obj.exists() or employees.exists():
-                member_scans = member_scans.filter(
-                    Q(member__org_location__in=org_location_obj) | Q(member__department__in=department_obj) | Q(member__manager=member)
-                )
-            else:
-                # Only see his data
-                member_scans = member_scans.filter(member=member)
-
-        member_scans = filter_member_scan(member_scans, request)
-
-        search_query = request.GET.get("search")
-        member_scans = search_member_scan(member_scans, search_query)
+        member_scans = get_member_scans_queryset(org, member, request.GET)
 
         if bool(request.GET.get("export_csv")) is True:
             if not member_scans.exists():
                 return HTTP_400({}, {"message": "No data found for export."})
 
-            departments_ids = member_scans.values_list("id", flat=True)
+            # Export worker re-runs the query from the request filters
             export_request = create_export_request(
-                member, "attendance_register", list(departments_ids)
+                member,
+                "attendance_register",
+                query=get_export_query(request.GET),
+                file_format=get_export_file_format(request.GET),
             )
             if export_request is None:
                 return HTTP_400({}, {"export_request_uuid": None})
@@ -81,6 +81,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "account.middleware.request_context.RequestContextMiddleware",
     "account.middleware.timezone.TimezoneMiddleware",
     "account.middleware.authenticate_user.AuthenticateUser",
 ]
@@ -314,3 +315,74 @@ DB_SAVING_PATH = env("DB_SAVING_PATH")
 IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR = float(env("IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR"))
 
 print(f"IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR: {IMAGE_OPTIMIZER_MAX_RUNTIME_HOUR}")
+
+# Face rec indexes with at least this many encodings use the IVF index. 0 disables IVF.
+FACE_INDEX_IVF_MIN_SIZE = int(read_env_variable("FACE_INDEX_IVF_MIN_SIZE", 20000))
+# Max IVF lists checked for the best match of a scan, nearest first. 0 checks every list
+# that can hold a match (exact result). Multiple member checks always use every list.
+FACE_INDEX_IVF_NPROBE = int(read_env_variable("FACE_INDEX_IVF_NPROBE", 0))
+
+# Worker processes used by compute_attendance command. 1 computes shifts serially.
+ATTENDANCE_COMPUTATION_WORKERS = int(read_env_variable("ATTENDANCE_COMPUTATION_WORKERS", 1))
+
+# Max export requests of an organization processed at the same time
+EXPORT_MAX_CONCURRENT_PER_ORG = int(read_env_variable("EXPORT_MAX_CONCURRENT_PER_ORG", 2))
+# Processing exports without progress for this many seconds are failed, freeing their slot
+EXPORT_PROCESSING_TIMEOUT = int(read_env_variable("EXPORT_PROCESSING_TIMEOUT", 3600))
+
+# Cache shared by all web and celery workers, "redis://host:6379/0". Without it the
+# default cache is per process, so data invalidated on change (auth tokens, dashboard,
+# face index and applicability versions) is not cached.
+CACHE_URL = read_env_variable("CACHE_URL", "")
+SHARED_CACHE = bool(CACHE_URL)
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+
+# Seconds an auth token is cached for token authentication
+AUTH_TOKEN_CACHE_TIMEOUT = int(read_env_variable("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+# Min seconds between last_used_at writes of an auth token
+AUTH_TOKEN_LAST_USED_INTERVAL = int(read_env_variable("AUTH_TOKEN_LAST_USED_INTERVAL", 300))
+
+# Seconds today's scan/visitor counters of an org are cached for dashboard
+DASHBOARD_CACHE_TIMEOUT = int(read_env_variable("DASHBOARD_CACHE_TIMEOUT", 60))
+# Seconds last check in, last attendance and shift of a member are cached for dashboard
+DASHBOARD_MEMBER_CACHE_TIMEOUT = int(read_env_variable("DASHBOARD_MEMBER_CACHE_TIMEOUT", 30))
+
+# Header letting the front proxy send fetched files, "X-Accel-Redirect" (nginx) or "X-Sendfile". Empty streams from django.
+FILE_SERVE_OFFLOAD_HEADER = read_env_variable("FILE_SERVE_OFFLOAD_HEADER", "")
+# Internal proxy location prepended to the file path for X-Accel-Redirect
+FILE_SERVE_OFFLOAD_PREFIX = read_env_variable("FILE_SERVE_OFFLOAD_PREFIX", "/protected/")
+
+# Max width/height in px of compressed scan images, and of their thumbnails
+SCAN_IMAGE_MAX_SIZE = int(read_env_variable("SCAN_IMAGE_MAX_SIZE", 1280))
+SCAN_THUMBNAIL_SIZE = int(read_env_variable("SCAN_THUMBNAIL_SIZE", 200))
+# JPEG quality of compressed scan images and thumbnails
+SCAN_IMAGE_QUALITY = int(read_env_variable("SCAN_IMAGE_QUALITY", 70))
+
+# Worker processes and rows per chunk of img_optimizer command
+IMAGE_OPTIMIZER_WORKERS = int(read_env_variable("IMAGE_OPTIMIZER_WORKERS", os.cpu_count() or 1))
+IMAGE_OPTIMIZER_CHUNK_SIZE = int(read_env_variable("IMAGE_OPTIMIZER_CHUNK_SIZE", 500))
+# Last optimized id of each model, img_optimizer resumes from here
+IMAGE_OPTIMIZER_CHECKPOINT_PATH = read_env_variable("IMAGE_OPTIMIZER_CHECKPOINT_PATH", "logs/img_optimizer_checkpoint.json")
+
+# Cell size in degrees of the grid used to find system locations near a scan (0.01 is about 1.1 km)
+GEOFENCE_GRID_DEGREES = float(read_env_variable("GEOFENCE_GRID_DEGREES", 0.01))
+
+# Attendances and computed scans older than this many days are moved to archive tables by archive_attendance
+# Reports and exports do not read archive tables, so keep it longer than the ranges reported on
+ATTENDANCE_ARCHIVE_RETENTION_DAYS = int(read_env_variable("ATTENDANCE_ARCHIVE_RETENTION_DAYS", 730))
+ATTENDANCE_ARCHIVE_BATCH_SIZE = int(read_env_variable("ATTENDANCE_ARCHIVE_BATCH_SIZE", 1000))
+
+# Members whose shift calendar is loaded together by shift calendar export and API
+SHIFT_CALENDAR_CHUNK_SIZE = int(read_env_variable("SHIFT_CALENDAR_CHUNK_SIZE", 500))
+# Max days of shift calendar grid API
+SHIFT_CALENDAR_MAX_DAYS = int(read_env_variable("SHIFT_CALENDAR_MAX_DAYS", 62))
+# Seconds resolved applicable members of a leave type applicability are cached for
+APPLICABILITY_CACHE_TIMEOUT = int(read_env_variable("APPLICABILITY_CACHE_TIMEOUT", 3600))
+# Rows written in one query by member csv import
+MEMBER_IMPORT_BATCH_SIZE = int(read_env_variable("MEMBER_IMPORT_BATCH_SIZE", 1000))
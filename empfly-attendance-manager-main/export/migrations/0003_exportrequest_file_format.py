@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0002_exportrequest_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportrequest',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('csv_gzip', 'Gzip compressed CSV'), ('parquet', 'Parquet')], default='csv', max_length=20),
+        ),
+    ]
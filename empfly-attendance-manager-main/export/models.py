@@ -18,10 +18,17 @@ class ExportRequest(models.Model):
 
     STATUS_CHOICES = (
         ("pending", "Pending"),
+        ("processing", "Processing"),
         ("completed", "Completed"),
         ("failed", "Failed"),
     )
 
+    FILE_FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("csv_gzip", "Gzip compressed CSV"),
+        ("parquet", "Parquet"),
+    )
+
     uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
 
     member = models.ForeignKey(
@@ -43,6 +50,11 @@ class ExportRequest(models.Model):
 
     status = models.CharField(max_length=200, choices=STATUS_CHOICES, default="pending")
     link = models.CharField(max_length=200, null=True, blank=True)
+    file_format = models.CharField(max_length=20, choices=FILE_FORMAT_CHOICES, default="csv")
+
+    # Export progress, updated by export_request_task while writing the file
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -54,7 +66,10 @@ class ExportRequest(models.Model):
 
         if self.pk is None:
             is_duplicate = ExportRequest.objects.filter(
-                Q(member=self.member) & Q(content=self.content) & Q(status="pending")
+                Q(member=self.member)
+                & Q(content=self.content)
+                & Q(file_format=self.file_format)
+                & Q(status="pending")
             ).exists()
 
             if is_duplicate:
@@ -1,6 +1,14 @@
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as tz
 
+from attendance.filters import get_attendance_report_queryset, get_member_scans_queryset
 from export.models import ExportRequest
+from organization.models import Organization
 
 
 import json
@@ -20,80 +28,189 @@ from .utils import (
     export_visitations_csv,
     export_visitor_csv,
     update_export_request,
+    get_query_params,
     export_shift_calendar_csv,
     member_curr_day_attendance_status_csv
 )
 
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
 
 logger = logging.getLogger(__name__)
 
+# Querysets of exports stored as query instead of object ids
+export_querysets = {
+    "attendance": get_attendance_report_queryset,
+    "attendance_register": get_member_scans_queryset,
+}
 
-@shared_task(name="export_requests_task")
-def export_requests_task():
-    export_requests = ExportRequest.objects.filter(status="pending")
-    for export_request in export_requests:
 
-        converted_data = json.loads(export_request.content)
-        object_type = converted_data.get("object_type")
-        object_ids = converted_data.get("object_ids")
-        filters = export_request.filter
+def get_export_object_ids(export_request: ExportRequest, object_type: str, query: dict) -> "QuerySet":
+    """ Re-run the query of export request. Returns ids as a subquery, so the
+        exporter filters with id__in=(SELECT ...) on the server.
+    """
+
+    member = export_request.member
+    queryset = export_querysets[object_type](member.organization, member, get_query_params(query))
+    return queryset.values("id")
+
+
+export_csv_functions = {
+    "system_locations": export_system_location_csv,
+    "members": export_members_csv,
+    "departments": export_department_csv,
+    "designation": export_designation_csv,
+    "visitor": export_visitor_csv,
+    "attendance": export_attendance_csv,
+    "visitations": export_visitations_csv,
+    "visitation_register": export_visitation_register_csv,
+    "attendance_register": export_attendance_register_csv,
+    # "cluster": export_cluster_csv,
+    "holidays": export_holidays_csv,
+    "fr_image": export_fr_image_csv,
+    "shift_calendar": export_shift_calendar_csv,
+    "member_curr_day_attendance_status": member_curr_day_attendance_status_csv
+}
+
+
+def run_export(export_request: ExportRequest) -> None:
+
+    converted_data = json.loads(export_request.content)
+    object_type = converted_data.get("object_type")
+    object_ids = converted_data.get("object_ids")
+    if converted_data.get("query") is not None:
+        # Dates of the query are in the timezone of the request, not of the worker
+        with tz.override(converted_data.get("timezone")):
+            object_ids = get_export_object_ids(export_request, object_type, converted_data["query"])
+    filters = export_request.filter
+
+    export_csv_fun = export_csv_functions.get(object_type)
+
+    if object_type == "shift_calendar" or object_type == "member_curr_day_attendance_status":
+        filename = export_csv_fun(export_request, object_ids, filters)
+    else:
+        filename = export_csv_fun(export_request, object_ids)
 
-        export_csv_functions = {
-            "system_locations": export_system_location_csv,
-            "members": export_members_csv,
-            "departments": export_department_csv,
-            "designation": export_designation_csv,
-            "visitor": export_visitor_csv,
-            "attendance": export_attendance_csv,
-            "visitations": export_visitations_csv,
-            "visitation_register": export_visitation_register_csv,
-            "attendance_register": export_attendance_register_csv,
-            # "cluster": export_cluster_csv,
-            "holidays": export_holidays_csv,
-            "fr_image": export_fr_image_csv,
-            "shift_calendar": export_shift_calendar_csv,
-            "member_curr_day_attendance_status": member_curr_day_attendance_status_csv
-        }
+    update_export_request(export_request, filename)
 
-        export_csv_fun = export_csv_functions.get(object_type)
 
-        if object_type == "shift_calendar" or object_type == "member_curr_day_attendance_status":
-            filename = export_csv_fun(export_request, object_ids, filters)
-        else:
-            filename = export_csv_fun(export_request, object_ids)
+    # if object_type == "system_locations":
+    #     filename =  export_system_location_csv(export_request, object_ids)
 
-        update_export_request(export_request, filename)
+    # elif object_type == "members":
+    #     filename =  export_members_csv(export_request, object_ids)
 
-        # if object_type == "system_locations":
-        #     filename =  export_system_location_csv(export_request, object_ids)
+    # elif object_type == "departments":
+    #     filename =  export_department_csv(export_request, object_ids)
 
-        # elif object_type == "members":
-        #     filename =  export_members_csv(export_request, object_ids)
+    # elif object_type == "designation":
+    #     filename =  export_designation_csv(export_request, object_ids)
 
-        # elif object_type == "departments":
-        #     filename =  export_department_csv(export_request, object_ids)
+    # elif object_type == "visitors":
+    #     filename =  export_visitor_csv(export_request, object_ids)
 
-        # elif object_type == "designation":
-        #     filename =  export_designation_csv(export_request, object_ids)
+    # elif object_type == "attendance":
+    #     filename =  export_attendance_csv(export_request, object_ids)
 
-        # elif object_type == "visitors":
-        #     filename =  export_visitor_csv(export_request, object_ids)
+    # elif object_type == "visitations":
+    #     filename =  export_visitations_csv(export_request, object_ids)
 
-        # elif object_type == "attendance":
-        #     filename =  export_attendance_csv(export_request, object_ids)
+    # elif object_type == "visitation_register":
+    #     filename =  export_visitation_register_csv(export_request, object_ids)
 
-        # elif object_type == "visitations":
-        #     filename =  export_visitations_csv(export_request, object_ids)
+    # elif object_type == "attendance_register":
+    #     filename =  export_attendance_register_csv(export_request, object_ids)
 
-        # elif object_type == "visitation_register":
-        #     filename =  export_visitation_register_csv(export_request, object_ids)
+    # elif object_type == "cluster":
+    #     filename =  export_cluster_csv(export_request, object_ids)
 
-        # elif object_type == "attendance_register":
-        #     filename =  export_attendance_register_csv(export_request, object_ids)
+    # elif object_type == "holidays":
+    #     filename =  export_holidays_csv(export_request, object_ids)
 
-        # elif object_type == "cluster":
-        #     filename =  export_cluster_csv(export_request, object_ids)
 
-        # elif object_type == "holidays":
-        #     filename =  export_holidays_csv(export_request, object_ids)
+def fail_stale_export_requests() -> None:
+    """ Fail export requests processing for more than EXPORT_PROCESSING_TIMEOUT,
+        their worker is gone and they would hold a slot of the organization forever.
+    """
 
+    stale_before = tz.now() - timedelta(seconds=settings.EXPORT_PROCESSING_TIMEOUT)
+    stale_count = ExportRequest.objects.filter(status="processing", updated_at__lt=stale_before).update(
+        status="failed", updated_at=tz.now()
+    )
+    if stale_count:
+        logger.warning(f"Failed {stale_count} export requests processing since before {stale_before}")
+
+
+def claim_export_requests(organization_id: int) -> list:
+    """ Mark the oldest pending export requests of organization as processing, up
+        to the free slots of EXPORT_MAX_CONCURRENT_PER_ORG.
+
+        return: ids of claimed export requests
+    """
+
+    with transaction.atomic():
+        # Lock the organization, so concurrent dispatchers count and claim its slots one at a time
+        list(Organization.objects.select_for_update().filter(id=organization_id).values_list("id", flat=True))
+
+        processing_count = ExportRequest.objects.filter(
+            status="processing", member__organization_id=organization_id
+        ).count()
+        free_slots = settings.EXPORT_MAX_CONCURRENT_PER_ORG - processing_count
+        if free_slots <= 0:
+            return []
+
+        export_request_ids = list(
+            ExportRequest.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status="pending", member__organization_id=organization_id)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:free_slots]
+        )
+        ExportRequest.objects.filter(id__in=export_request_ids).update(status="processing", updated_at=tz.now())
+
+    return export_request_ids
+
+
+@shared_task(name="export_requests_task")
+def export_requests_task():
+    """ Dispatch pending export requests, oldest first, as export_request_task.
+        At most EXPORT_MAX_CONCURRENT_PER_ORG exports of an organization are
+        processed at the same time, so one big export doesn't block the others.
+    """
+
+    fail_stale_export_requests()
+
+    organization_ids = (
+        ExportRequest.objects.filter(status="pending")
+        .order_by()
+        .values_list("member__organization_id", flat=True)
+        .distinct()
+    )
+    for organization_id in list(organization_ids):
+        for export_request_id in claim_export_requests(organization_id):
+            export_request_task.delay(export_request_id)
+
+
+@shared_task(name="export_request_task")
+def export_request_task(export_request_id: int):
+
+    # Start only a claimed request, one failed as stale before the task ran is not exported
+    is_started = ExportRequest.objects.filter(id=export_request_id, status="processing").update(updated_at=tz.now())
+    if not is_started:
+        logger.warning(f"Export request {export_request_id} is not processing, not exported")
+        return
+
+    export_request = ExportRequest.objects.select_related("member").filter(id=export_request_id).first()
+    if export_request is None:
+        return
+
+    try:
+        run_export(export_request)
+    except Exception as e:
+        logger.exception(f"Export request {export_request.uuid} failed: {e.__class__.__name__}: {e}")
+        ExportRequest.objects.filter(id=export_request.id, status="processing").update(
+            status="failed", updated_at=tz.now()
+        )
+    finally:
+        # Slot of the organization is free, dispatch waiting export requests
+        export_requests_task.delay()
@@ -1,3 +1,76 @@
+import datetime as dt
+import json
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from account.models import User
+from export.models import ExportRequest
+from export.tasks import export_request_task
+from export.utils import update_export_request
+from member.models import Member
+from organization.models import Organization, Role
+from shift.models import Shift
+
+
+class ExportRequestTaskTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        org = Organization.objects.create(name="Export Org")
+        # Members get an initial shift schedule log of the org default shift
+        org.default_shift = Shift.objects.create(
+            name="General",
+            organization=org,
+            start_time=dt.time(9),
+            end_time=dt.time(18),
+            computation_time=dt.time(20),
+        )
+        org.save()
+        role, _ = Role.objects.get_or_create(name="admin")
+        user = User.objects.create(username="admin", first_name="admin")
+        cls.member = Member.objects.create(user=user, organization=org, role=role)
+
+    def create_export_request(self, status: str) -> ExportRequest:
+        # Pending requests of same content are duplicates
+        content = json.dumps({"object_type": "departments", "object_ids": [], "status": status})
+        export_request = ExportRequest.objects.create(member=self.member, content=content)
+        ExportRequest.objects.filter(id=export_request.id).update(status=status)
+        export_request.refresh_from_db()
+        return export_request
+
+    def run_task(self, export_request: ExportRequest) -> mock.Mock:
+        with mock.patch("export.tasks.run_export") as run_export, mock.patch("export.tasks.export_requests_task"):
+            export_request_task(export_request.id)
+        export_request.refresh_from_db()
+        return run_export
+
+    def test_only_processing_requests_are_exported(self):
+        for status in ("pending", "failed", "completed"):
+            export_request = self.create_export_request(status)
+
+            self.run_task(export_request).assert_not_called()
+            self.assertEqual(export_request.status, status)
+
+        export_request = self.create_export_request("processing")
+        self.run_task(export_request).assert_called_once()
+
+    def test_failed_export_is_not_completed(self):
+        export_request = self.create_export_request("processing")
+        stale_request = ExportRequest.objects.get(id=export_request.id)
+        # Failed as stale while exporting
+        ExportRequest.objects.filter(id=export_request.id).update(status="failed")
+
+        update_export_request(stale_request, "departments__file")
+
+        export_request.refresh_from_db()
+        self.assertEqual((export_request.status, export_request.link), ("failed", None))
+
+    def test_processing_export_is_completed(self):
+        export_request = self.create_export_request("processing")
+
+        update_export_request(export_request, "departments__file")
+
+        export_request.refresh_from_db()
+        self.assertEqual(export_request.status, "completed")
+        self.assertEqual(export_request.link, "media/departments/csv/departments__file.csv")
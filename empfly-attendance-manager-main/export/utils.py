@@ -1,31 +1,50 @@
 import json
 from typing import List
 from attendance.models import Attendance, MemberScan
+from attendance.presence import get_check_in_status_label, get_last_scan_type_on_date
 from utils.date_time import chop_decimal_point, convert_dt_to_another_tz, min_to_hm, NA_or_time
 from utils.read_data import round_num
 
 from visitor.models import Visitation, Visitor, VisitorScan
 from .models import ExportRequest
 from member.models import Member
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.utils import timezone as tz
+from django.http import QueryDict
 import os
 import csv
+import gzip
+import importlib.util
 import time
 import logging
 from django.db.models import QuerySet
 from organization.models import Department, Designation, Holiday, SystemLocation
 from typing import Union
+from contextlib import contextmanager
 from django.core.exceptions import ValidationError
 from uuid import uuid4
 
 from utils.utils import remove_dt_millie_sec_and_sec, empty_or_data
+from visitor.filters import convert_query_params_to_dict
 logger = logging.getLogger(__name__)
 from django.db.models.functions import Cast
 from django.db.models import TextField
 from shift.models import LocationSettings, Shift, ShiftScheduleLog
+from shift.shift_calendar import get_calendar_dates, iter_shift_calendar
 from datetime import timedelta, datetime
 from utils.utils import convert_time_to_formatted_str, convert_string_to_date
 
+# Rows fetched per round trip while iterating large export querysets
+EXPORT_CHUNK_SIZE = 2000
+# Rows written between progress updates of export request
+EXPORT_PROGRESS_EVERY = 1000
+
+EXPORT_FILE_EXTENSIONS = {
+    "csv": "csv",
+    "csv_gzip": "csv.gz",
+    "parquet": "parquet",
+}
+
 def status_bool_to_string(status):
     """Some models status field is bool. In the export csv
     We will not show bool values instead we will user active and inactive.
@@ -71,9 +90,116 @@ def update_export_request(
         else "temp"
     )
 
+    link = get_export_file_path(export_request, objectType, filename)
+    # Only a processing request is completed, one failed as stale while exporting stays failed
+    is_completed = ExportRequest.objects.filter(id=export_request.id, status="processing").update(
+        status="completed", link=link, updated_at=tz.now()
+    )
+    if not is_completed:
+        logger.warning(f"Export request {export_request.uuid} is no longer processing, not completed")
+        return export_request
+
     export_request.status = "completed"
-    export_request.link = f"media/{objectType}/csv/{filename}.csv"
-    export_request.save()
+    export_request.link = link
+    return export_request
+
+
+def get_export_file_path(export_request: ExportRequest, object_type: str, filename: str) -> str:
+    extension = EXPORT_FILE_EXTENSIONS.get(export_request.file_format, "csv")
+    return f"media/{object_type}/csv/{filename}.{extension}"
+
+
+class ParquetRowWriter:
+    """ csv.writer like writer of parquet file. First row is the header, every
+        column is stored as string. Rows are written in row groups of
+        EXPORT_CHUNK_SIZE, so memory doesn't grow with the export size.
+    """
+
+    def __init__(self, path: str):
+        # pyarrow is only needed for parquet exports
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.schema = None
+        self.writer = None
+        self.rows = []
+
+    def writerow(self, row: list) -> None:
+        if self.schema is None:
+            self.schema = self.pa.schema([(str(column), self.pa.string()) for column in row])
+            return
+
+        self.rows.append([None if value is None else str(value) for value in row])
+        if len(self.rows) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+
+        columns = [list(column) for column in zip(*self.rows)] if self.rows else [[] for _ in self.schema]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self) -> None:
+        if self.schema is None:
+            return
+        if self.rows or self.writer is None:
+            self.flush()
+        self.writer.close()
+
+
+@contextmanager
+def open_export_writer(export_request: ExportRequest, object_type: str, filename: str):
+    """ Row writer of export file in file format of export request.
+        csv and gzip compressed csv use csv.writer, parquet uses ParquetRowWriter.
+    """
+
+    path = get_export_file_path(export_request, object_type, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if export_request.file_format == "parquet":
+        writer = ParquetRowWriter(path)
+        try:
+            yield writer
+        finally:
+            writer.close()
+        return
+
+    if export_request.file_format == "csv_gzip":
+        f = gzip.open(path, "wt", newline="")
+    else:
+        f = open(path, "w")
+
+    with f:
+        yield csv.writer(f)
+
+
+def set_export_progress(export_request: ExportRequest, **progress) -> None:
+    for field, value in progress.items():
+        setattr(export_request, field, value)
+    # updated_at is the heartbeat of processing export requests
+    ExportRequest.objects.filter(id=export_request.id).update(updated_at=tz.now(), **progress)
+
+
+def export_progress(export_request: ExportRequest, queryset: QuerySet, chunk_size: int = None):
+    """ Iterate rows of export queryset, saving total rows and rows written on
+        export request every EXPORT_PROGRESS_EVERY rows.
+    """
+
+    set_export_progress(export_request, total_rows=queryset.count(), rows_written=0)
+
+    rows = queryset.iterator(chunk_size=chunk_size) if chunk_size else queryset
+
+    rows_written = 0
+    for rows_written, row in enumerate(rows, start=1):
+        yield row
+        if rows_written % EXPORT_PROGRESS_EVERY == 0:
+            set_export_progress(export_request, rows_written=rows_written)
+
+    set_export_progress(export_request, rows_written=rows_written)
 
 
 def extract_data_from_object(
@@ -104,20 +230,71 @@ def get_uuid_from_qs_for_fr_image(qs: "Queryset") -> List[str]:
         )
     )
 
+# Query params of list APIs which are not part of export query
+EXPORT_IGNORED_QUERY_PARAMS = ("export_csv", "export_format", "page", "page_size")
+
+
+def get_export_query(query_params: QueryDict) -> dict:
+    """ Normalized filter/search params of list API request. Stored on export request
+        instead of object ids, export worker re-runs the query with get_query_params.
+    """
+
+    query = convert_query_params_to_dict(query_params)
+    for param in EXPORT_IGNORED_QUERY_PARAMS:
+        query.pop(param, None)
+    return dict(sorted(query.items()))
+
+
+def get_query_params(query: dict) -> QueryDict:
+    """ QueryDict of normalized export query
+    """
+
+    query_params = QueryDict(mutable=True)
+    for key, value in query.items():
+        query_params.setlist(key, value if isinstance(value, list) else [value])
+    return query_params
+
+
+def get_export_file_format(query_params: QueryDict) -> str:
+    """ File format from export_format query param. Unknown formats, and parquet
+        when pyarrow is not installed, are exported as csv.
+    """
+
+    file_format = query_params.get("export_format", "csv")
+    if file_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        logger.warning("pyarrow is not installed, exporting parquet request as csv")
+        return "csv"
+    return file_format if file_format in EXPORT_FILE_EXTENSIONS else "csv"
+
+
 def create_export_request(
-    member: Member, object_type: str, object_ids: list, filters=None
+    member: Member,
+    object_type: str,
+    object_ids: list = None,
+    filters=None,
+    query: dict = None,
+    file_format: str = "csv",
 ) -> ExportRequest:
+    """ Create export request and queue export task. Either object_ids or query
+        (from get_export_query) is stored in content. A query is stored with the
+        current (org) timezone, so its dates resolve to the same rows in the worker.
+    """
 
-    content = json.dumps({"object_type": object_type, "object_ids": object_ids})
+    if query is not None:
+        content = json.dumps(
+            {"object_type": object_type, "query": query, "timezone": tz.get_current_timezone_name()}
+        )
+    else:
+        content = json.dumps({"object_type": object_type, "object_ids": object_ids})
 
     try:
         is_duplicate = ExportRequest.objects.filter(
-            Q(member=member) & Q(content=content) & Q(status="pending")
+            Q(member=member) & Q(content=content) & Q(file_format=file_format) & Q(status="pending")
         ).exists()
 
         if not is_duplicate:
             export_request = ExportRequest.objects.create(
-                member=member, content=content, filter=filters
+                member=member, content=content, filter=filters, file_format=file_format
             )
 
             # assign task
@@ -162,10 +339,7 @@ def export_system_location_csv(
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"system_locations__{file_suffix}"
-    if not os.path.exists("media/system_locations/csv/"):
-        os.makedirs("media/system_locations/csv/")
-    with open(f"media/system_locations/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "system_locations", filename) as writer:
         writer.writerow(
             [
                 "UUID",
@@ -180,7 +354,7 @@ def export_system_location_csv(
 
         system_locations = SystemLocation.objects.filter(uuid__in=location_ids)
 
-        for location in system_locations:
+        for location in export_progress(export_request, system_locations):
 
             data = [
                 extract_data_from_object(location, ["uuid"]),
@@ -200,10 +374,7 @@ def export_members_csv(export_request: ExportRequest, member_ids: list) -> csv:
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"members__{file_suffix}"
-    if not os.path.exists("media/members/csv/"):
-        os.makedirs("media/members/csv/")
-    with open(f"media/members/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "members", filename) as writer:
         writer.writerow(
             [
                 "UUID",
@@ -223,7 +394,7 @@ def export_members_csv(export_request: ExportRequest, member_ids: list) -> csv:
 
         members = Member.objects.filter(uuid__in=member_ids)
 
-        for member in members:
+        for member in export_progress(export_request, members):
 
             data = [
                 extract_data_from_object(member, ["uuid"]),
@@ -257,15 +428,12 @@ def export_department_csv(export_request: ExportRequest, department_ids: list) -
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"departments__{file_suffix}"
-    if not os.path.exists("media/departments/csv/"):
-        os.makedirs("media/departments/csv/")
-    with open(f"media/departments/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "departments", filename) as writer:
         writer.writerow(["UUID", "name", "description", "department head", "status"])
 
         departments = Department.objects.filter(uuid__in=department_ids)
 
-        for department in departments:
+        for department in export_progress(export_request, departments):
 
             data = [
                 extract_data_from_object(department, ["uuid"]),
@@ -283,10 +451,7 @@ def export_designation_csv(export_request: ExportRequest, designation_ids: list)
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"designation__{file_suffix}"
-    if not os.path.exists("media/designation/csv/"):
-        os.makedirs("media/designation/csv/")
-    with open(f"media/designation/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "designation", filename) as writer:
         writer.writerow(
             [
                 "UUID",
@@ -297,7 +462,7 @@ def export_designation_csv(export_request: ExportRequest, designation_ids: list)
 
         designations = Designation.objects.filter(uuid__in=designation_ids)
 
-        for designation in designations:
+        for designation in export_progress(export_request, designations):
 
             data = [
                 extract_data_from_object(designation, ["id"]),
@@ -313,11 +478,7 @@ def export_visitor_csv(export_request: ExportRequest, visitor_ids: list) -> csv:
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"visitor__{file_suffix}"
-    if not os.path.exists("media/visitor/csv/"):
-        os.makedirs("media/visitor/csv/")
-
-    with open(f"media/visitor/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "visitor", filename) as writer:
         writer.writerow(
             [
                 "uuid",
@@ -331,7 +492,7 @@ def export_visitor_csv(export_request: ExportRequest, visitor_ids: list) -> csv:
 
         visitors = Visitor.objects.filter(id__in=visitor_ids)
 
-        for visitor in visitors:
+        for visitor in export_progress(export_request, visitors):
 
             data = [
                 extract_data_from_object(visitor, ["uuid"]),
@@ -347,56 +508,62 @@ def export_visitor_csv(export_request: ExportRequest, visitor_ids: list) -> csv:
 
 
 def get_scans_sys_location(attendance):
-    scans = attendance.scans.all().select_related("system_location")
-    system_location_names = (
-        scans.filter(system_location__isnull=False)
-        .values_list("system_location__name", flat=True)
-        .distinct()
+    """ Unique system location names of attendance scans. Uses prefetched scans.
+    """
+
+    system_location_names = dict.fromkeys(
+        scan.system_location.name for scan in attendance.scans.all() if scan.system_location is not None
     )
-    system_location_names = list(system_location_names)
-    system_location_names = set(system_location_names)
-    system_location_names = list(system_location_names)
-    locations = "; ".join(system_location_names)
-    return locations
+    return "; ".join(system_location_names)
 
 
 def get_check_in_out_time(attendance: Attendance):
-    scans = attendance.scans.all()
+    """ First check in and last check out time of attendance in org timezone.
+        Uses prefetched scans ordered by date_time.
+    """
+
     check_in, check_out = None, None
 
-    check_in_scan = scans.filter(scan_type="check_in")
-    check_out_scan = scans.filter(scan_type="check_out")
+    check_in_scans = [scan for scan in attendance.scans.all() if scan.scan_type == "check_in"]
+    check_out_scans = [scan for scan in attendance.scans.all() if scan.scan_type == "check_out"]
 
     org_tz = attendance.organization.timezone
-    print(org_tz)
 
-    if check_in_scan.exists():
-        check_in = check_in_scan.order_by("date_time").first()
-        print(check_in.date_time)
-
-        check_in_dt = convert_dt_to_another_tz(check_in.date_time, org_tz)
+    if check_in_scans:
+        check_in_dt = convert_dt_to_another_tz(check_in_scans[0].date_time, org_tz)
         check_in = check_in_dt.time()
 
-    if check_out_scan.exists():
-        check_out = check_out_scan.order_by("date_time").last()
-        print(check_out.date_time)
-
-        check_out_dt = convert_dt_to_another_tz(check_out.date_time, org_tz)
-
+    if check_out_scans:
+        check_out_dt = convert_dt_to_another_tz(check_out_scans[-1].date_time, org_tz)
         check_out = check_out_dt.time()
 
     return check_in, check_out
 
 
+def get_attendances_for_export(attendance_ids: list) -> "QuerySet":
+    """ Attendances with every relation used by the export joined and scans prefetched,
+        so each chunk of the export iterator costs a constant number of queries.
+    """
+
+    return Attendance.objects.filter(id__in=attendance_ids).select_related(
+        "organization",
+        "shift",
+        "member__user",
+        "member__department",
+        "member__designation",
+    ).prefetch_related(
+        Prefetch(
+            "scans",
+            queryset=MemberScan.objects.select_related("system_location").order_by("date_time"),
+        )
+    )
+
+
 def export_attendance_csv(export_request: ExportRequest, attendance_ids: list) -> csv:
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"attendance__{file_suffix}"
-    if not os.path.exists("media/attendance/csv/"):
-        os.makedirs("media/attendance/csv/")
-
-    with open(f"media/attendance/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "attendance", filename) as writer:
         writer.writerow(
             [
                 "first name",
@@ -428,9 +595,10 @@ def export_attendance_csv(export_request: ExportRequest, attendance_ids: list) -
             ]
         )
 
-        attendances = Attendance.objects.filter(id__in=attendance_ids)
+        attendances = get_attendances_for_export(attendance_ids)
 
-        for attendance in attendances:
+        # Server side cursor, scans are prefetched per chunk
+        for attendance in export_progress(export_request, attendances, chunk_size=EXPORT_CHUNK_SIZE):
 
             check_in_time, check_out_time = get_check_in_out_time(attendance)
 
@@ -501,11 +669,7 @@ def export_visitations_csv(export_request: ExportRequest, visitation_ids: list)
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"visitations__{file_suffix}"
-    if not os.path.exists("media/visitations/csv/"):
-        os.makedirs("media/visitations/csv/")
-
-    with open(f"media/visitations/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "visitations", filename) as writer:
         writer.writerow(
             [
                 "Name",
@@ -523,7 +687,7 @@ def export_visitations_csv(export_request: ExportRequest, visitation_ids: list)
 
         visitations = Visitation.objects.filter(id__in=visitation_ids)
 
-        for visitation in visitations:
+        for visitation in export_progress(export_request, visitations):
 
             data = [
                 extract_data_from_object(visitation, ["name"]),
@@ -548,11 +712,7 @@ def export_visitation_register_csv(
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"visitation_register__{file_suffix}"
-    if not os.path.exists("media/visitation_register/csv/"):
-        os.makedirs("media/visitation_register/csv/")
-
-    with open(f"media/visitation_register/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "visitation_register", filename) as writer:
         writer.writerow(
             [
                 "Visitor Username",
@@ -569,7 +729,7 @@ def export_visitation_register_csv(
             id__in=visitation_register_ids
         )
 
-        for visitation_register in visitation_registers:
+        for visitation_register in export_progress(export_request, visitation_registers):
 
             data = [
                 extract_data_from_object(
@@ -614,11 +774,7 @@ def export_attendance_register_csv(
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"attendance_register__{file_suffix}"
-    if not os.path.exists("media/attendance_register/csv/"):
-        os.makedirs("media/attendance_register/csv/")
-
-    with open(f"media/attendance_register/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "attendance_register", filename) as writer:
         writer.writerow(
             [
                 "First Name",
@@ -637,7 +793,7 @@ def export_attendance_register_csv(
 
         attendance_registers = MemberScan.objects.filter(id__in=attendance_register_ids)
 
-        for attendance_register in attendance_registers:
+        for attendance_register in export_progress(export_request, attendance_registers):
 
             org_tz = attendance_register.organization.timezone
 
@@ -737,11 +893,7 @@ def export_holidays_csv(export_request: ExportRequest, holidays_ids: list) -> cs
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"holidays__{file_suffix}"
-    if not os.path.exists("media/holidays/csv/"):
-        os.makedirs("media/holidays/csv/")
-
-    with open(f"media/holidays/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "holidays", filename) as writer:
         writer.writerow(
             [
                 "uuid",
@@ -754,7 +906,7 @@ def export_holidays_csv(export_request: ExportRequest, holidays_ids: list) -> cs
 
         holidays = Holiday.objects.filter(uuid__in=holidays_ids)
 
-        for holiday in holidays:
+        for holiday in export_progress(export_request, holidays):
 
             data = [
                 holiday.uuid,
@@ -784,11 +936,7 @@ def export_fr_image_csv(export_request: ExportRequest, member_ids: list) -> csv:
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"fr_image__{file_suffix}"
-    if not os.path.exists("media/fr_image/csv/"):
-        os.makedirs("media/fr_image/csv/")
-
-    with open(f"media/fr_image/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "fr_image", filename) as writer:
         writer.writerow(
             [
                 "Name",
@@ -800,7 +948,7 @@ def export_fr_image_csv(export_request: ExportRequest, member_ids: list) -> csv:
 
         fr_images = Member.objects.filter(uuid__in=member_ids)
 
-        for member in fr_images:
+        for member in export_progress(export_request, fr_images):
             member_fr_images_count: int = member.member_images.all().count()
 
             data = [
@@ -818,109 +966,45 @@ def export_shift_calendar_csv(export_request: ExportRequest, member_ids: list, f
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"shift_calendar__{file_suffix}"
-    if not os.path.exists("media/shift_calendar/csv/"):
-        os.makedirs("media/shift_calendar/csv/")
-
-    with open(f"media/shift_calendar/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
-
-        members = Member.objects.filter(uuid__in=member_ids)
+    with open_export_writer(export_request, "shift_calendar", filename) as writer:
 
-        ssl = ShiftScheduleLog.objects.filter(employee__uuid__in=member_ids, status="active")
+        members = Member.objects.filter(uuid__in=member_ids).select_related("user")
 
         shift_start_date = filters.get("shift_start_date")
         shift_end_date = filters.get("shift_end_date")
 
-        shift_start_date = datetime.strptime(shift_start_date, "%Y-%m-%d")
-        shift_end_date = datetime.strptime(shift_end_date, "%Y-%m-%d")
+        shift_start_date = datetime.strptime(shift_start_date, "%Y-%m-%d").date()
+        shift_end_date = datetime.strptime(shift_end_date, "%Y-%m-%d").date()
 
-        shift_dates = []
-        diff_days = (shift_end_date - shift_start_date).days + 1
+        shift_dates = get_calendar_dates(shift_start_date, shift_end_date)
 
         csv_heading = ["Employee"]
-
-        for day in range(diff_days):
-            shift_dt_obj = (shift_start_date + timedelta(days=day)).date()
-            shift_dates.append(shift_dt_obj)
-
-            date = datetime.strptime(str(shift_dt_obj), "%Y-%m-%d")
-            formatted_date = date.strftime("%b %d (%a)")
-            csv_heading.append(formatted_date)
+        for shift_date in shift_dates:
+            csv_heading.append(shift_date.strftime("%b %d (%a)"))
 
         # Heading
         writer.writerow(
             csv_heading
         )
 
-        for member in members:
+        # Calendar is built for a chunk of members at a time and written as it goes
+        for member, days in iter_shift_calendar(export_progress(export_request, members), shift_dates):
             data = [
                 member.user.email
             ]
 
-            member_ssl = ssl.filter(employee=member)
-
-            for shift_date in shift_dates:
-
-                try:
-                    member_shift_date_ssl = member_ssl.get(
-                        Q(
-                            start_date__lte=shift_date,
-                            end_date__gte=shift_date,
-                        )
-                        | Q(start_date__lte=shift_date, end_date__isnull=True),
-                    )
-                except ShiftScheduleLog.DoesNotExist:
-                    member_shift_date_ssl = None
-                except Exception as err:
-                    print(err)
-                    member_shift_date_ssl = None
-
-                if not member_shift_date_ssl:
+            for day in days:
+                if day is None:
                     data.append("")
                     continue
 
-                system_location_name = None
-                shift = member_shift_date_ssl.shift
-                shift_name, system_location_str = shift.name, ""
-
-                cell_data = f"Shift Name: {shift_name}"
-
-                location_settings = member_shift_date_ssl.location_settings.filter(
-                    Q(
-                        applicable_start_date__lte=shift_date,
-                        applicable_end_date__gte=shift_date,
-                    )
-                    | Q(
-                        applicable_start_date__lte=shift_date,
-                        applicable_end_date__isnull=True
-                    ),
-                ).order_by("start_time")
-
-                if not location_settings.exists():
-                    system_location = shift.default_location
-                    system_location_name = system_location.name if system_location else None
-
-                    shift_start_time = shift.start_time
-                    shift_end_time = shift.end_time
-
-                    if system_location_name:
-                        system_location_str += f"{system_location_name} ({convert_time_to_formatted_str(shift_start_time)} - {convert_time_to_formatted_str(shift_end_time)})"
-
-                else:
-                    system_locations_data_for_member = []
-                    for location_setting in location_settings:
-                        system_location = location_setting.system_location
-                        system_location_name = system_location.name
-                        location_settings_start_time = location_setting.start_time
-                        location_settings_end_time = location_setting.end_time
-
-
-                        system_locations_data_for_member.append(
-                            f"{system_location_name} ({convert_time_to_formatted_str(location_settings_start_time)} - {convert_time_to_formatted_str(location_settings_end_time)})"
-                        )
-
-                    system_location_str = " && ".join(system_locations_data_for_member)
+                shift, windows = day
+                cell_data = f"Shift Name: {shift.name}"
 
+                system_location_str = " && ".join(
+                    f"{system_location.name} ({convert_time_to_formatted_str(start_time)} - {convert_time_to_formatted_str(end_time)})"
+                    for system_location, start_time, end_time in windows
+                )
                 if system_location_str:
                     cell_data += f", System Locations: {system_location_str}"
 
@@ -935,11 +1019,7 @@ def member_curr_day_attendance_status_csv(export_request: ExportRequest, member_
 
     file_suffix = generate_file_suffix(export_request)
     filename = f"member_curr_day_attendance_status__{file_suffix}"
-    if not os.path.exists("media/member_curr_day_attendance_status/csv/"):
-        os.makedirs("media/member_curr_day_attendance_status/csv/")
-
-    with open(f"media/member_curr_day_attendance_status/csv/{filename}.csv", "w") as f:
-        writer = csv.writer(f)
+    with open_export_writer(export_request, "member_curr_day_attendance_status", filename) as writer:
         writer.writerow(
             [
                 "Full Name",
@@ -956,25 +1036,17 @@ def member_curr_day_attendance_status_csv(export_request: ExportRequest, member_
         filter_date = filters.get("date")
         filter_date, _ = convert_string_to_date(filter_date)
 
-        members = Member.objects.filter(uuid__in=member_ids)
-        members_day_scans = MemberScan.objects.filter(
-            date_time__date=filter_date,
-            member__status="active",
-            status="pending",
-            is_computed=False,
-            organization=export_request.member.organization
+        # Presence projection only holds the latest scan, so the last scan of the
+        # requested date is read with the members.
+        organization = export_request.member.organization
+        members = (
+            Member.objects.filter(uuid__in=member_ids)
+            .select_related("user", "department", "designation", "org_location", "role")
+            .annotate(last_scan_type=get_last_scan_type_on_date(organization, filter_date))
         )
 
-        for member in members:
-            member_scan = members_day_scans.filter(member=member)
-            if not member_scan.exists():
-                check_in_status = "Yet To Check In"
-            else:
-                last_scan = member_scan.order_by("date_time").last()
-                if last_scan.scan_type == "check_in":
-                    check_in_status = "Check In"
-                elif last_scan.scan_type == "check_out":
-                    check_in_status = "Check Out"
+        for member in export_progress(export_request, members):
+            check_in_status = get_check_in_status_label(member.last_scan_type)
 
             data = [
                 empty_or_data(get_user_full_name(member.user)),
@@ -30,7 +30,14 @@ class PollExportRequestAPI(views.APIView):
             return read_data.get_404_response("Export Request")
 
         # If csv is created successfully we will send the link(file path).
+        # rows_written / total_rows shows the progress while the csv is being written.
         return Response(
-            {"status": export_request.status, "link": export_request.link, "uuid": export_request.uuid},
+            {
+                "status": export_request.status,
+                "link": export_request.link,
+                "uuid": export_request.uuid,
+                "total_rows": export_request.total_rows,
+                "rows_written": export_request.rows_written,
+            },
             status=status.HTTP_200_OK,
         )
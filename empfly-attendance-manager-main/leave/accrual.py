@@ -0,0 +1,118 @@
+from typing import TYPE_CHECKING
+
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Least
+
+from leave.models import LeaveBalance, LeaveBalanceActivity, LeaveType
+
+import logging
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def create_missing_leave_balances(leave_type: LeaveType, members: "QuerySet") -> set:
+    """ Bulk create LeaveBalance of members that do not have one for leave_type
+
+        return: ids of members whose balance was created
+    """
+
+    member_ids = set(members.values_list("id", flat=True))
+    existing_member_ids = set(
+        LeaveBalance.objects.filter(leave_type=leave_type, member_id__in=members.values("id")).values_list(
+            "member_id", flat=True
+        )
+    )
+    missing_member_ids = member_ids - existing_member_ids
+
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(member_id=member_id, leave_type=leave_type) for member_id in missing_member_ids],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return missing_member_ids
+
+
+def create_balance_activities(balance_days: list, action: str) -> None:
+    """ balance_days: [(leave balance id, days)]
+    """
+
+    LeaveBalanceActivity.objects.bulk_create(
+        [
+            LeaveBalanceActivity(leave_balance_id=balance_id, action=action, days=days)
+            for balance_id, days in balance_days
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def accrue_leave_type(leave_type: LeaveType, members: "QuerySet", number_of_days: float, current_accrual: bool) -> int:
+    """ Credit number_of_days to the balances of members with one UPDATE.
+        Balances created now are not credited if current_accrual is False.
+
+        return: number of balances credited
+    """
+
+    with transaction.atomic():
+        created_member_ids = create_missing_leave_balances(leave_type, members)
+
+        balances = LeaveBalance.objects.filter(leave_type=leave_type, member_id__in=members.values("id"))
+        if current_accrual is False and created_member_ids:
+            balances = balances.exclude(member_id__in=created_member_ids)
+
+        balance_ids = list(balances.select_for_update().values_list("id", flat=True))
+        LeaveBalance.objects.filter(id__in=balance_ids).update(available=F("available") + number_of_days)
+        create_balance_activities([(balance_id, number_of_days) for balance_id in balance_ids], "credit")
+
+    return len(balance_ids)
+
+
+def get_carry_forward_expression(unit: str, value: float, max_limit: float):
+    """ Days carried forward from available, as an expression of the balance row
+    """
+
+    if unit == "days":
+        days = F("available")
+    elif unit == "percentage":
+        days = F("available") * value
+    else:
+        return Value(0.0, output_field=FloatField())
+
+    if max_limit is None:
+        return days
+    return Least(days, Value(float(max_limit)), output_field=FloatField())
+
+
+def reset_leave_type(leave_type: LeaveType, members: "QuerySet", carry_forward: dict) -> int:
+    """ Carry forward part of available of the balances of members and lapse
+        the rest with one UPDATE.
+
+        return: number of balances reset
+    """
+
+    carry_forward_days = get_carry_forward_expression(
+        carry_forward.get("unit"), carry_forward.get("value"), carry_forward.get("max_limit")
+    )
+
+    with transaction.atomic():
+        create_missing_leave_balances(leave_type, members)
+
+        balances = LeaveBalance.objects.filter(leave_type=leave_type, member_id__in=members.values("id"))
+        balance_ids = list(balances.select_for_update().values_list("id", flat=True))
+
+        # Both assignments read available before the update
+        LeaveBalance.objects.filter(id__in=balance_ids).update(
+            lapsed=F("available") - carry_forward_days,
+            available=carry_forward_days,
+        )
+        create_balance_activities(
+            LeaveBalance.objects.filter(id__in=balance_ids).values_list("id", "available"), "reset"
+        )
+
+    return len(balance_ids)
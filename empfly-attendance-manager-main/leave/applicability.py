@@ -0,0 +1,152 @@
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from leave.models import Applicability
+from member.models import Member
+from utils.cache import bump_version, get_version, is_cache_shared
+
+import logging
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+logger = logging.getLogger(__name__)
+
+# (Applicability M2M, Member field compared with it)
+INCLUDE_RELATIONS = (
+    ("designations", "designation_id"),
+    ("departments", "department_id"),
+    ("roles", "role_id"),
+    ("members", "id"),
+)
+EXCLUDE_RELATIONS = (
+    ("exclude_designations", "designation_id"),
+    ("exclude_departments", "department_id"),
+    ("exclude_roles", "role_id"),
+    ("exclude_members", "id"),
+)
+# Applicability M2Ms that change the applicable members when changed
+APPLICABILITY_RELATIONS = [name for name, _ in INCLUDE_RELATIONS + EXCLUDE_RELATIONS]
+
+
+def get_relation_exists(applicability: Applicability, name: str, member_field: str) -> Exists:
+    """ EXISTS subquery on the through table of the applicability M2M name,
+        true for members whose member_field is one of its objects.
+    """
+
+    field = Applicability._meta.get_field(name)
+    return Exists(
+        field.remote_field.through.objects.filter(
+            **{
+                field.m2m_field_name(): applicability.id,
+                field.m2m_reverse_field_name(): OuterRef(member_field),
+            }
+        )
+    )
+
+
+def get_applicability_q(applicability: Applicability) -> Q:
+    """ Filter of Member matching applicability, so it resolves in one query.
+
+        A member matches any of the included designations, departments, roles
+        or members, and none of the excluded ones. Gender and marital status
+        other than "all" are matched with the member profile. Locations are
+        roster locations, which are not linked to members, so they are not used.
+    """
+
+    include_q = Q()
+    for name, member_field in INCLUDE_RELATIONS:
+        include_q |= get_relation_exists(applicability, name, member_field)
+
+    # Nothing included, nobody applicable
+    q = include_q if include_q else Q(pk__in=[])
+
+    for name, member_field in EXCLUDE_RELATIONS:
+        q &= ~get_relation_exists(applicability, name, member_field)
+
+    if applicability.gender and applicability.gender != "all":
+        q &= Q(profile__gender=applicability.gender)
+    if applicability.marital_status and applicability.marital_status != "all":
+        q &= Q(profile__marital_status=applicability.marital_status)
+
+    return q
+
+
+def query_applicable_members(applicability: Applicability) -> "QuerySet":
+    """ Members of the leave type organization matching applicability. Tasks
+        filter and iterate it, so it is not built from the cached ids, which
+        are for counts and membership checks.
+    """
+
+    return Member.objects.filter(
+        get_applicability_q(applicability), organization_id=applicability.leave_type.organization_id
+    )
+
+
+def get_rules_version_cache_key(applicability_id: int) -> str:
+    return f"applicability_rules_version:{applicability_id}"
+
+
+def get_org_members_version_cache_key(organization_id: int) -> str:
+    return f"applicability_org_members_version:{organization_id}"
+
+
+def get_member_ids_cache_key(applicability_id: int) -> str:
+    return f"applicability_member_ids:{applicability_id}"
+
+
+def invalidate_applicability(applicability_id: int) -> None:
+    """ Change version of applicability rules, called when they are changed
+    """
+
+    bump_version(get_rules_version_cache_key(applicability_id))
+
+
+def invalidate_org_applicability(organization_id: int) -> None:
+    """ Change version of the members of organization, called when a member
+        (or profile) of organization is added, removed or updated
+    """
+
+    bump_version(get_org_members_version_cache_key(organization_id))
+
+
+def get_applicability_version(applicability: Applicability) -> tuple:
+    """ Version of applicable members of applicability, from versions bumped by
+        the applicability and member signals. No query.
+    """
+
+    return (
+        get_version(get_rules_version_cache_key(applicability.id)),
+        get_version(get_org_members_version_cache_key(applicability.leave_type.organization_id)),
+        applicability.gender,
+        applicability.marital_status,
+    )
+
+
+def get_applicable_member_ids(applicability: Applicability) -> frozenset:
+    """ Ids of applicable members, cached per (applicability, version) in a
+        shared cache. Resolved on every call without one.
+    """
+
+    if not is_cache_shared():
+        return frozenset(query_applicable_members(applicability).values_list("id", flat=True))
+
+    version = get_applicability_version(applicability)
+    cache_key = get_member_ids_cache_key(applicability.id)
+
+    cached = cache.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    member_ids = frozenset(query_applicable_members(applicability).values_list("id", flat=True))
+    cache.set(cache_key, (version, member_ids), settings.APPLICABILITY_CACHE_TIMEOUT)
+    logger.info(f"Applicable members of {applicability.id} resolved. members: {len(member_ids)}")
+    return member_ids
+
+
+def is_member_applicable(applicability: Applicability, member: Member) -> bool:
+    return member.id in get_applicable_member_ids(applicability)
@@ -0,0 +1,52 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .models import Applicability
+from .applicability import APPLICABILITY_RELATIONS, invalidate_applicability, invalidate_org_applicability
+
+
+@receiver(post_save, sender=Applicability)
+def invalidate_applicability_on_save(sender, instance, **kwargs):
+    """signal receiver to resolve applicable members again after applicability is changed"""
+
+    invalidate_applicability(instance.id)
+
+
+@receiver(post_save, sender="member.Member")
+@receiver(post_delete, sender="member.Member")
+def invalidate_org_applicability_on_member_change(sender, instance, **kwargs):
+    """signal receiver to resolve applicable members of member org again after a member is changed"""
+
+    invalidate_org_applicability(instance.organization_id)
+
+
+@receiver(post_save, sender="member.Profile")
+@receiver(post_delete, sender="member.Profile")
+def invalidate_org_applicability_on_profile_change(sender, instance, **kwargs):
+    """signal receiver to resolve applicable members again after gender or marital status of a member is changed"""
+
+    from member.models import Member
+
+    organization_id = Member.objects.filter(id=instance.member_id).values_list("organization_id", flat=True).first()
+    if organization_id is not None:
+        invalidate_org_applicability(organization_id)
+
+
+def invalidate_applicability_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """signal receiver to resolve applicable members again after an applicability relation is changed"""
+
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        invalidate_applicability(instance.id)
+    elif pk_set:
+        for applicability_id in pk_set:
+            invalidate_applicability(applicability_id)
+
+
+for name in APPLICABILITY_RELATIONS:
+    m2m_changed.connect(
+        invalidate_applicability_on_m2m_change,
+        sender=getattr(Applicability, name).through,
+        dispatch_uid=f"invalidate_applicability_{name}",
+    )
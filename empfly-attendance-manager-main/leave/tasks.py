@@ -6,13 +6,13 @@ from member.models import Member
 from organization.models import Organization
 # from roster.models import Roster
 from leave.models import (
-    LeaveBalanceActivity,
     LeaveRequest,
     LeaveType,
-    LeaveBalance,
     Applicability,
 )
 
+from leave import applicability as applicability_resolver
+from leave.accrual import accrue_leave_type, reset_leave_type
 from utils import create_data, read_data
 
 import datetime as dt
@@ -51,49 +51,12 @@ def check_frequency(frequency: str, action_on: str, current_date: dt.datetime) -
     return False
 
 
-# OPTIMIZE
 def get_applicable_members(
     applicability: Applicability, check_effective_after: bool = True
 ) -> Member:
 
     leave_type = applicability.leave_type
-    members = Member.objects.filter(organization=leave_type.organization)
-
-    member_ids = []
-    exclude_member_ids = []
-
-    member_ids += list(applicability.designations.values_list("members__id", flat=True))
-    member_ids += list(applicability.departments.values_list("members__id", flat=True))
-    member_ids += list(applicability.roles.values_list("members__id", flat=True))
-    member_ids += list(applicability.members.values_list("id", flat=True))
-    member_ids += list(
-        applicability.organization_locations.values_list("members__id", flat=True)
-    )
-
-    exclude_member_ids += list(
-        applicability.exlude_designations.values_list("members__id", flat=True)
-    )
-    exclude_member_ids += list(
-        applicability.exlude_departments.values_list("members__id", flat=True)
-    )
-    exclude_member_ids += list(
-        applicability.exlude_roles.values_list("members__id", flat=True)
-    )
-    exclude_member_ids += list(
-        applicability.exlude_members.values_list("id", flat=True)
-    )
-    exclude_member_ids += list(
-        applicability.exlude_organization_locations.values_list(
-            "members__id", flat=True
-        )
-    )
-
-    member_ids = [x for x in set(member_ids) if x is not None]
-    exclude_member_ids = [x for x in set(exclude_member_ids) if x is not None]
-
-    members = Member.objects.filter(
-        Q(id__in=member_ids) & ~Q(id__in=exclude_member_ids)
-    )
+    members = applicability_resolver.query_applicable_members(applicability)
 
     if check_effective_after:
 
@@ -102,17 +65,18 @@ def get_applicable_members(
         days = effective_after.get("days", 0)
 
         current_date = read_data.get_current_datetime().date()
-        effective_after_date = (current_date - dt.timedelta(days=days)).date()
+        effective_after_date = current_date - dt.timedelta(days=days)
 
+        # Effective for members who joined (or were confirmed) days before today
         if condition == "date_of_joining":
             members = members.filter(
                 Q(joining_date__isnull=False)
-                & Q(joining_date__gte=effective_after_date)
+                & Q(joining_date__date__lte=effective_after_date)
             )
-        elif condition == "date_of_joining":
+        elif condition == "date_of_confirmation":
             members = members.filter(
                 Q(confirmation_date__isnull=False)
-                & Q(confirmation_date__gte=effective_after_date)
+                & Q(confirmation_date__date__lte=effective_after_date)
             )
 
     return members
@@ -126,9 +90,8 @@ def leave_balance_accrual():
     Check if date falls on frequency
     Using the LeaveType's Applicability, get the members to whom it is applicable.
     Check effective_after date
-    Get or create LeaveBalance for each member.
-    Check if current accrual
-    Add accrual to the LeaveBalance
+    Bulk create missing LeaveBalances, skip them if not current accrual
+    Add accrual to the LeaveBalances with one UPDATE per LeaveType
     """
 
     current_date = read_data.get_current_datetime().date()
@@ -160,21 +123,8 @@ def leave_balance_accrual():
                 continue
 
             members = get_applicable_members(applicability)
-            for member in members:
-                print(f"{member=}")
-
-                leave_balance, created = LeaveBalance.objects.get_or_create(
-                    member=member, leave_type=leave_type
-                )
-
-                if created and current_accrual is False:
-                    print(f"Skipping for {member=} since current accrual is False")
-                    continue
-
-                leave_balance.available += number_of_days
-                leave_balance.save(
-                    activity_kwargs={"action": "credit", "days": number_of_days}
-                )
+            credited = accrue_leave_type(leave_type, members, number_of_days, current_accrual)
+            logger.info(f"Credited {number_of_days} days of {leave_type} to {credited} leave balances")
 
 
 @shared_task(name="leave_balance_reset")
@@ -203,37 +153,14 @@ def leave_balance_reset():
             frequency = reset_policy.get("frequency")
             reset_on = reset_policy.get("reset_on")
             carry_forward = reset_policy.get("carry_forward", {})
-            carry_forward_unit = carry_forward.get("unit")
-            carry_forward_value = carry_forward.get("value")
-            carry_forward_max_limit = carry_forward.get("max_limit")
 
             is_frequency_valid = check_frequency(frequency, reset_on, current_date)
             if is_frequency_valid is False:
                 continue
 
             members = get_applicable_members(applicability)
-            for member in members:
-                print(f"{member=}")
-
-                leave_balance, created = LeaveBalance.objects.get_or_create(
-                    member=member, leave_type=leave_type
-                )
-
-                if carry_forward_unit == "days":
-                    number_of_days = min(
-                        leave_balance.available, carry_forward_max_limit
-                    )
-                elif carry_forward_unit == "percentage":
-                    number_of_days = leave_balance.available * carry_forward_value
-                    number_of_days = min(number_of_days, carry_forward_max_limit)
-                else:
-                    number_of_days = 0
-
-                leave_balance.lapsed = leave_balance.available - number_of_days
-                leave_balance.available = number_of_days
-                leave_balance.save(
-                    activity_kwargs={"action": "reset", "days": number_of_days}
-                )
+            reset = reset_leave_type(leave_type, members, carry_forward)
+            logger.info(f"Reset {reset} leave balances of {leave_type}")
 
 
 @shared_task(name="deny_pending_leave_requests_older_than_today")
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import datetime as dt
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from account.models import User
+from leave.accrual import accrue_leave_type, reset_leave_type
+from leave.applicability import get_applicability_version, get_applicable_member_ids, query_applicable_members
+from leave.models import LeaveBalance, LeaveBalanceActivity, LeaveType
+from member.models import Member, Profile
+from organization.models import Department, Organization, Role
+from shift.models import Shift
+
+
+def create_organization(name: str) -> Organization:
+    org = Organization.objects.create(name=name)
+    # Members get an initial shift schedule log of the org default shift
+    org.default_shift = Shift.objects.create(
+        name="General",
+        organization=org,
+        start_time=dt.time(9),
+        end_time=dt.time(18),
+        computation_time=dt.time(20),
+    )
+    org.save()
+    return org
+
+
+def create_member(org: Organization, username: str, **values) -> Member:
+    role, _ = Role.objects.get_or_create(name="member")
+    user = User.objects.create(username=username, first_name=username)
+    return Member.objects.create(user=user, organization=org, role=role, **values)
+
+
+class LeaveAccrualTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = create_organization("Accrual Org")
+        cls.leave_type = LeaveType.objects.create(organization=cls.org, name="Casual")
+        cls.members = [create_member(cls.org, username) for username in ("first", "second")]
+
+    def get_balances(self) -> dict:
+        return {
+            balance.member_id: balance
+            for balance in LeaveBalance.objects.filter(leave_type=self.leave_type)
+        }
+
+    def test_accrual_credits_existing_balances(self):
+        first, second = self.members
+        LeaveBalance.objects.create(member=first, leave_type=self.leave_type, available=2)
+        members = Member.objects.filter(organization=self.org)
+
+        credited = accrue_leave_type(self.leave_type, members, 1.5, current_accrual=False)
+
+        balances = self.get_balances()
+        self.assertEqual(credited, 1)
+        self.assertEqual(balances[first.id].available, 3.5)
+        # Created now, not credited without current accrual
+        self.assertEqual(balances[second.id].available, 0)
+        self.assertEqual(
+            list(LeaveBalanceActivity.objects.values_list("leave_balance_id", "action", "days")),
+            [(balances[first.id].id, "credit", 1.5)],
+        )
+
+    def test_accrual_credits_created_balances(self):
+        members = Member.objects.filter(organization=self.org)
+
+        credited = accrue_leave_type(self.leave_type, members, 1.5, current_accrual=True)
+
+        self.assertEqual(credited, 2)
+        self.assertEqual([balance.available for balance in self.get_balances().values()], [1.5, 1.5])
+
+    def reset(self, carry_forward: dict) -> dict:
+        first, second = self.members
+        LeaveBalance.objects.create(member=first, leave_type=self.leave_type, available=10)
+        LeaveBalance.objects.create(member=second, leave_type=self.leave_type, available=3)
+
+        reset = reset_leave_type(self.leave_type, Member.objects.filter(organization=self.org), carry_forward)
+
+        self.assertEqual(reset, 2)
+        balances = self.get_balances()
+        return {
+            member.id: (balances[member.id].available, balances[member.id].lapsed)
+            for member in self.members
+        }
+
+    def test_reset_carry_forward_days_with_max_limit(self):
+        first, second = self.members
+
+        balances = self.reset({"unit": "days", "max_limit": 5})
+
+        self.assertEqual(balances, {first.id: (5, 5), second.id: (3, 0)})
+        self.assertEqual(
+            sorted(LeaveBalanceActivity.objects.filter(action="reset").values_list("days", flat=True)), [3, 5]
+        )
+
+    def test_reset_carry_forward_percentage(self):
+        first, second = self.members
+
+        balances = self.reset({"unit": "percentage", "value": 0.5, "max_limit": None})
+
+        self.assertEqual(balances, {first.id: (5, 5), second.id: (1.5, 1.5)})
+
+    def test_reset_without_carry_forward(self):
+        first, second = self.members
+
+        balances = self.reset({})
+
+        self.assertEqual(balances, {first.id: (0, 10), second.id: (0, 3)})
+
+
+class ApplicabilityTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = create_organization("Applicability Org")
+        cls.sales = Department.objects.create(organization=cls.org, name="Sales")
+        cls.support = Department.objects.create(organization=cls.org, name="Support")
+
+        cls.first = create_member(cls.org, "first", department=cls.sales)
+        cls.second = create_member(cls.org, "second", department=cls.sales)
+        cls.third = create_member(cls.org, "third", department=cls.support)
+        for member, gender, marital_status in (
+            (cls.first, "male", "married"),
+            (cls.second, "female", "single"),
+            (cls.third, "male", "single"),
+        ):
+            Profile.objects.filter(member=member).update(gender=gender, marital_status=marital_status)
+
+        # Member of another org, included by id
+        cls.other = create_member(create_organization("Other Org"), "other")
+
+    def setUp(self):
+        self.applicability = LeaveType.objects.create(organization=self.org, name="Casual").applicability
+
+    def get_members(self) -> set:
+        return set(query_applicable_members(self.applicability))
+
+    def test_nothing_included_nobody_applicable(self):
+        self.applicability.exclude_members.add(self.first)
+
+        self.assertEqual(self.get_members(), set())
+
+    def test_included_members_without_excluded(self):
+        self.applicability.departments.add(self.sales)
+        self.applicability.members.add(self.third, self.other)
+        self.applicability.exclude_members.add(self.second)
+
+        self.assertEqual(self.get_members(), {self.first, self.third})
+
+        self.applicability.exclude_departments.add(self.support)
+        self.assertEqual(self.get_members(), {self.first})
+
+    def test_gender_and_marital_status_of_profile(self):
+        self.applicability.departments.add(self.sales, self.support)
+        self.applicability.gender = "male"
+        self.applicability.marital_status = "all"
+        self.applicability.save()
+
+        self.assertEqual(self.get_members(), {self.first, self.third})
+
+        self.applicability.marital_status = "married"
+        self.applicability.save()
+        self.assertEqual(self.get_members(), {self.first})
+
+
+@override_settings(SHARED_CACHE=True)
+class ApplicabilityCacheTestCase(ApplicabilityTestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def assert_version_changed(self, change) -> None:
+        version = get_applicability_version(self.applicability)
+        change()
+        self.assertNotEqual(get_applicability_version(self.applicability), version)
+
+    def test_relation_changes_change_version(self):
+        self.assert_version_changed(lambda: self.applicability.departments.add(self.sales))
+        self.assert_version_changed(lambda: self.applicability.exclude_members.add(self.second))
+        # Changed from the other side of the relation
+        self.assert_version_changed(lambda: self.sales.applicabilities.remove(self.applicability))
+
+    def test_cached_ids_follow_member_and_profile_changes(self):
+        self.applicability.departments.add(self.sales)
+        self.applicability.gender = "male"
+        self.applicability.save()
+        self.assertEqual(get_applicable_member_ids(self.applicability), {self.first.id})
+
+        self.third.department = self.sales
+        self.third.save()
+        self.assertEqual(get_applicable_member_ids(self.applicability), {self.first.id, self.third.id})
+
+        profile = Profile.objects.get(member=self.first)
+        profile.gender = "female"
+        profile.save()
+        self.assertEqual(get_applicable_member_ids(self.applicability), {self.third.id})
@@ -8,6 +8,7 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 
 from api import permissions
+from leave.applicability import get_applicable_member_ids
 from leave.models import LeaveType, LeaveBalance, LeaveRequest, Applicability
 from leave import serializers
 from leave.utils import get_leave_balance, get_leave_balance, get_leave_type
@@ -209,7 +210,9 @@ class LeaveApplicabilityAPI(views.APIView):
             return read_data.get_404_response("Leave Type")
 
         serializer = self.serializer_class(leave_type)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = serializer.data
+        data["applicable_members_count"] = len(get_applicable_member_ids(leave_type.applicability))
+        return Response(data, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
 
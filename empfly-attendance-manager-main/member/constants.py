@@ -1 +1,4 @@
-MEMBER_MAX_IMAGE_COUNT = 5
\ No newline at end of file
+MEMBER_MAX_IMAGE_COUNT = 5
+
+# Max face distance for matching a scan image with member images.
+FACE_MATCH_TOLERANCE = 0.35
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from attendance.models import Attendance, MemberPresence
+from attendance.serializers import AttendanceSerializer
+from member.models import Member
+from shift.serializers import ShiftScheduleLogSerializer
+from utils.cache import is_cache_shared
+from utils.shift import curr_shift_schedule_log
+from visitor.models import Visitor, VisitorScan
+
+
+def get_org_counters_cache_key(org_id: int, date) -> str:
+    return f"dashboard:org:{org_id}:{date}"
+
+
+def get_member_section_cache_key(member_id: int, date) -> str:
+    return f"dashboard:member:{member_id}:{date}"
+
+
+def invalidate_org_counters(org_id: int, date) -> None:
+    cache.delete(get_org_counters_cache_key(org_id, date))
+
+
+def invalidate_member_section(member_id: int, date) -> None:
+    cache.delete(get_member_section_cache_key(member_id, date))
+
+
+def get_or_compute(cache_key: str, compute, timeout: int):
+    """ Cached value of compute. Scan signals drop it only in a shared cache,
+        so without one it is computed every time.
+    """
+
+    if not is_cache_shared():
+        return compute()
+    return cache.get_or_set(cache_key, compute, timeout)
+
+
+def percentage(count: int, total: int) -> float:
+    return (count / total) * 100 if total > 0 else 0
+
+
+def get_org_counters(org, today) -> dict:
+    """ Today's scan and visitor counters of org for admin/hr dashboard. Cached for
+        DASHBOARD_CACHE_TIMEOUT seconds and dropped when member or visitor scans are saved.
+    """
+
+    def compute():
+        # Members who scanned today are the members whose last scan is today
+        scans_count = MemberPresence.objects.filter(organization=org, date=today).count()
+        members_count = Member.objects.filter(organization=org, status="active").count()
+
+        visitor_scans_count = (
+            VisitorScan.objects.filter(organization=org, date=today).values("visitor").distinct().count()
+        )
+        visitors_count = Visitor.objects.filter(organization=org, status="active").count()
+
+        return {
+            "scans_count": scans_count,
+            "scans_count_percentage": percentage(scans_count, members_count),
+            "visitors_count": visitor_scans_count,
+            "visitors_count_percentage": percentage(visitor_scans_count, visitors_count),
+        }
+
+    return get_or_compute(get_org_counters_cache_key(org.id, today), compute, settings.DASHBOARD_CACHE_TIMEOUT)
+
+
+def get_member_section(member: Member, org, today_dt) -> dict:
+    """ Last check in time, last attendance and current shift of member. Cached for
+        DASHBOARD_MEMBER_CACHE_TIMEOUT seconds and dropped when member scans.
+    """
+
+    def compute():
+        presence = MemberPresence.objects.filter(member=member).only("last_scan_at").first()
+        last_attendance = Attendance.objects.filter(organization=org, member=member).order_by("date").last()
+        log = curr_shift_schedule_log(member, today_dt, org)[0]
+
+        return {
+            "last_check_in_time": presence.last_scan_at if presence else None,
+            "last_attendance": dict(AttendanceSerializer(last_attendance).data),
+            "today_shift": dict(ShiftScheduleLogSerializer(log).data),
+        }
+
+    return get_or_compute(
+        get_member_section_cache_key(member.id, today_dt.date()), compute, settings.DASHBOARD_MEMBER_CACHE_TIMEOUT
+    )
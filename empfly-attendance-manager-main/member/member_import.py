@@ -0,0 +1,558 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone as tz
+
+from account.authentication import invalidate_token_cache
+from account.models import AuthToken, User
+from kiosk.models import Kiosk
+from leave.applicability import invalidate_org_applicability
+from member.models import Member, Profile
+from organization.models import Department, Designation, Organization, OrgLocation, Role
+from shift.models import ShiftScheduleLog
+from utils.date_time import curr_dt_with_org_tz
+from visitor.models import Visitor
+
+import pandas as pd
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = [
+    "email",
+    "phone_number",
+    "first_name",
+    "last_name",
+    "designation",
+    "department",
+    "org_location",
+    "employee_id",
+    "manager",
+    "role",
+    "status",
+]
+UPDATE_COLUMNS = ["uuid"] + IMPORT_COLUMNS
+EMPTY_VALUES = ("", "NA")
+ROLES = ("admin", "hr", "member")
+
+USER_UPDATE_FIELDS = ["first_name", "last_name", "email", "phone", "username", "is_superuser", "is_staff", "updated_at"]
+MEMBER_UPDATE_FIELDS = ["role", "department", "designation", "org_location", "employee_id", "status", "updated_at"]
+
+MEMBER_LIMIT_MESSAGE = "Organization member limit reached. Please contact Empfly support."
+
+
+class RowError(Exception):
+    pass
+
+
+def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """ Name columns of an import (11 columns) or update (12 columns, uuid
+        first) csv and normalize all values to stripped strings.
+    """
+
+    df = df.copy()
+    df.columns = UPDATE_COLUMNS if len(df.columns) == len(UPDATE_COLUMNS) else IMPORT_COLUMNS
+    df = df.astype(str).apply(lambda column: column.str.strip())
+
+    # Numeric columns are read as floats, 9876543210.0
+    df["phone_number"] = df["phone_number"].str.split(".", n=1).str[0]
+    df["employee_id"] = df["employee_id"].str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+
+    # "NA" marks an empty value, so it is not lowercased
+    for column in ("email", "manager", "role"):
+        df[column] = df[column].where(df[column].isin(EMPTY_VALUES), df[column].str.lower())
+    return df
+
+
+def get_row_errors(df: pd.DataFrame, is_update: bool) -> pd.Series:
+    """ First validation error of each row ("" if valid), checked on the whole
+        dataframe at once. Later duplicates of a value in the file are errors.
+    """
+
+    errors = pd.Series("", index=df.index)
+
+    def add_error(mask: pd.Series, message: str) -> None:
+        errors[mask & (errors == "")] = message
+
+    def is_empty(column: str) -> pd.Series:
+        return df[column].isin(EMPTY_VALUES)
+
+    def is_duplicated(column: str) -> pd.Series:
+        return ~is_empty(column) & df[column].duplicated(keep="first")
+
+    add_error(~df["status"].isin(("active", "inactive")), "Status must be active/inactive.")
+
+    if is_update:
+        add_error(df["uuid"] == "", "UUID is required")
+        add_error(is_duplicated("uuid"), "UUID is repeated in the file")
+        add_error(~is_empty("role") & ~df["role"].isin(ROLES), "Role must be in Admin/Hr/Member.")
+    else:
+        add_error(is_empty("email") & is_empty("phone_number"), "email or phone number is required")
+        add_error(is_empty("first_name"), "First Name is required")
+        add_error(~df["role"].isin(ROLES), "Role must be in Admin/Hr/Member.")
+
+    add_error(is_duplicated("email"), "Email is repeated in the file")
+    add_error(is_duplicated("phone_number"), "Phone number is repeated in the file")
+    add_error(is_duplicated("employee_id"), "Employee ID is repeated in the file")
+    return errors
+
+
+def get_available_member_slots(org: Organization) -> float:
+    """ Number of members that can be made active, like is_allowed_to_add_members
+    """
+
+    member_limit = org.limit.get("member")
+    if not member_limit:
+        return float("inf")
+    return member_limit - org.members.filter(status="active").count()
+
+
+class MemberCSVImport:
+    """ Import or update members of org from a csv dataframe.
+
+        Rows are validated with vectorized checks, then resolved against
+        lookups loaded once, and everything is written with bulk queries in
+        one transaction. Activation emails of created users are queued after
+        commit.
+    """
+
+    def __init__(self, org: Organization, requesting_member: Member, df: pd.DataFrame):
+        self.org = org
+        self.requesting_member = requesting_member
+        self.row_length = len(df.columns)
+        self.is_update = self.row_length == len(UPDATE_COLUMNS)
+        self.df = clean_dataframe(df) if self.row_length in (len(IMPORT_COLUMNS), len(UPDATE_COLUMNS)) else df
+
+        self.failed_members = []
+        self.failed_rows = []
+        self.written_rows = []
+        self.created_count = 0
+        self.updated_count = 0
+        self.limit_exceeded = False
+
+        self.new_users = []
+        self.updated_users = {}
+        self.new_members = []
+        # Created members by id() of their user, a user can be matched by more than one row
+        self.new_members_by_user = {}
+        self.updated_members = {}
+        # Face indexes hold active members only, so only status changes drop them
+        self.is_status_changed = False
+        self.manager_emails = {}
+        self.new_objects = {Department: {}, Designation: {}, OrgLocation: {}}
+
+    # * Lookups
+
+    def load_lookups(self) -> None:
+        df = self.df
+        emails = [email for email in df["email"].unique() if email not in EMPTY_VALUES]
+        phones = [phone for phone in df["phone_number"].unique() if phone not in EMPTY_VALUES]
+
+        users = list(
+            User.objects.filter(Q(email__in=emails) | Q(phone__in=phones) | Q(username__in=emails + phones))
+        )
+        self.users_by_email = {user.email: user for user in users if user.email}
+        self.users_by_phone = {user.phone: user for user in users if user.phone}
+        self.usernames = {user.username: user for user in users}
+        self.visitor_user_ids = set(
+            Visitor.objects.filter(organization=self.org, user_id__in=[user.id for user in users]).values_list(
+                "user_id", flat=True
+            )
+        )
+
+        members = list(Member.objects.filter(organization=self.org).select_related("user"))
+        self.members_by_user_id = {member.user_id: member for member in members}
+        self.members_by_id = {member.id: member for member in members}
+        self.members_by_uuid = {str(member.uuid): member for member in members}
+        self.members_by_email = {member.user.email: member for member in members if member.user.email}
+        self.employee_ids = {member.employee_id for member in members if member.employee_id}
+
+        self.roles = {role.name: role for role in Role.objects.filter(name__in=ROLES)}
+        self.objects = {
+            model: {obj.name: obj for obj in model.objects.filter(organization=self.org)}
+            for model in (Department, Designation, OrgLocation)
+        }
+        self.available_slots = get_available_member_slots(self.org)
+
+    def get_or_build(self, model, name: str):
+        """ Department, Designation or OrgLocation of org by name. Missing ones
+            are created with the members.
+        """
+
+        if name in EMPTY_VALUES:
+            return None
+
+        obj = self.objects[model].get(name) or self.new_objects[model].get(name)
+        if obj is None:
+            obj = model(organization=self.org, name=name)
+            self.new_objects[model][name] = obj
+        return obj
+
+    def get_role(self, name: str) -> Role:
+        role = self.roles.get(name)
+        if role is None:
+            raise RowError(f"Role {name} does not exist.")
+        return role
+
+    def take_member_slot(self) -> None:
+        if self.available_slots <= 0:
+            self.limit_exceeded = True
+            raise RowError(MEMBER_LIMIT_MESSAGE)
+        self.available_slots -= 1
+
+    # * Rows
+
+    def get_user(self, row: dict) -> User:
+        """ Existing user with email or phone of row, or a new unsaved one
+        """
+
+        email, phone = row["email"], row["phone_number"]
+        user = self.users_by_email.get(email) or self.users_by_phone.get(phone)
+
+        if user is not None:
+            if user.id in self.visitor_user_ids:
+                raise RowError("User is already a visitor.")
+            return user
+
+        username = email if email not in EMPTY_VALUES else phone
+        if username in self.usernames:
+            raise RowError(f"Username {username} already exists.")
+
+        user = User(first_name=row["first_name"], username=username, is_active=False)
+        if email not in EMPTY_VALUES:
+            user.email = email
+        else:
+            user.phone = phone
+        user.has_superuser_permission()
+        return user
+
+    def get_user_changes(self, user: User, row: dict) -> tuple:
+        """ (email, phone, username) of user after row, like User.save.
+            Email and phone are changed only if no other user has them.
+        """
+
+        email = row["email"]
+        if email in EMPTY_VALUES or email in self.users_by_email:
+            email = user.email
+
+        phone = row["phone_number"]
+        if phone in EMPTY_VALUES or phone in self.users_by_phone:
+            phone = user.phone
+
+        username = user.username
+        if user.pk is not None and (email or phone):
+            username = email or phone
+            if username != user.username and username in self.usernames:
+                raise RowError(f"Username {username} already exists.")
+
+        return email, phone, username
+
+    def update_user(self, user: User, row: dict, changes: tuple) -> None:
+        email, phone, username = changes
+
+        user.first_name = row["first_name"]
+        if row["last_name"] not in EMPTY_VALUES:
+            user.last_name = row["last_name"]
+
+        if email != user.email:
+            self.users_by_email.pop(user.email, None)
+            user.email = email
+            self.users_by_email[email] = user
+
+        if phone != user.phone:
+            self.users_by_phone.pop(user.phone, None)
+            user.phone = phone
+            self.users_by_phone[phone] = user
+
+        if username != user.username:
+            self.usernames.pop(user.username, None)
+            user.username = username
+            self.usernames[username] = user
+
+        if user.pk is None:
+            if user.email:
+                self.users_by_email[user.email] = user
+            if user.phone:
+                self.users_by_phone[user.phone] = user
+            self.usernames[user.username] = user
+            return
+
+        user.has_superuser_permission()
+        user.updated_at = tz.now()
+        self.updated_users[user.id] = user
+
+    def check_member_status(self, member: Member, row: dict, is_created: bool = False) -> None:
+        """ Take a member slot if member is created or activated, free one if deactivated
+        """
+
+        if is_created or (member.status == "inactive" and row["status"] == "active"):
+            self.take_member_slot()
+            if row["status"] == "inactive":
+                self.available_slots += 1
+        elif member.status == "active" and row["status"] == "inactive":
+            self.available_slots += 1
+
+    def import_row(self, row: dict) -> bool:
+        """ return: True if member is created
+        """
+
+        user = self.get_user(row)
+        changes = self.get_user_changes(user, row)
+
+        member = self.members_by_user_id.get(user.id) if user.pk else None
+        if member is None:
+            member = self.new_members_by_user.get(id(user))
+        is_created = member is None
+        if is_created:
+            member = Member(organization=self.org, user=user, role=self.get_role(row["role"]))
+
+        self.check_member_status(member, row, is_created)
+        self.update_user(user, row, changes)
+        self.update_member(member, row)
+
+        if is_created:
+            self.new_members.append(member)
+            self.new_members_by_user[id(user)] = member
+            if user.pk is None:
+                self.new_users.append(user)
+            if user.email:
+                self.members_by_email[user.email] = member
+        return is_created
+
+    def update_row(self, row: dict) -> None:
+        member = self.members_by_uuid.get(row["uuid"])
+        if member is None:
+            raise RowError("Member does not exist.")
+
+        role = member.role
+        if row["role"] not in EMPTY_VALUES and member != self.requesting_member:
+            role = self.get_role(row["role"])
+
+        changes = self.get_user_changes(member.user, row)
+        self.check_member_status(member, row)
+        self.update_user(member.user, row, changes)
+
+        member.role = role
+        self.update_member(member, row)
+
+    def update_member(self, member: Member, row: dict) -> None:
+        if member.pk is not None and member.status != row["status"]:
+            self.is_status_changed = True
+        member.status = row["status"]
+        self.set_member_fields(member, row)
+
+        if member.pk is not None:
+            member.updated_at = tz.now()
+            self.updated_members[member.id] = member
+
+    def set_member_fields(self, member: Member, row: dict) -> None:
+        member.department = self.get_or_build(Department, row["department"])
+        member.designation = self.get_or_build(Designation, row["designation"])
+        member.org_location = self.get_or_build(OrgLocation, row["org_location"])
+
+        employee_id = row["employee_id"]
+        if employee_id in EMPTY_VALUES:
+            member.employee_id = None
+        elif member.employee_id != employee_id and employee_id not in self.employee_ids:
+            member.employee_id = employee_id
+            self.employee_ids.add(employee_id)
+
+        # Managers are resolved after all rows, they can be members of the file
+        self.manager_emails[id(member)] = (member, row["manager"])
+
+    def add_failure(self, row_number: int, row: dict, reason: str, detailed_reason: str) -> None:
+        self.failed_rows.append(row_number)
+        self.failed_members.append(
+            {
+                "email": row.get("uuid") if self.is_update else row.get("email"),
+                "reason": reason,
+                "detailed_reason": detailed_reason,
+            }
+        )
+
+    def process_rows(self) -> None:
+        errors = get_row_errors(self.df, self.is_update)
+
+        for index, (row, error) in enumerate(zip(self.df.to_dict("records"), errors)):
+            # Row number in csv, after header
+            row_number = index + 2
+            if error:
+                self.add_failure(row_number, row, "ValidationError", error)
+                continue
+
+            try:
+                if self.is_update:
+                    self.update_row(row)
+                    self.updated_count += 1
+                elif self.import_row(row):
+                    self.created_count += 1
+                else:
+                    self.updated_count += 1
+            except RowError as err:
+                self.add_failure(row_number, row, "ValidationError", str(err))
+                continue
+
+            self.written_rows.append((row_number, row))
+
+    def get_manager(self, member: Member) -> Member:
+        """ Manager of member after import, without a query per member
+        """
+
+        if id(member) in self.manager_emails:
+            manager_email = self.manager_emails[id(member)][1]
+            if manager_email in EMPTY_VALUES:
+                return None
+            return self.members_by_email.get(manager_email, self.members_by_id.get(member.manager_id))
+
+        if member.manager_id is None:
+            return None
+        return self.members_by_id.get(member.manager_id)
+
+    def resolve_managers(self) -> list:
+        """ Set manager of members from manager email of their row.
+            return: created members whose manager is set
+        """
+
+        new_member_ids = {id(member) for member in self.new_members}
+        managed_new_members = []
+
+        for member, manager_email in self.manager_emails.values():
+            if manager_email in EMPTY_VALUES:
+                member.manager = None
+                continue
+
+            manager = self.members_by_email.get(manager_email)
+            if manager is None or manager is member or self.get_manager(manager) is member:
+                continue
+
+            member.manager = manager
+            if id(member) in new_member_ids:
+                managed_new_members.append(member)
+
+        return managed_new_members
+
+    # * Write
+
+    def write(self) -> list:
+        """ Write all resolved rows. return: ids of created users with email
+        """
+
+        for model, objects in self.new_objects.items():
+            model.objects.bulk_create(objects.values(), batch_size=settings.MEMBER_IMPORT_BATCH_SIZE)
+
+        User.objects.bulk_create(self.new_users, batch_size=settings.MEMBER_IMPORT_BATCH_SIZE)
+        User.objects.bulk_update(
+            self.updated_users.values(), USER_UPDATE_FIELDS, batch_size=settings.MEMBER_IMPORT_BATCH_SIZE
+        )
+
+        Member.objects.bulk_create(self.new_members, batch_size=settings.MEMBER_IMPORT_BATCH_SIZE)
+
+        managed_new_members = self.resolve_managers()
+        Member.objects.bulk_update(
+            self.updated_members.values(),
+            MEMBER_UPDATE_FIELDS + ["manager"],
+            batch_size=settings.MEMBER_IMPORT_BATCH_SIZE,
+        )
+        Member.objects.bulk_update(managed_new_members, ["manager"], batch_size=settings.MEMBER_IMPORT_BATCH_SIZE)
+
+        self.create_member_defaults()
+
+        # Cached auth tokens hold the user
+        updated_user_ids = list(self.updated_users)
+        for key in AuthToken.objects.filter(user_id__in=updated_user_ids).values_list("key", flat=True):
+            invalidate_token_cache(key)
+
+        # Bulk writes send no member signals
+        organization_id = self.org.id
+        transaction.on_commit(lambda: invalidate_org_applicability(organization_id))
+        if self.is_status_changed:
+            # Imported here, face_rec loads face_recognition
+            from utils.face_rec import invalidate_instance_face_index
+
+            transaction.on_commit(invalidate_instance_face_index)
+
+        return [user.id for user in self.new_users if user.email]
+
+    def create_member_defaults(self) -> None:
+        """ Profile, initial shift schedule log and mobile kiosk of created
+            members, which Member.save and MembersUploadCSVAPI create one by one.
+        """
+
+        if not self.new_members:
+            return
+
+        batch_size = settings.MEMBER_IMPORT_BATCH_SIZE
+        Profile.objects.bulk_create(
+            [Profile(member=member) for member in self.new_members], batch_size=batch_size, ignore_conflicts=True
+        )
+
+        shift = self.org.default_shift
+        if shift is None:
+            logger.warning(f"{self.org} has no default shift, no shift schedule log for imported members")
+        else:
+            start_date = curr_dt_with_org_tz().date()
+            ShiftScheduleLog.objects.bulk_create(
+                [
+                    ShiftScheduleLog(employee=member, shift=shift, start_date=start_date, organization=self.org)
+                    for member in self.new_members
+                ],
+                batch_size=batch_size,
+            )
+
+        mobile_kiosk, _ = Kiosk.objects.get_or_create(kiosk_name="Mobile Kiosk", organization=self.org)
+        MemberKiosk = Member.authorized_kiosks.through
+        MemberKiosk.objects.bulk_create(
+            [MemberKiosk(member_id=member.id, kiosk_id=mobile_kiosk.id) for member in self.new_members],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+    def run(self) -> dict:
+        if self.row_length not in (len(IMPORT_COLUMNS), len(UPDATE_COLUMNS)):
+            for index in range(len(self.df)):
+                self.failed_rows.append(index + 2)
+                self.failed_members.append(
+                    {"email": None, "reason": "ValidationError", "detailed_reason": "Row length must be 11 or 12."}
+                )
+            return self.get_result()
+
+        # Imported here, member.tasks imports email_funcs
+        from member.tasks import send_activation_mails_task
+
+        self.load_lookups()
+        self.process_rows()
+
+        try:
+            with transaction.atomic():
+                user_ids = self.write()
+                if user_ids:
+                    transaction.on_commit(lambda: send_activation_mails_task.delay(user_ids))
+        except IntegrityError as e:
+            # Users or members changed by another request since the lookups, nothing is written
+            logger.error(e)
+            logger.exception(f"Add exception for {e.__class__.__name__} in MemberCSVImport.run")
+            self.fail_written_rows(str(e))
+
+        logger.info(
+            f"Members imported to {self.org}. created: {self.created_count}, "
+            f"updated: {self.updated_count}, failed: {len(self.failed_rows)}"
+        )
+        return self.get_result()
+
+    def fail_written_rows(self, detailed_reason: str) -> None:
+        """ Report every valid row as failed, after the write is rolled back
+        """
+
+        self.created_count = 0
+        self.updated_count = 0
+        for row_number, row in self.written_rows:
+            self.add_failure(row_number, row, "IntegrityError", detailed_reason)
+
+    def get_result(self) -> dict:
+        return {
+            "failed_members": self.failed_members,
+            "created_count": self.created_count,
+            "failed_rows": self.failed_rows,
+            "updated_count": self.updated_count,
+        }
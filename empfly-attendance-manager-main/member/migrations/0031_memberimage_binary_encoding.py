@@ -0,0 +1,76 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:12
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+
+ENCODING_DTYPE = np.dtype("<f8")
+
+
+def encoding_json_to_bytes(apps, schema_editor):
+    MemberImage = apps.get_model("member", "MemberImage")
+
+    member_images = MemberImage.objects.only("id", "encoding")
+    updated = []
+    for member_image in member_images.iterator(chunk_size=2000):
+        encoding = member_image.encoding
+        # Encodings were saved as JSON string inside the JSONField
+        if isinstance(encoding, str):
+            try:
+                encoding = json.loads(encoding)
+            except ValueError:
+                continue
+        if not isinstance(encoding, list) or len(encoding) == 0:
+            continue
+        member_image.binary_encoding = np.asarray(encoding, dtype=ENCODING_DTYPE).tobytes()
+        updated.append(member_image)
+
+        if len(updated) >= 2000:
+            MemberImage.objects.bulk_update(updated, ["binary_encoding"])
+            updated = []
+
+    MemberImage.objects.bulk_update(updated, ["binary_encoding"])
+
+
+def encoding_bytes_to_json(apps, schema_editor):
+    MemberImage = apps.get_model("member", "MemberImage")
+
+    member_images = MemberImage.objects.filter(binary_encoding__isnull=False).only("id", "binary_encoding")
+    updated = []
+    for member_image in member_images.iterator(chunk_size=2000):
+        encoding = np.frombuffer(member_image.binary_encoding, dtype=ENCODING_DTYPE)
+        member_image.encoding = json.dumps(encoding.tolist())
+        updated.append(member_image)
+
+        if len(updated) >= 2000:
+            MemberImage.objects.bulk_update(updated, ["encoding"])
+            updated = []
+
+    MemberImage.objects.bulk_update(updated, ["encoding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0030_alter_memberimage_options_member_is_front_desk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberimage',
+            name='binary_encoding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(encoding_json_to_bytes, encoding_bytes_to_json),
+        migrations.RemoveField(
+            model_name='memberimage',
+            name='encoding',
+        ),
+        migrations.RenameField(
+            model_name='memberimage',
+            old_name='binary_encoding',
+            new_name='encoding',
+        ),
+    ]
@@ -181,7 +181,8 @@ class MemberImage(models.Model):
     )
 
     image = models.ImageField(upload_to=rename_member_fr_images, null=True, blank=True)
-    encoding = models.JSONField(default=dict, null=True, blank=True)
+    # Raw float64 bytes of face encoding. Use utils.face_rec helpers for read/write.
+    encoding = models.BinaryField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey(
         "organization.Organization",
@@ -71,7 +71,7 @@ class MemberImageSerializer(DynamicFieldsModelSerializer):
 
     class Meta:
         model = MemberImage
-        exclude = ["id"]
+        exclude = ["id", "encoding"]
 
 
 
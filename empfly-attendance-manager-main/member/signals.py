@@ -0,0 +1,78 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Member, MemberImage
+
+
+# Member fields the instance face index depends on
+FACE_INDEX_MEMBER_FIELDS = {"status", "organization", "organization_id"}
+
+
+@receiver(post_save, sender=MemberImage)
+@receiver(post_delete, sender=MemberImage)
+def invalidate_member_face_index(sender, instance, **kwargs):
+    """signal receiver to drop cached face encoding index of member image org"""
+
+    # Imported here to keep face_recognition out of app loading
+    from utils.face_rec import invalidate_face_index
+
+    invalidate_face_index(instance.organization_id)
+
+
+@receiver(pre_save, sender=Member)
+def keep_face_index_fields(sender, instance, update_fields=None, **kwargs):
+    """signal receiver to keep status and org of member before save, the instance face index depends on them"""
+
+    instance._face_index_fields = None
+    if instance.pk is None:
+        return
+
+    if update_fields is not None and not FACE_INDEX_MEMBER_FIELDS & set(update_fields):
+        instance._face_index_fields = (instance.status, instance.organization_id)
+        return
+
+    instance._face_index_fields = Member.objects.filter(pk=instance.pk).values_list(
+        "status", "organization_id"
+    ).first()
+
+
+@receiver(post_save, sender=Member)
+def invalidate_instance_face_index_on_save(sender, instance, created, **kwargs):
+    """signal receiver to drop cached instance face index if member is activated, deactivated or moved"""
+
+    # A created member has no images yet
+    if created or getattr(instance, "_face_index_fields", None) == (instance.status, instance.organization_id):
+        return
+
+    from utils.face_rec import invalidate_instance_face_index
+
+    invalidate_instance_face_index()
+
+
+@receiver(post_delete, sender=Member)
+def invalidate_instance_face_index_on_delete(sender, instance, **kwargs):
+    """signal receiver to drop cached instance face index, instance index holds active members only"""
+
+    from utils.face_rec import invalidate_instance_face_index
+
+    invalidate_instance_face_index()
+
+
+@receiver(post_save, sender="attendance.MemberScan")
+def invalidate_dashboard_on_member_scan(sender, instance, created, **kwargs):
+    """signal receiver to drop cached dashboard counters of scan org and member section of scan member"""
+
+    from attendance.presence import get_scan_date
+    from member.dashboard import invalidate_member_section, invalidate_org_counters
+
+    scan_date = get_scan_date(instance)
+    invalidate_org_counters(instance.organization_id, scan_date)
+    invalidate_member_section(instance.member_id, scan_date)
+
+
+@receiver(post_save, sender="visitor.VisitorScan")
+def invalidate_dashboard_on_visitor_scan(sender, instance, created, **kwargs):
+    """signal receiver to drop cached dashboard counters of visitor scan org"""
+
+    from member.dashboard import invalidate_org_counters
+
+    invalidate_org_counters(instance.organization_id, instance.date)
@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from account.models import User
+from utils import email_funcs
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="send_activation_mails")
+def send_activation_mails_task(user_ids: list):
+    """ Send activation mail to users created by member csv import
+    """
+
+    sent_count = 0
+    for user in User.objects.filter(id__in=user_ids):
+        if email_funcs.send_activation_mail(user) is True:
+            sent_count += 1
+
+    logger.info(f"Sent {sent_count} of {len(user_ids)} activation mails")
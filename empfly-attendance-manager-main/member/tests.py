@@ -1,3 +1,163 @@
-from django.test import TestCase
+import datetime as dt
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from account.models import User
+from kiosk.models import Kiosk
+from member.member_import import IMPORT_COLUMNS, MemberCSVImport
+from member.models import Member, MemberImage, Profile
+from organization.models import Organization, Role
+from shift.models import Shift, ShiftScheduleLog
+from utils.face_rec import INSTANCE_INDEX_KEY, get_face_index_queryset, get_face_index_version
+
+import pandas as pd
+
+
+def get_row(email: str = "NA", phone_number: str = "NA", **values) -> list:
+    row = {
+        "email": email,
+        "phone_number": phone_number,
+        "first_name": "user",
+        "last_name": "NA",
+        "designation": "NA",
+        "department": "NA",
+        "org_location": "NA",
+        "employee_id": "NA",
+        "manager": "NA",
+        "role": "member",
+        "status": "active",
+    }
+    row.update(values)
+    return [row[column] for column in IMPORT_COLUMNS]
+
+
+def create_organization(name: str) -> Organization:
+    """ Organization with a default shift and Mobile Kiosk, like organization setup
+    """
+
+    org = Organization.objects.create(name=name)
+    org.default_shift = Shift.objects.create(
+        name="General",
+        organization=org,
+        start_time=dt.time(9),
+        end_time=dt.time(18),
+        computation_time=dt.time(20),
+    )
+    org.save()
+    Kiosk.objects.create(
+        kiosk_name="Mobile Kiosk", organization=org, installed_latitude=12.9716, installed_longitude=77.5946
+    )
+    return org
+
+
+def create_member(org: Organization, username: str, role_name: str = "member", **values) -> Member:
+    role, _ = Role.objects.get_or_create(name=role_name)
+    user = User.objects.create(username=username, email=username, first_name=username)
+    return Member.objects.create(user=user, organization=org, role=role, **values)
+
+
+class MemberCSVImportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = create_organization("Import Org")
+        cls.shift = cls.org.default_shift
+        Role.objects.get_or_create(name="member")
+        cls.admin = create_member(cls.org, "admin@example.com", "admin")
+
+    def run_import(self, rows: list) -> dict:
+        df = pd.DataFrame(rows, columns=IMPORT_COLUMNS)
+        return MemberCSVImport(self.org, self.admin, df).run()
+
+    def test_import_creates_members(self):
+        result = self.run_import(
+            [
+                get_row("first@example.com", department="Sales"),
+                get_row(phone_number="9876543210", manager="first@example.com"),
+                get_row("invalid@example.com", role="owner"),
+            ]
+        )
+
+        self.assertEqual(result["created_count"], 2)
+        self.assertEqual(result["failed_rows"], [4])
+        first = Member.objects.get(organization=self.org, user__email="first@example.com")
+        second = Member.objects.get(organization=self.org, user__phone="9876543210")
+        self.assertEqual(first.department.name, "Sales")
+        self.assertEqual(second.manager, first)
+
+        for member in (first, second):
+            self.assertTrue(Profile.objects.filter(member=member).exists())
+            self.assertEqual(
+                list(ShiftScheduleLog.objects.filter(employee=member).values_list("shift", "organization")),
+                [(self.shift.id, self.org.id)],
+            )
+            self.assertEqual(
+                list(member.authorized_kiosks.values_list("kiosk_name", "organization")),
+                [("Mobile Kiosk", self.org.id)],
+            )
+
+    def test_rows_of_one_existing_user_create_one_member(self):
+        user = User.objects.create(
+            username="existing@example.com", email="existing@example.com", phone="9876543211", first_name="user"
+        )
+
+        result = self.run_import(
+            [
+                get_row("existing@example.com", status="inactive"),
+                get_row(phone_number="9876543211", employee_id="E1"),
+            ]
+        )
+
+        self.assertEqual(result["failed_rows"], [])
+        self.assertEqual((result["created_count"], result["updated_count"]), (1, 1))
+        member = Member.objects.get(organization=self.org, user=user)
+        # Last row wins
+        self.assertEqual((member.status, member.employee_id), ("active", "E1"))
+
+    def test_only_status_changes_drop_instance_face_index(self):
+        create_member(self.org, "existing@example.com")
+
+        with mock.patch("utils.face_rec.invalidate_instance_face_index") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_import([get_row("existing@example.com", employee_id="E1")])
+            invalidate.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_import([get_row("existing@example.com", status="inactive")])
+            invalidate.assert_called_once_with()
+
+
+class FaceIndexTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = create_organization("Face Index Org")
+        cls.first = create_member(cls.org, "first@example.com")
+        cls.second = create_member(cls.org, "second@example.com", status="inactive")
+        for member in (cls.first, cls.second):
+            MemberImage.objects.create(member=member, organization=cls.org)
+
+    def test_only_status_and_org_changes_drop_instance_index(self):
+        with mock.patch("utils.face_rec.invalidate_instance_face_index") as invalidate:
+            self.first.employee_id = "E1"
+            self.first.save()
+            self.first.save(update_fields=["employee_id"])
+            invalidate.assert_not_called()
+
+            self.first.status = "inactive"
+            self.first.save()
+            invalidate.assert_called_once_with()
+
+    @override_settings(SHARED_CACHE=False)
+    def test_instance_index_version_changes_with_member_status(self):
+        queryset = get_face_index_queryset(INSTANCE_INDEX_KEY)
+        version = get_face_index_version(INSTANCE_INDEX_KEY, queryset)
+
+        # Same count of active members and same images
+        self.first.status = "inactive"
+        self.first.save()
+        self.second.status = "active"
+        self.second.save()
+
+        self.assertNotEqual(get_face_index_version(INSTANCE_INDEX_KEY, queryset), version)
@@ -33,7 +33,7 @@ import datetime as dt
 from utils.response import HTTP_200, HTTP_400
 
 from utils.utils import base64_to_contentfile, is_fr_image_limit_reached, pagination
-from utils.face_rec import convert_encoding_to_json, get_image_encoding
+from utils.face_rec import convert_encoding_to_bytes, get_image_encoding
 from export import utils as export_utils
 from export.utils import create_export_request
 
@@ -167,7 +167,7 @@ class MembersAllImagesAPI(views.APIView):
             if matched_member and matched_member != member:
                 return HTTP_400({}, {"message": "Unable to complete identification. Error CFR6485."})
 
-        encoding = convert_encoding_to_json(encoding)
+        encoding = convert_encoding_to_bytes(encoding)
         member_image = MemberImage.objects.create(
             member=member, image=image, encoding=encoding, organization=org
         )
@@ -328,7 +328,7 @@ class MemberImageAPI(views.APIView):
             if matched_member and matched_member != selected_member:
                 return HTTP_400({}, {"message": "Unable to complete identification. Error CFR3415"})
 
-        encoding = convert_encoding_to_json(encoding)
+        encoding = convert_encoding_to_bytes(encoding)
         member_image = MemberImage.objects.create(
             member=selected_member, image=image, encoding=encoding, organization=org
         )
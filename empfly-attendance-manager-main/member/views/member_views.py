@@ -25,6 +25,7 @@ from attendance.models import MemberScan
 
 # from roster.models import Shift
 from shift.models import Shift, ShiftScheduleLog
+from shift.schedule_resolver import get_member_shift_schedule_logs
 from roster.utils import get_roster
 from utils.response import HTTP_200, HTTP_400
 from utils import read_data, fetch_data, create_data, email_funcs
@@ -1044,62 +1045,16 @@ class CheckInStatusAPIView(views.APIView):
     
 
     def get_ssl_for_day_before_yesterday(self, date):
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=self.member, organization=self.org
-        )
-
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=date,
-                    end_date__gte=date,
-                )
-                | Q(start_date__lte=date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
+        (yesterday_log,) = get_member_shift_schedule_logs(self.member, self.org, [date])
         return yesterday_log
 
     def get_ssl(self, member: Member, org: Organization) -> ShiftScheduleLog:
         """Retrive member yesterday, today, tomorrow  Shift Schedule Log"""
 
-        logs = ShiftScheduleLog.objects.filter(
-            status="active", employee=member, organization=org
+        yesterday_log, today_log, tomorrow_log = get_member_shift_schedule_logs(
+            member, org, [self.yesterday_date, self.curr_date, self.tomorrow_date]
         )
 
-        try:
-            yesterday_log = logs.get(
-                Q(
-                    start_date__lte=self.yesterday_date,
-                    end_date__gte=self.yesterday_date,
-                )
-                | Q(start_date__lte=self.yesterday_date, end_date__isnull=True)
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            yesterday_log = None
-
-        try:
-            today_log = logs.get(
-                Q(
-                    start_date__lte=self.curr_date,
-                    end_date__gte=self.curr_date,
-                )
-                | Q(start_date__lte=self.curr_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            today_log = None
-
-        try:
-            tomorrow_log = logs.get(
-                Q(
-                    start_date__lte=self.tomorrow_date,
-                    end_date__gte=self.tomorrow_date,
-                )
-                | Q(start_date__lte=self.tomorrow_date, end_date__isnull=True),
-            )
-        except ShiftScheduleLog.DoesNotExist:
-            tomorrow_log = None
-
         return yesterday_log, today_log, tomorrow_log
 
     def get(self, request, *args, **kwargs):
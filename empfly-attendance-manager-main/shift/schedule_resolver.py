@@ -0,0 +1,93 @@
+import datetime as dt
+from bisect import bisect_right
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable
+
+from django.db.models import Q
+
+from shift.models import ShiftScheduleLog
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+class ShiftScheduleResolver:
+    """ Shift Schedule Logs (SSL) of members as date intervals sorted by start date.
+
+        Answers "log of member on date" with a binary search instead of one
+        query per member per date. Active logs of a member do not overlap, if
+        they do lookups of that member scan every log and raise
+        MultipleObjectsReturned like ShiftScheduleLog.objects.get().
+    """
+
+    def __init__(self, logs: Iterable[ShiftScheduleLog]):
+        member_logs = defaultdict(list)
+        for log in logs:
+            member_logs[log.employee_id].append(log)
+
+        self.starts = {}
+        self.ends = {}
+        self.logs = {}
+        self.overlapping_member_ids = set()
+
+        for member_id, logs in member_logs.items():
+            logs.sort(key=lambda log: log.start_date)
+            ends = [log.end_date or dt.date.max for log in logs]
+
+            self.starts[member_id] = [log.start_date for log in logs]
+            self.ends[member_id] = ends
+            self.logs[member_id] = logs
+
+            if any(logs[i + 1].start_date <= ends[i] for i in range(len(logs) - 1)):
+                self.overlapping_member_ids.add(member_id)
+
+    @classmethod
+    def load(cls, logs: "QuerySet", start_date: dt.date, end_date: dt.date) -> "ShiftScheduleResolver":
+        """ Resolver of the active logs of queryset overlapping start_date to end_date
+        """
+
+        logs = logs.filter(
+            Q(end_date__gte=start_date) | Q(end_date__isnull=True),
+            status="active",
+            start_date__lte=end_date,
+        )
+        return cls(logs)
+
+    def get_log(self, member_id: int, date: dt.date) -> ShiftScheduleLog:
+        """ Log of member on date, None if member has no log on date
+        """
+
+        starts = self.starts.get(member_id)
+        if starts is None:
+            return None
+
+        if member_id in self.overlapping_member_ids:
+            logs = [
+                log for log, end in zip(self.logs[member_id], self.ends[member_id])
+                if log.start_date <= date <= end
+            ]
+            if len(logs) > 1:
+                raise ShiftScheduleLog.MultipleObjectsReturned(
+                    f"{len(logs)} active shift schedule logs of member {member_id} on {date}"
+                )
+            return logs[0] if logs else None
+
+        position = bisect_right(starts, date) - 1
+        if position >= 0 and date <= self.ends[member_id][position]:
+            return self.logs[member_id][position]
+        return None
+
+    def get_logs(self, member_id: int, dates: Iterable[dt.date]) -> dict:
+        """ {date: log or None} of member
+        """
+
+        return {date: self.get_log(member_id, date) for date in dates}
+
+
+def get_member_shift_schedule_logs(member, org, dates: list) -> list:
+    """ Active log of member on each of dates (None if no log), with one query
+    """
+
+    logs = ShiftScheduleLog.objects.filter(employee=member, organization=org).select_related("shift")
+    resolver = ShiftScheduleResolver.load(logs, min(dates), max(dates))
+    return [resolver.get_log(member.id, date) for date in dates]
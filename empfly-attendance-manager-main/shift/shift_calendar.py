@@ -0,0 +1,108 @@
+import datetime as dt
+from itertools import islice
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from shift.models import LocationSettings, ShiftScheduleLog
+from shift.schedule_resolver import ShiftScheduleResolver
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_calendar_dates(start_date: dt.date, end_date: dt.date) -> list:
+    return [start_date + dt.timedelta(days=day) for day in range((end_date - start_date).days + 1)]
+
+
+def get_day_windows(log: ShiftScheduleLog, date: dt.date) -> list:
+    """ (system location, start time, end time) of log on date, ordered by start time.
+        Location settings applicable on date, or the shift default location
+        with shift timings if there are none.
+    """
+
+    windows = [
+        (location_setting.system_location, location_setting.start_time, location_setting.end_time)
+        for location_setting in log.location_settings.all()
+        if location_setting.applicable_start_date <= date
+        and (location_setting.applicable_end_date is None or location_setting.applicable_end_date >= date)
+    ]
+    if windows:
+        return sorted(windows, key=lambda window: window[1])
+
+    shift = log.shift
+    if shift.default_location is None:
+        return []
+    return [(shift.default_location, shift.start_time, shift.end_time)]
+
+
+def get_calendar_resolver(member_ids: list, dates: list) -> ShiftScheduleResolver:
+    logs = ShiftScheduleLog.objects.filter(employee_id__in=member_ids).select_related(
+        "shift__default_location"
+    ).prefetch_related(
+        Prefetch("location_settings", queryset=LocationSettings.objects.select_related("system_location"))
+    )
+    return ShiftScheduleResolver.load(logs, dates[0], dates[-1])
+
+
+def iter_shift_calendar(members: Iterable, dates: list, chunk_size: int = None):
+    """ Shift calendar of members on dates, one member at a time.
+
+        Logs and location settings are loaded with two queries per
+        chunk_size members, so members can be a lazy iterator of any size.
+
+        yield: (member, [(shift, windows) or None for each date])
+    """
+
+    chunk_size = chunk_size or settings.SHIFT_CALENDAR_CHUNK_SIZE
+    members = iter(members)
+
+    while True:
+        chunk = list(islice(members, chunk_size))
+        if not chunk:
+            return
+
+        resolver = get_calendar_resolver([member.id for member in chunk], dates) if dates else ShiftScheduleResolver([])
+
+        for member in chunk:
+            days = []
+            for date in dates:
+                try:
+                    log = resolver.get_log(member.id, date)
+                except ShiftScheduleLog.MultipleObjectsReturned as err:
+                    logger.error(err)
+                    log = None
+
+                days.append(None if log is None else (log.shift, get_day_windows(log, date)))
+            yield member, days
+
+
+def serialize_calendar_day(date: dt.date, day: tuple) -> dict:
+    """ JSON of one calendar cell from iter_shift_calendar
+    """
+
+    if day is None:
+        return {"date": str(date), "shift": None, "system_locations": []}
+
+    shift, windows = day
+    return {
+        "date": str(date),
+        "shift": {
+            "uuid": str(shift.uuid),
+            "name": shift.name,
+            "start_time": str(shift.start_time),
+            "end_time": str(shift.end_time),
+        },
+        "system_locations": [
+            {
+                "uuid": str(system_location.uuid),
+                "name": system_location.name,
+                "start_time": str(start_time),
+                "end_time": str(end_time),
+            }
+            for system_location, start_time, end_time in windows
+        ],
+    }
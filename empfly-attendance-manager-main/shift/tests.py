@@ -1,3 +1,260 @@
-from django.test import TestCase
+import datetime as dt
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from account.models import User
+from export.models import ExportRequest
+from export.utils import export_shift_calendar_csv
+from member.models import Member
+from organization.models import Organization, Role, SystemLocation
+from shift.models import LocationSettings, Shift, ShiftScheduleLog
+from shift.schedule_resolver import ShiftScheduleResolver
+from shift.shift_calendar import iter_shift_calendar
+
+
+def get_log(member_id: int, start_date: dt.date, end_date: dt.date = None) -> SimpleNamespace:
+    return SimpleNamespace(employee_id=member_id, start_date=start_date, end_date=end_date)
+
+
+def day(day: int) -> dt.date:
+    return dt.date(2024, 4, day)
+
+
+class ShiftScheduleResolverTestCase(SimpleTestCase):
+
+    def test_log_of_date(self):
+        april = get_log(1, day(1), day(10))
+        later = get_log(1, day(11), day(20))
+        # Unsorted logs are sorted by start date
+        resolver = ShiftScheduleResolver([later, april])
+
+        self.assertIs(resolver.get_log(1, day(5)), april)
+        self.assertIs(resolver.get_log(1, day(15)), later)
+        self.assertIsNone(resolver.get_log(1, day(21)))
+        self.assertIsNone(resolver.get_log(2, day(5)))
+
+    def test_boundary_dates(self):
+        first = get_log(1, day(1), day(10))
+        second = get_log(1, day(12), day(20))
+        resolver = ShiftScheduleResolver([first, second])
+
+        self.assertIsNone(resolver.get_log(1, dt.date(2024, 3, 31)))
+        self.assertIs(resolver.get_log(1, day(1)), first)
+        self.assertIs(resolver.get_log(1, day(10)), first)
+        # Gap between logs
+        self.assertIsNone(resolver.get_log(1, day(11)))
+        self.assertIs(resolver.get_log(1, day(12)), second)
+        self.assertIs(resolver.get_log(1, day(20)), second)
+
+    def test_open_ended_log(self):
+        closed = get_log(1, day(1), day(10))
+        open_ended = get_log(1, day(11))
+        resolver = ShiftScheduleResolver([closed, open_ended])
+
+        self.assertIs(resolver.get_log(1, day(11)), open_ended)
+        self.assertIs(resolver.get_log(1, dt.date(2030, 1, 1)), open_ended)
+        self.assertEqual(resolver.get_logs(1, [day(10), day(11)]), {day(10): closed, day(11): open_ended})
+
+    def test_overlapping_logs(self):
+        first = get_log(1, day(1), day(10))
+        second = get_log(1, day(10), day(20))
+        resolver = ShiftScheduleResolver([first, second, get_log(2, day(1))])
+
+        self.assertEqual(resolver.overlapping_member_ids, {1})
+        self.assertIs(resolver.get_log(1, day(5)), first)
+        self.assertIs(resolver.get_log(1, day(15)), second)
+        self.assertIsNone(resolver.get_log(1, day(21)))
+        with self.assertRaises(ShiftScheduleLog.MultipleObjectsReturned):
+            resolver.get_log(1, day(10))
+
+    def test_open_ended_log_overlaps_later_logs(self):
+        open_ended = get_log(1, day(1))
+        later = get_log(1, day(15), day(20))
+        resolver = ShiftScheduleResolver([open_ended, later])
+
+        self.assertIs(resolver.get_log(1, day(5)), open_ended)
+        with self.assertRaises(ShiftScheduleLog.MultipleObjectsReturned):
+            resolver.get_log(1, day(15))
+
+
+def create_member(org: Organization, username: str, role_name: str = "member") -> Member:
+    role, _ = Role.objects.get_or_create(name=role_name)
+    user = User.objects.create(username=username, email=username, first_name=username)
+    return Member.objects.create(user=user, organization=org, role=role)
+
+
+class ShiftCalendarTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(name="Calendar Org")
+        # Members get an initial shift schedule log of the org default shift, from today
+        cls.general = Shift.objects.create(
+            name="General",
+            organization=cls.org,
+            start_time=dt.time(9),
+            end_time=dt.time(18),
+            computation_time=dt.time(20),
+        )
+        cls.org.default_shift = cls.general
+        cls.org.save()
+
+        cls.gate, cls.office, cls.depot = (
+            SystemLocation.objects.create(organization=cls.org, name=name, latitude=12.9716, longitude=77.5946)
+            for name in ("Gate", "Office", "Depot")
+        )
+        cls.morning = Shift.objects.create(
+            name="Morning",
+            organization=cls.org,
+            start_time=dt.time(8),
+            end_time=dt.time(16),
+            computation_time=dt.time(18),
+            default_location=cls.depot,
+        )
+
+        cls.admin = create_member(cls.org, "admin@example.com", "admin")
+        cls.first = create_member(cls.org, "first@example.com")
+        cls.second = create_member(cls.org, "second@example.com")
+        cls.third = create_member(cls.org, "third@example.com")
+
+        # Location settings from day 9, default location of shift before
+        log = cls.create_log(cls.first, cls.morning, day(1), day(30))
+        log.location_settings.add(
+            cls.create_location_setting(cls.office, dt.time(13), dt.time(17), day(9)),
+            cls.create_location_setting(cls.gate, dt.time(8), dt.time(12), day(9), day(9)),
+        )
+
+        # Logs overlapping on day 9, General has no default location
+        cls.create_log(cls.second, cls.morning, day(1), day(9))
+        cls.create_log(cls.second, cls.general, day(9), day(30))
+
+        cls.dates = [day(8), day(9), day(10)]
+
+    @classmethod
+    def create_log(cls, member: Member, shift: Shift, start_date: dt.date, end_date: dt.date) -> ShiftScheduleLog:
+        return ShiftScheduleLog.objects.create(
+            employee=member, shift=shift, organization=cls.org, start_date=start_date, end_date=end_date
+        )
+
+    @classmethod
+    def create_location_setting(cls, system_location, start_time, end_time, start_date, end_date=None):
+        return LocationSettings.objects.create(
+            system_location=system_location,
+            organization=cls.org,
+            start_time=start_time,
+            end_time=end_time,
+            applicable_start_date=start_date,
+            applicable_end_date=end_date,
+        )
+
+    def get_calendar(self, members: list, chunk_size: int) -> dict:
+        return {member: days for member, days in iter_shift_calendar(members, self.dates, chunk_size)}
+
+    def test_windows_of_location_settings_or_default_location(self):
+        days = self.get_calendar([self.first], 10)[self.first]
+
+        self.assertEqual(
+            days,
+            [
+                (self.morning, [(self.depot, dt.time(8), dt.time(16))]),
+                # Ordered by start time
+                (self.morning, [(self.gate, dt.time(8), dt.time(12)), (self.office, dt.time(13), dt.time(17))]),
+                (self.morning, [(self.office, dt.time(13), dt.time(17))]),
+            ],
+        )
+
+    def test_overlapping_logs_and_no_logs(self):
+        calendar = self.get_calendar([self.second, self.third], 10)
+
+        self.assertEqual(
+            calendar[self.second],
+            [(self.morning, [(self.depot, dt.time(8), dt.time(16))]), None, (self.general, [])],
+        )
+        self.assertEqual(calendar[self.third], [None, None, None])
+
+    def test_members_across_chunks(self):
+        members = [self.third, self.first, self.second]
+
+        # Logs and their location settings, for each chunk
+        with self.assertNumQueries(4):
+            calendar = list(iter_shift_calendar(iter(members), self.dates, 2))
+
+        self.assertEqual([member for member, _ in calendar], members)
+        self.assertEqual(dict(calendar), self.get_calendar(members, 10))
+
+    def test_export_cells(self):
+        rows = []
+
+        @contextmanager
+        def open_export_writer(export_request, object_type, filename):
+            yield SimpleNamespace(writerow=rows.append)
+
+        export_request = ExportRequest.objects.create(member=self.admin, content=json.dumps({}))
+        members = [str(member.uuid) for member in (self.first, self.second)]
+        filters = {"shift_start_date": "2024-04-08", "shift_end_date": "2024-04-10"}
+        with mock.patch("export.utils.open_export_writer", open_export_writer):
+            export_shift_calendar_csv(export_request, members, filters)
+
+        self.assertEqual(rows[0], ["Employee", "Apr 08 (Mon)", "Apr 09 (Tue)", "Apr 10 (Wed)"])
+        self.assertEqual(
+            sorted(rows[1:]),
+            [
+                [
+                    "first@example.com",
+                    "Shift Name: Morning, System Locations: Depot (08:00 AM - 04:00 PM)",
+                    "Shift Name: Morning, System Locations: Gate (08:00 AM - 12:00 PM) && Office (01:00 PM - 05:00 PM)",
+                    "Shift Name: Morning, System Locations: Office (01:00 PM - 05:00 PM)",
+                ],
+                [
+                    "second@example.com",
+                    "Shift Name: Morning, System Locations: Depot (08:00 AM - 04:00 PM)",
+                    "",
+                    "Shift Name: General",
+                ],
+            ],
+        )
+
+    def test_grid_api(self):
+        client = APIClient()
+        client.force_authenticate(self.admin.user)
+
+        response = client.get(
+            "/api/shift-calendar/grid/",
+            {"shift_start_date": "2024-04-08", "shift_end_date": "2024-04-10"},
+            HTTP_ORGANIZATION_UUID=str(self.org.uuid),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["dates"], ["2024-04-08", "2024-04-09", "2024-04-10"])
+        days = {row["member"]["uuid"]: row["days"] for row in response.data["data"]}
+        self.assertEqual(len(days), 4)
+
+        first_days = days[str(self.first.uuid)]
+        self.assertEqual(first_days[0]["shift"]["name"], "Morning")
+        self.assertEqual(
+            [
+                (location["name"], location["start_time"], location["end_time"])
+                for location in first_days[1]["system_locations"]
+            ],
+            [("Gate", "08:00:00", "12:00:00"), ("Office", "13:00:00", "17:00:00")],
+        )
+        self.assertEqual(
+            days[str(self.second.uuid)][1], {"date": "2024-04-09", "shift": None, "system_locations": []}
+        )
+
+    def test_grid_api_date_range(self):
+        client = APIClient()
+        client.force_authenticate(self.admin.user)
+
+        response = client.get(
+            "/api/shift-calendar/grid/",
+            {"shift_start_date": "2024-04-10", "shift_end_date": "2024-04-08"},
+            HTTP_ORGANIZATION_UUID=str(self.org.uuid),
+        )
+
+        self.assertEqual(response.status_code, 400)
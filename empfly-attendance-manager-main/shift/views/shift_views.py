@@ -23,6 +23,7 @@ from shift.shift_schedule_logic import (
     deactivate_shift,
     priority_analysis,
 )
+from shift.shift_calendar import get_calendar_dates, iter_shift_calendar, serialize_calendar_day
 from shift.utils import is_shift_editable, validate_shift_status_changing
 from shift.validations import shift_validation
 from utils import fetch_data, read_data
@@ -41,6 +42,7 @@ from utils import date_time
 from export.utils import create_export_request
 from export import utils as export_utils
 import calendar
+from django.conf import settings
 from datetime import date
 
 
@@ -355,6 +357,75 @@ class ShiftCalendarAPI(views.APIView):
         )
 
 
+class ShiftCalendarGridAPI(views.APIView):
+    """ Shift and system location timings of members for every day of a date range
+    """
+
+    permission_classes = [permissions.IsTokenAuthenticated]
+    serializer_class = MinimalMemberSerializer
+
+    def get(self, request, *args, **kwargs):
+
+        org_uuid = request.headers.get("organization-uuid")
+        org = fetch_data.get_organization(request.user, org_uuid)
+        req_member = fetch_data.get_member(request.user, org.uuid)
+
+        if fetch_data.is_admin_hr_member(req_member) is False:
+            return read_data.get_403_response()
+
+        shift_start_date, is_valid_start_date = convert_to_date(request.GET.get("shift_start_date", ""))
+        if is_valid_start_date is False:
+            return HTTP_400({}, {"message": "Start Date is required"})
+
+        shift_end_date, is_valid_end_date = convert_to_date(request.GET.get("shift_end_date", ""))
+        if is_valid_end_date is False:
+            return HTTP_400({}, {"message": "End Date is required"})
+
+        if shift_end_date < shift_start_date:
+            return HTTP_400({}, {"message": "End Date must be after Start Date"})
+
+        if (shift_end_date - shift_start_date).days + 1 > settings.SHIFT_CALENDAR_MAX_DAYS:
+            return HTTP_400({}, {"message": f"Date range can not be more than {settings.SHIFT_CALENDAR_MAX_DAYS} days"})
+
+        members = Member.objects.filter(organization=org).select_related("user")
+
+        filter_status = request.GET.get("status", "active")
+        if filter_status in ("active", "inactive"):
+            members = members.filter(status=filter_status)
+
+        if req_member.role.name == "member":
+            org_location_obj = req_member.org_location_head.all()
+            department_obj = req_member.department_head.all()
+
+            if org_location_obj.exists() or department_obj.exists():
+                members = members.filter(Q(org_location__in=org_location_obj) | Q(department__in=department_obj))
+            else:
+                members = members.filter(uuid=req_member.uuid)
+
+        members = filter_shift(members, request).distinct()
+        members = search_ssl_employees(members, request.GET.get("search"))
+
+        page_obj, num_pages, page = pagination(members.order_by("id"), request)
+
+        dates = get_calendar_dates(shift_start_date, shift_end_date)
+        data = [
+            {
+                "member": self.serializer_class(member).data,
+                "days": [serialize_calendar_day(date, day) for date, day in zip(dates, days)],
+            }
+            for member, days in iter_shift_calendar(page_obj.object_list, dates)
+        ]
+
+        return Response(
+            {
+                "data": data,
+                "dates": [str(date) for date in dates],
+                "pagination": {"total_pages": num_pages, "page": page},
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 class EmployeeShiftMappingAPI(views.APIView):
 
     permission_classes = [permissions.IsTokenAuthenticated]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import cache
+
+import uuid
+
+
+def is_cache_shared() -> bool:
+    """ Default cache is shared by all workers. A per process cache can not be
+        invalidated by other workers, so data dropped on change is not cached in it.
+    """
+    return settings.SHARED_CACHE
+
+
+def get_version(key: str) -> str:
+    """ Version stored at key, a new one is stored if there is none
+    """
+
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key: str) -> None:
+    cache.set(key, uuid.uuid4().hex, None)
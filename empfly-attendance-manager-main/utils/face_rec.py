@@ -1,6 +1,10 @@
-import json
+import threading
+from typing import TYPE_CHECKING
 from uuid import uuid4
+from django.conf import settings
+from django.db.models import Count, Max
 from member.models import Member, MemberImage
+from utils.cache import bump_version, get_version, is_cache_shared
 
 import numpy as np
 import PIL.Image
@@ -9,6 +13,9 @@ import face_recognition
 
 import logging
 
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
 
 logger = logging.getLogger(__name__)
 
@@ -89,23 +96,47 @@ def get_image_encoding(image: "Image") -> np.ndarray:
         return []
 
 
-def convert_encoding_to_json(encoding: np.ndarray) -> json:
+# MemberImage.encoding is stored as raw little endian float64 bytes.
+ENCODING_DTYPE = np.dtype("<f8")
+ENCODING_SIZE = 128
+ENCODING_NBYTES = ENCODING_DTYPE.itemsize * ENCODING_SIZE
+
+
+def convert_encoding_to_bytes(encoding: np.ndarray) -> bytes:
     """
-    Converts encoding to JSON
+    Converts encoding to bytes for saving in MemberImage
 
     Args:
         encoding (np.ndarray): Image encoding matrix
 
     Returns:
-        JSON: JSON representation of image encoding
+        bytes: Raw float64 representation of image encoding
+    """
+
+    return np.asarray(encoding, dtype=ENCODING_DTYPE).tobytes()
+
+
+def load_encoding(encoding: bytes) -> np.ndarray:
+    """ Converts encoding saved in MemberImage back to numpy array.
     """
 
-    # Converts numpy array to python list
-    encoding_arr = encoding.tolist()
-    # Converts encoding to JSON
-    json_data = json.dumps(encoding_arr)
-    # Returns JSON object
-    return json_data
+    return np.frombuffer(encoding, dtype=ENCODING_DTYPE)
+
+
+def load_encodings(encodings: list) -> np.ndarray:
+    """ Converts list of saved encodings to a (n, 128) matrix with a single
+        buffer copy.
+    """
+
+    if not encodings:
+        return np.empty((0, ENCODING_SIZE), dtype=ENCODING_DTYPE)
+
+    buffer = b"".join(encodings)
+    return np.frombuffer(buffer, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+
+
+def is_valid_encoding(encoding: bytes) -> bool:
+    return encoding is not None and len(encoding) == ENCODING_NBYTES
 
 
 def get_face_encodings(queryset: "Queryest") -> list:
@@ -116,7 +147,7 @@ def get_face_encodings(queryset: "Queryest") -> list:
 
     encodings = []
     for member_image in queryset:
-        encoding = np.asarray(json.loads(member_image.encoding))
+        encoding = load_encoding(member_image.encoding)
         encodings.append(encoding)
     return encodings
 
@@ -143,6 +174,363 @@ def get_member_ids(queryset: "Queryset") -> list:
         member_ids.append(member_id)
     return member_ids
 
+
+class FaceEncodingIndex:
+    """ All known face encodings of a scope as one contiguous float32
+        matrix with the member id of every row in a parallel array.
+        A probe is matched against every row with a single vectorized
+        distance computation instead of looping over MemberImage rows.
+    """
+
+    def __init__(self, version: tuple, encodings: np.ndarray, member_ids: np.ndarray):
+        self.version = version
+        self.encodings = encodings
+        self.member_ids = member_ids
+        # |a - b|^2 = |a|^2 - 2ab + |b|^2. Row norms are computed once per build.
+        self.squared_norms = np.einsum("ij,ij->i", encodings, encodings)
+
+    def __len__(self) -> int:
+        return len(self.member_ids)
+
+    def candidate_rows(self, probe: np.ndarray, tolerance: float, exact: bool = False):
+        """ Rows which can be within tolerance of probe. Exact index checks all.
+        """
+        return slice(None)
+
+    def face_distance(self, face_encoding: np.ndarray, rows=slice(None)) -> np.ndarray:
+        """ Euclidean distance between the probe and known encodings of rows.
+            Same values as face_recognition.face_distance.
+        """
+
+        probe = np.asarray(face_encoding, dtype=np.float32)
+        squared = self.squared_norms[rows] - 2 * (self.encodings[rows] @ probe) + (probe @ probe)
+        return np.sqrt(np.maximum(squared, 0))
+
+    def best_match(self, face_encoding: np.ndarray, tolerance: float):
+        """ return: member_id, distance =
+            member_id is None if the closest encoding is outside tolerance.
+        """
+
+        if len(self) == 0:
+            return None, None
+
+        probe = np.asarray(face_encoding, dtype=np.float32)
+        rows = self.candidate_rows(probe, tolerance)
+        member_ids = self.member_ids[rows]
+        if len(member_ids) == 0:
+            return None, None
+
+        face_distances = self.face_distance(probe, rows)
+        best_match_index = int(np.argmin(face_distances))
+        distance = float(face_distances[best_match_index])
+
+        if distance > tolerance:
+            return None, distance
+        return int(member_ids[best_match_index]), distance
+
+    def matched_member_ids(self, face_encoding: np.ndarray, tolerance: float) -> set:
+        """ Ids of all members having at least one encoding within tolerance.
+        """
+
+        if len(self) == 0:
+            return set()
+
+        # Every match is needed to reject scans matching several members, so
+        # lists are never cut by nprobe here
+        probe = np.asarray(face_encoding, dtype=np.float32)
+        rows = self.candidate_rows(probe, tolerance, exact=True)
+        face_distances = self.face_distance(probe, rows)
+        member_ids = self.member_ids[rows]
+        return set(int(member_id) for member_id in member_ids[face_distances <= tolerance])
+
+
+def squared_distances(encodings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """ (n, k) squared euclidean distances between rows and centroids.
+    """
+
+    encoding_norms = np.einsum("ij,ij->i", encodings, encodings)
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    squared = encoding_norms[:, None] - 2 * (encodings @ centroids.T) + centroid_norms[None, :]
+    return np.maximum(squared, 0)
+
+
+def assign_to_centroids(encodings: np.ndarray, centroids: np.ndarray, chunk_size: int = 4096):
+    """ return: labels, distances =
+        Nearest centroid of every row and the distance to it. Works in chunks
+        so the (n, k) distance matrix is never allocated at once.
+    """
+
+    labels = np.empty(len(encodings), dtype=np.int64)
+    distances = np.empty(len(encodings), dtype=np.float32)
+
+    for start in range(0, len(encodings), chunk_size):
+        squared = squared_distances(encodings[start:start + chunk_size], centroids)
+        chunk_labels = np.argmin(squared, axis=1)
+        labels[start:start + chunk_size] = chunk_labels
+        distances[start:start + chunk_size] = np.sqrt(squared[np.arange(len(chunk_labels)), chunk_labels])
+
+    return labels, distances
+
+
+def train_centroids(encodings: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 50000) -> np.ndarray:
+    """ k-means on a sample of encodings. Returns (nlist, 128) centroids.
+    """
+
+    rng = np.random.default_rng(0)
+    if len(encodings) > sample_size:
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+    else:
+        sample = encodings
+
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels, _ = assign_to_centroids(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        # Empty lists keep their previous centroid
+        centroids[filled] = sums / counts[filled, None]
+
+    return centroids
+
+
+class IVFFaceEncodingIndex(FaceEncodingIndex):
+    """ Inverted file index. Encodings are grouped around k-means centroids
+        and stored list by list. A probe only visits lists whose ball
+        (distance to centroid minus list radius) can hold an encoding within
+        tolerance, and the candidates are re-ranked with exact distances.
+        With nprobe=None the result is the same as the exact index.
+    """
+
+    # Slack for float32 rounding in the lower bound
+    BOUND_EPSILON = 1e-4
+
+    def __init__(
+        self, version: tuple, encodings: np.ndarray, member_ids: np.ndarray,
+        centroids: np.ndarray = None, nprobe: int = None
+    ):
+        if centroids is None:
+            centroids = train_centroids(encodings, self.get_nlist(len(encodings)))
+
+        labels, distances = assign_to_centroids(encodings, centroids)
+
+        # Keep every list contiguous so candidates are cheap slices
+        order = np.argsort(labels, kind="stable")
+        super().__init__(version, encodings[order], member_ids[order])
+
+        counts = np.bincount(labels, minlength=len(centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.radii = np.zeros(len(centroids), dtype=np.float32)
+        np.maximum.at(self.radii, labels, distances)
+
+        self.centroids = centroids
+        self.centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        self.nprobe = nprobe
+
+    @staticmethod
+    def get_nlist(size: int) -> int:
+        return max(1, int(np.sqrt(size)))
+
+    def candidate_rows(self, probe: np.ndarray, tolerance: float, exact: bool = False):
+        squared = self.centroid_norms - 2 * (self.centroids @ probe) + (probe @ probe)
+        centroid_distances = np.sqrt(np.maximum(squared, 0))
+
+        lower_bounds = centroid_distances - self.radii
+        lists = np.flatnonzero(lower_bounds <= tolerance + self.BOUND_EPSILON)
+        lists = lists[np.argsort(centroid_distances[lists])]
+        if self.nprobe and not exact:
+            lists = lists[:self.nprobe]
+
+        if len(lists) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Gathering most of the matrix costs more than scanning all of it
+        list_sizes = self.offsets[lists + 1] - self.offsets[lists]
+        if list_sizes.sum() * 2 >= len(self):
+            return slice(None)
+
+        return np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        )
+
+
+# Indexes are cached per process and keyed by organization id.
+# INSTANCE_INDEX_KEY holds the index of every active member in the instance.
+INSTANCE_INDEX_KEY = "instance"
+
+_face_indexes = {}
+_face_indexes_lock = threading.Lock()
+# IVF centroids are kept across rebuilds. Only list assignment is redone
+# when images are added or removed.
+_face_index_centroids = {}
+# Orgs whose centroids are being trained in the background
+_training_org_ids = set()
+_training_lock = threading.Lock()
+
+
+def get_face_index_queryset(org_id) -> "QuerySet":
+    if org_id == INSTANCE_INDEX_KEY:
+        return MemberImage.objects.filter(member__status="active")
+    return MemberImage.objects.filter(organization_id=org_id)
+
+
+def get_face_index_version_key(org_id) -> str:
+    return f"face_index_version:{org_id}"
+
+
+def get_face_index_version(org_id, queryset: "QuerySet") -> tuple:
+    """ Version of the MemberImages of an index. MemberImage and Member save
+        and delete signals bump it in the shared cache, so a scan reads one
+        key. Without a shared cache bumps are not seen by other workers, so
+        the stamp (count, latest updated_at) is read from DB. The instance
+        index also depends on member status, so its stamp has the latest
+        updated_at of the members.
+    """
+
+    if is_cache_shared():
+        return (get_version(get_face_index_version_key(org_id)),)
+
+    aggregates = {"count": Count("id"), "last_updated_at": Max("updated_at")}
+    if org_id == INSTANCE_INDEX_KEY:
+        aggregates["last_member_updated_at"] = Max("member__updated_at")
+
+    stamp = queryset.order_by().aggregate(**aggregates)
+    return tuple(stamp[name] for name in aggregates)
+
+
+def get_reusable_centroids(org_id, size: int) -> np.ndarray:
+    """ Previous centroids of org if the index size is still close to the
+        size they were trained for.
+    """
+
+    centroids = _face_index_centroids.get(org_id)
+    if centroids is None:
+        return None
+
+    nlist = IVFFaceEncodingIndex.get_nlist(size)
+    if nlist / 2 <= len(centroids) <= nlist * 2:
+        return centroids
+    return None
+
+
+def train_centroids_in_background(org_id, encodings: np.ndarray) -> None:
+    """ Train IVF centroids of org in a thread, off the request path. The
+        cached index of org is dropped when done, so the next scan builds
+        the IVF index with them.
+    """
+
+    # Called while _face_indexes_lock is held
+    with _training_lock:
+        if org_id in _training_org_ids:
+            return
+        _training_org_ids.add(org_id)
+
+    def train():
+        try:
+            centroids = train_centroids(encodings, IVFFaceEncodingIndex.get_nlist(len(encodings)))
+            with _face_indexes_lock:
+                _face_index_centroids[org_id] = centroids
+                _face_indexes.pop(org_id, None)
+            logger.info(f"Face index centroids trained for {org_id}. lists: {len(centroids)}")
+        except Exception as e:
+            logger.error(e)
+            logger.exception(f"Add exception for {e.__class__.__name__} in train_centroids_in_background")
+        finally:
+            with _training_lock:
+                _training_org_ids.discard(org_id)
+
+    threading.Thread(target=train, name=f"face-index-centroids-{org_id}", daemon=True).start()
+
+
+def build_face_index(queryset: "QuerySet", version: tuple, org_id=None) -> FaceEncodingIndex:
+
+    rows = queryset.order_by().values_list("member_id", "encoding")
+
+    member_ids, encodings = [], []
+    for member_id, encoding in rows.iterator(chunk_size=2000):
+        if not is_valid_encoding(encoding):
+            logger.error(f"Invalid face encoding for member {member_id}")
+            continue
+        member_ids.append(member_id)
+        encodings.append(encoding)
+
+    encodings = load_encodings(encodings).astype(np.float32)
+    member_ids = np.array(member_ids, dtype=np.int64)
+
+    ivf_min_size = settings.FACE_INDEX_IVF_MIN_SIZE
+    if not ivf_min_size or len(member_ids) < ivf_min_size:
+        return FaceEncodingIndex(version, encodings, member_ids)
+
+    # Exact index until centroids are trained
+    centroids = get_reusable_centroids(org_id, len(member_ids))
+    if centroids is None:
+        train_centroids_in_background(org_id, encodings)
+        return FaceEncodingIndex(version, encodings, member_ids)
+
+    return IVFFaceEncodingIndex(
+        version,
+        encodings,
+        member_ids,
+        centroids=centroids,
+        nprobe=settings.FACE_INDEX_IVF_NPROBE or None,
+    )
+
+
+def get_face_index(org_id) -> FaceEncodingIndex:
+    """ Get cached face index of org. Rebuild if any MemberImage is changed.
+        Pass INSTANCE_INDEX_KEY to get the index of the whole instance.
+    """
+
+    queryset = get_face_index_queryset(org_id)
+    version = get_face_index_version(org_id, queryset)
+
+    index = _face_indexes.get(org_id)
+    if index is not None and index.version == version:
+        return index
+
+    with _face_indexes_lock:
+        index = _face_indexes.get(org_id)
+        if index is None or index.version != version:
+            index = build_face_index(queryset, version, org_id)
+            _face_indexes[org_id] = index
+            logger.info(
+                f"Face index built for {org_id}. encodings: {len(index)}, "
+                f"type: {index.__class__.__name__}"
+            )
+
+    return index
+
+
+def drop_face_index(org_id) -> None:
+    """ Drop cached index of org_id (or INSTANCE_INDEX_KEY), in every worker
+        with a shared cache.
+    """
+
+    _face_indexes.pop(org_id, None)
+    if is_cache_shared():
+        bump_version(get_face_index_version_key(org_id))
+
+
+def invalidate_face_index(org_id) -> None:
+    """ Drop cached index of org and the instance index, called when member
+        images of org change.
+    """
+
+    for key in (org_id, INSTANCE_INDEX_KEY):
+        drop_face_index(key)
+
+
+def invalidate_instance_face_index() -> None:
+    """ Drop the instance index only, called when a member is activated,
+        deactivated or moved. Org indexes do not depend on members.
+    """
+
+    drop_face_index(INSTANCE_INDEX_KEY)
+
+
 # TODO deprecated
 def identify_face(org_uuid: uuid4, face_encoding: list, actual_user_id: int) -> bool:
 
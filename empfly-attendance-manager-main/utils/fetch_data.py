@@ -10,6 +10,7 @@ import logging
 import json
 
 from visitor.models import Visitor
+from utils.request_context import cached_in_request, get_user_key
 
 
 logger = logging.getLogger(__name__)
@@ -67,11 +68,21 @@ def get_user(user_uuid: uuid4) -> User:
 
 
 def get_member(user: User, organization_uuid: uuid4) -> Member:
-    """ Get member obj using user and org uuid.
+    """ Get member obj using user and org uuid. Cached for the current request.
     """
 
+    return cached_in_request(
+        ("member", get_user_key(user), str(organization_uuid)),
+        lambda: _get_member(user, organization_uuid),
+    )
+
+
+def _get_member(user: User, organization_uuid: uuid4) -> Member:
+
     try:
-        return Member.objects.get(user=user, organization__uuid=organization_uuid)
+        return Member.objects.select_related("role", "organization").get(
+            user=user, organization__uuid=organization_uuid
+        )
     except Member.DoesNotExist as e:
         logging.error(e)
         return None
@@ -149,37 +160,33 @@ def get_visitor_role() -> Role:
     role, created = Role.objects.get_or_create(name="visitor")
     return role
 
+def has_role(member: Member, role_names: tuple) -> bool:
+    """ Role of member is one of role_names. Uses the role loaded with member.
+    """
+    return member.role.name in role_names
+
 def is_admin_or_hr(member: Member) -> Role:
-    roles = Role.objects.filter(name__in=["admin", "hr"])
-    if member.role in roles:
-        return True
-    return False
+    return has_role(member, ("admin", "hr"))
 
 def is_admin_hr_front_desk(member: Member) -> Role:
-    roles = Role.objects.filter(name__in=["admin", "hr"])
-    if member.role in roles:
+    if has_role(member, ("admin", "hr")):
         return True
 
     return member.is_front_desk
 
 
 def is_admin(member: Member) -> bool:
-    if member.role == get_admin_role():
-        return True
-    return False
+    return has_role(member, ("admin",))
 
 def is_admin_or_front_desk(member: Member) -> bool:
-    if member.role == get_admin_role():
+    if has_role(member, ("admin",)):
         return True
     
     return member.is_front_desk
 
 
 def is_admin_hr_member(member: Member) -> bool:
-    roles = Role.objects.filter(name__in=["admin", "hr", "member"])
-    if member.role in roles:
-        return True
-    return False
+    return has_role(member, ("admin", "hr", "member"))
 
 def is_front_desk(member: Member) -> bool:
     return member.is_front_desk
@@ -192,6 +199,16 @@ def is_front_desk(member: Member) -> bool:
 #     return False
 
 def get_organization(user: User, organization_uuid: uuid4) -> Organization:
+    """ Organization of organization uuid if user is a member of it. Cached for the current request.
+    """
+
+    return cached_in_request(
+        ("organization", get_user_key(user), str(organization_uuid)),
+        lambda: _get_organization(user, organization_uuid),
+    )
+
+
+def _get_organization(user: User, organization_uuid: uuid4) -> Organization:
 
     if organization_uuid is None:
         member = Member.objects.get(user=user)
@@ -216,9 +233,17 @@ def get_organization(user: User, organization_uuid: uuid4) -> Organization:
 
 
 def get_organization_as_visitor(user: User, organization_uuid: uuid4) -> Organization:
-    """ Get visitor organization using user and org uuid.
+    """ Get visitor organization using user and org uuid. Cached for the current request.
     """
 
+    return cached_in_request(
+        ("visitor_organization", get_user_key(user), str(organization_uuid)),
+        lambda: _get_organization_as_visitor(user, organization_uuid),
+    )
+
+
+def _get_organization_as_visitor(user: User, organization_uuid: uuid4) -> Organization:
+
     if organization_uuid is None:
         visitor = Visitor.objects.get(user=user)
         return visitor.organization
@@ -241,6 +266,16 @@ def get_organization_as_visitor(user: User, organization_uuid: uuid4) -> Organiz
 
 
 def get_visitor(user: User, organization_uuid: uuid4) -> Member:
+    """ Get visitor obj using user and org uuid. Cached for the current request.
+    """
+
+    return cached_in_request(
+        ("visitor", get_user_key(user), str(organization_uuid)),
+        lambda: _get_visitor(user, organization_uuid),
+    )
+
+
+def _get_visitor(user: User, organization_uuid: uuid4) -> Member:
 
     try:
         return Visitor.objects.get(user=user, organization__uuid=organization_uuid)
@@ -0,0 +1,157 @@
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+FILE_CONTENT_TYPES = {
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpg",
+    "png": "image/png",
+    "pdf": "application/pdf",
+    "csv": "text/csv",
+    "gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_file_content_type(filename: str) -> str:
+    """ Content type of a servable file, None if extension is not allowed
+    """
+
+    return FILE_CONTENT_TYPES.get(filename.split(".")[-1].lower())
+
+
+def get_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def is_not_modified(request, etag: str, mtime: int) -> bool:
+    """ True if client's cached copy (If-None-Match / If-Modified-Since) is current
+    """
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and mtime <= if_modified_since
+
+
+def get_byte_range(request, etag: str, mtime: int, size: int):
+    """ (start, end) inclusive of a single "bytes=" Range header.
+
+        return: None to send the whole file (no range, multi range, or
+        stale If-Range), False if range can not be satisfied.
+    """
+
+    range_header = request.headers.get("Range")
+    if not range_header or size == 0:
+        return None
+
+    if_range = request.headers.get("If-Range")
+    if if_range:
+        if_range_date = parse_http_date_safe(if_range)
+        if if_range != etag and (if_range_date is None or mtime > if_range_date):
+            return None
+
+    match = RANGE_RE.match(range_header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+
+    if first == "":
+        # suffix range, last n bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_file_range(path: str, start: int, length: int):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def get_offload_response(path: str, content_type: str) -> HttpResponse:
+    """ Empty response telling the front proxy to send path itself.
+
+        X-Accel-Redirect (nginx) gets FILE_SERVE_OFFLOAD_PREFIX + path, which
+        must be an internal location of the proxy. Any other header
+        (X-Sendfile) gets the absolute path of the file.
+    """
+
+    header = settings.FILE_SERVE_OFFLOAD_HEADER
+    response = HttpResponse(content_type=content_type)
+    if header.lower() == "x-accel-redirect":
+        response[header] = settings.FILE_SERVE_OFFLOAD_PREFIX.rstrip("/") + "/" + path.lstrip("/")
+    else:
+        response[header] = os.path.abspath(path)
+    return response
+
+
+def serve_file(request, path: str, content_type: str) -> HttpResponse:
+    """ Stream file at path without reading it into memory.
+
+        Supports ETag / Last-Modified validation (304) and single byte range
+        requests (206 / 416). If FILE_SERVE_OFFLOAD_HEADER is set, sending the
+        file and ranges is left to the front proxy.
+
+        raise: FileNotFoundError if file does not exist
+    """
+
+    stat = os.stat(path)
+    etag = get_etag(stat)
+    mtime = int(stat.st_mtime)
+
+    if is_not_modified(request, etag, mtime):
+        response = HttpResponse(status=304)
+    elif settings.FILE_SERVE_OFFLOAD_HEADER:
+        response = get_offload_response(path, content_type)
+    else:
+        byte_range = get_byte_range(request, etag, mtime, stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+        elif byte_range is None:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                read_file_range(path, start, length), content_type=content_type, status=206
+            )
+            response["Content-Length"] = str(length)
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -1,6 +1,7 @@
 import logging
 from attendance.exceptions import CaptureFRImagError
-from member.models import Member, MemberImage
+from member.constants import FACE_MATCH_TOLERANCE
+from member.models import Member
 from organization.models import SystemLocation
 from rest_framework.response import Response
 from rest_framework import status
@@ -17,7 +18,6 @@ from utils import face_rec, utils
 logger = logging.getLogger(__name__)
 
 from django.core.files.base import ContentFile
-import face_recognition
 
 logging.basicConfig(
     filename="logs/fr_images.log",
@@ -187,21 +187,15 @@ def match_img_with_all_FR(image: str) -> dict:
         "match_img_with_all_FR Started working"
     )
 
-    fr_images = MemberImage.objects.filter(member__status="active").select_related("member")
+    face_index = face_rec.get_face_index(face_rec.INSTANCE_INDEX_KEY)
 
-    if not fr_images.exists():
+    if len(face_index) == 0:
         logging.info(
             "FR not exists in org"
         )
         return None, []
 
-    known_face_encodings = face_rec.get_face_encodings(fr_images)
-
-    known_face_ids = face_rec.get_member_ids(fr_images)
-
-    logging.info(
-        f"known_face_encodings = {len(known_face_encodings)}, known_face_member_ids = {len(known_face_ids)}"
-    )
+    logging.info(f"known_face_encodings = {len(face_index)}")
 
     image = utils.base64_to_contentfile(image)
     if isinstance(image, ContentFile) is False:
@@ -214,22 +208,7 @@ def match_img_with_all_FR(image: str) -> dict:
         logging.error("========= face encoding have no length =========")
         raise CaptureFRImagError("No face detected.")
 
-    matches = face_recognition.compare_faces(
-        known_face_encodings, face_encoding, tolerance=0.35
-    )
-    logging.info(f"Matches: {matches}")
-
-    all_matched_member_ids = set()
-    for index, match in enumerate(matches):
-        logging.info(f"type of match before: {type(match)}")
-        match = bool(match)
-        logging.info(f"type of match after: {type(match)}")
-        logging.info(f"match: {match}")
-        if match is False:
-            continue
-
-        logging.info(f"member id: {known_face_ids[index]}")
-        all_matched_member_ids.add(known_face_ids[index])
+    all_matched_member_ids = face_index.matched_member_ids(face_encoding, FACE_MATCH_TOLERANCE)
 
     len_all_match_member = len(all_matched_member_ids)
     logging.info(f"len_all_match_member: {len_all_match_member}")
@@ -0,0 +1,95 @@
+from contextvars import ContextVar
+from typing import Any, Callable
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+_request_context = ContextVar("request_context", default=None)
+
+
+class RequestContext:
+    """ Auth, organization, member and timezone of the current request.
+
+        Set by RequestContextMiddleware and resolved once per request, then
+        reused by the middlewares, DRF token authentication, api permissions and
+        fetch_data lookups of the views. Outside of a request (celery, commands)
+        there is no context and every lookup hits the DB as before.
+    """
+
+    def __init__(self, request) -> None:
+        self.request = request
+        self.values = {}
+
+    def cached(self, key: tuple, func: Callable) -> Any:
+        """ Value of key, computed with func on first use. Exceptions are not cached.
+        """
+
+        if key not in self.values:
+            self.values[key] = func()
+        return self.values[key]
+
+    def get_token_auth(self, authenticate: Callable) -> tuple:
+        """ (user, token) of token authentication, or None if request has no token.
+            Authentication errors are raised on every call, like the uncached one.
+        """
+
+        key = ("token_auth",)
+        if key not in self.values:
+            try:
+                self.values[key] = (authenticate(), None)
+            except Exception as error:
+                self.values[key] = (None, error)
+
+        result, error = self.values[key]
+        if error is not None:
+            raise error
+        return result
+
+    @property
+    def user(self):
+        """ Token user if request has a valid token, else session user
+        """
+
+        def get_user():
+            from account.authentication import TokenAuthentication
+
+            try:
+                return TokenAuthentication().authenticate(self.request)[0]
+            except Exception:
+                return self.request.user
+
+        return self.cached(("user",), get_user)
+
+    @property
+    def timezone(self) -> str:
+        """ Timezone of the organization of the first member of user
+        """
+
+        def get_timezone():
+            user = self.user
+            member = user.members.select_related("organization").first() if user.is_authenticated else None
+            if member and member.organization.timezone:
+                return member.organization.timezone
+            return "UTC"
+
+        return self.cached(("timezone",), get_timezone)
+
+
+def get_request_context() -> RequestContext:
+    return _request_context.get()
+
+
+def cached_in_request(key: tuple, func: Callable) -> Any:
+    """ func() cached in the current request context, or just func() outside a request
+    """
+
+    context = get_request_context()
+    if context is None:
+        return func()
+    return context.cached(key, func)
+
+
+def get_user_key(user) -> Any:
+    return getattr(user, "pk", None)
@@ -14,6 +14,7 @@ from django.db.models.query import QuerySet
 from collections.abc import Iterable
 from visitor.models import Visitation
 from shift.models import Shift, ShiftScheduleLog
+from shift.schedule_resolver import get_member_shift_schedule_logs
 from django.db.models import Q
 from datetime import date
 
@@ -326,43 +327,10 @@ def curr_shift_schedule_log(member: Member, d_t: datetime, org: Organization):
     logging.info(f"today_date : {today_date}")
     logging.info(f"tomorrow_date : {tomorrow_date}")
 
-    logs = ShiftScheduleLog.objects.filter(
-        status="active", employee=member, organization=org
+    yesterday_log, today_log, tomorrow_log = get_member_shift_schedule_logs(
+        member, org, [yesterday_date, today_date, tomorrow_date]
     )
 
-    try:
-        yesterday_log = logs.get(
-            Q(
-                start_date__lte=yesterday_date,
-                end_date__gte=yesterday_date,
-            )
-            | Q(start_date__lte=yesterday_date, end_date__isnull=True)
-        )
-    except ShiftScheduleLog.DoesNotExist:
-        yesterday_log = None
-
-    try:
-        today_log = logs.get(
-            Q(
-                start_date__lte=today_date,
-                end_date__gte=today_date,
-            )
-            | Q(start_date__lte=today_date, end_date__isnull=True),
-        )
-    except ShiftScheduleLog.DoesNotExist:
-        today_log = None
-
-    try:
-        tomorrow_log = logs.get(
-            Q(
-                start_date__lte=tomorrow_date,
-                end_date__gte=tomorrow_date,
-            )
-            | Q(start_date__lte=tomorrow_date, end_date__isnull=True),
-        )
-    except ShiftScheduleLog.DoesNotExist:
-        tomorrow_log = None
-
     logging.info(f"yesterday_log : {yesterday_log}")
     logging.info(f"today_log : {today_log}")
     logging.info(f"tomorrow_log : {tomorrow_log}")